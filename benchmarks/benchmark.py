@@ -0,0 +1,269 @@
+# Mide el rendimiento del ETL y de la API contra un PostgreSQL local con incidentes sintéticos.
+# Uso: python benchmarks/benchmark.py --filas 10k 1m --db incidentes_benchmark --salida resultados.json
+#      python benchmarks/benchmark.py --filas 10k --db incidentes_benchmark --comparar anterior.json
+# La base de datos indicada se vacía en cada tamaño: nunca se usa la de trabajo (DB_NAME de config.py).
+import argparse  # Parámetros de la línea de comandos
+import json  # Resultados en formato legible por máquina
+import os  # Rutas y variables de entorno
+import platform  # Datos de la máquina para los resultados
+import random  # Números de incidente al azar para las lecturas
+import subprocess  # Commit actual del repositorio
+import sys  # Ruta de importación de la API
+import tempfile  # Carpeta para los archivos limpios de las cargas
+import time  # Medición de tiempos
+from datetime import datetime, timezone  # Fecha de la ejecución
+import numpy as np  # Percentiles de latencia
+import psycopg2  # Creación de la base de datos de pruebas
+from generador import Modelo, generar_archivo, filas_desde_texto, PRIMER_NUMERO  # Datos sintéticos
+
+# Permite reutilizar los módulos de la API (carpeta src) desde este script
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'src'))
+from config import config  # Parámetros de conexión; el nombre de la base se reemplaza por el de pruebas
+from normalizacion import normalizar_incidentes  # Etapa de normalización (transform.py)
+from paralelo import leer_archivo_paralelo  # Normalización en varios procesos
+from lectores import MOTORES, leer_csv  # Motores de lectura del CSV
+from huellas import huella_archivo  # Huella del archivo que registran los trabajos de carga
+from trabajos import Trabajo  # Estado de avance que reciben los trabajos de carga
+
+CARPETA_DATOS = os.path.join(RAIZ, 'benchmarks', 'datos')
+
+
+# Crea la base de datos de pruebas si no existe (UTF8, como la de trabajo)
+def crear_base(nombre, configuracion):
+    conexion = psycopg2.connect(
+        host=configuracion.DB_HOST, user=configuracion.DB_USER, password=configuracion.DB_PASSWORD, database='postgres'
+    )
+    conexion.autocommit = True
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nombre,))
+            if not cursor.fetchone():
+                cursor.execute(f'CREATE DATABASE "{nombre}" ENCODING \'UTF8\' TEMPLATE template0')
+    finally:
+        conexion.close()
+
+
+# Devuelve el archivo sintético de 'filas' filas (y su actualización), generándolo solo la primera vez
+def archivos_sinteticos(filas, semilla, modelo):
+    base = os.path.join(CARPETA_DATOS, f'incidentes_{filas}_{semilla}.csv')
+    actualizacion = os.path.join(CARPETA_DATOS, f'actualizacion_{filas}_{semilla}.csv')
+    if not os.path.exists(base):
+        generar_archivo(base, filas, semilla, modelo)
+    if not os.path.exists(actualizacion):
+        generar_archivo(actualizacion, filas, semilla, modelo, actualizacion=True)
+    return base, actualizacion
+
+
+# Latencias de una serie de solicitudes, en milisegundos
+def resumen_latencias(latencias):
+    ms = np.array(latencias) * 1000
+    return {
+        'solicitudes': len(ms),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'solicitudes_por_segundo': round(len(ms) / (ms.sum() / 1000), 1) if ms.sum() else 0,
+    }
+
+
+# Ejecuta todas las etapas para un tamaño de archivo y devuelve sus resultados
+def medir(main, filas, base, actualizacion, solicitudes, modos, repeticiones, procesos, motores):
+    resultados = []
+
+    def registrar(etapa, tiempos=None, **datos):
+        resultado = {'filas': filas, 'etapa': etapa}
+        if tiempos is not None:
+            # Se reporta la mediana de las repeticiones y el mínimo, que es el menos afectado por ruido
+            segundos = float(np.median(tiempos))
+            resultado['segundos'] = round(segundos, 3)
+            resultado['segundos_min'] = round(min(tiempos), 3)
+            resultado['filas_por_segundo'] = round(datos.get('filas_archivo', filas) / segundos) if segundos else 0
+        resultado.update(datos)
+        resultados.append(resultado)
+        print(f"  {etapa}: {json.dumps({k: v for k, v in resultado.items() if k not in ('filas', 'etapa')})}")
+
+    def vaciar():
+        # TRUNCATE vacía también el resumen, las marcas de eliminados y las huellas sin pasar por los triggers
+        with main.conexion_db() as conexion, conexion.cursor() as cursor:
+            cursor.execute("""
+                TRUNCATE incidents, incidents_resumen, incidents_eliminados, incidents_huellas, archivos_procesados,
+                archivos_avance
+            """)
+            conexion.commit()
+            cursor.execute("ANALYZE incidents")
+        main.cache_incidentes.limpiar()
+
+    # Ejecuta 'funcion' varias veces; 'preparar' deja la base de datos en el mismo estado antes de cada una
+    def cronometrar(funcion, preparar=None):
+        tiempos = []
+        for _ in range(repeticiones):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return tiempos
+
+    # Lectura del CSV con cada motor (detección de la codificación incluida)
+    for motor in motores:
+        registrar(f'lectura_{motor}', cronometrar(lambda: leer_csv(base, motor)))
+
+    # Normalización (transform.py): lectura del CSV con el motor configurado y normalización en memoria
+    motor = main.app.config['INGESTA_MOTOR']
+    registrar('normalizacion', cronometrar(lambda: normalizar_incidentes(leer_csv(base, motor))), motor=motor)
+    if procesos > 1:
+        registrar('normalizacion_paralela', cronometrar(
+            lambda: leer_archivo_paralelo(
+                base, normalizar_incidentes, procesos, main.app.config['INGESTA_TAMANO_RANGO'], motor
+            )
+        ), procesos=procesos, motor=motor)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        limpio = os.path.join(carpeta, 'limpio.parquet')
+
+        # Carga (upload_file) y actualización (update_file): el mismo trabajo que ejecuta la API en segundo plano
+        def cargar(modo):
+            main.procesar_carga(Trabajo('benchmark', 'carga'), base, limpio, modo, huella_archivo(base))
+
+        for modo in modos:
+            registrar(f'carga_{modo}', cronometrar(lambda: cargar(modo), vaciar))
+
+        # La actualización parte siempre de la tabla recién cargada
+        with open(actualizacion, encoding='utf-8') as archivo:
+            filas_actualizacion = sum(1 for _ in archivo) - 1
+        registrar(f'actualizacion_{modos[0]}', cronometrar(
+            lambda: main.procesar_actualizacion(
+                Trabajo('benchmark', 'actualizacion'), actualizacion, limpio, modos[0], huella_archivo(actualizacion)
+            ),
+            lambda: (vaciar(), cargar(modos[0]))
+        ), filas_archivo=filas_actualizacion)
+
+    with main.conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("ANALYZE incidents")
+        conexion.commit()
+
+    # Lecturas a través de la API (cliente de pruebas de Flask, sin red)
+    cliente = main.app.test_client()
+    azar = random.Random(filas)
+    numeros = [f'INC{PRIMER_NUMERO + azar.randrange(filas)}' for _ in range(solicitudes)]
+
+    # Listado en cada formato de respuesta: un objeto por incidente o columnas y filas
+    for etapa, formato in (('listar_incidentes', 'objects'), ('listar_incidentes_columnas', 'columns')):
+        latencias, tamanos = [], []
+        for number in numeros:
+            inicio = time.perf_counter()
+            respuesta = cliente.get('/incidentes', query_string={
+                'limit': main.app.config['PAGINA_DEFECTO'], 'after': number, 'format': formato
+            })
+            latencias.append(time.perf_counter() - inicio)
+            assert respuesta.status_code == 200, respuesta.status_code
+            tamanos.append(len(respuesta.data))
+        registrar(etapa, **resumen_latencias(latencias), bytes_por_respuesta=round(float(np.mean(tamanos))))
+
+    # Primera pasada sin caché y segunda con los mismos incidentes ya en caché
+    main.cache_incidentes.limpiar()
+    for etapa in ('leer_incidente', 'leer_incidente_cache'):
+        latencias = []
+        for number in numeros:
+            inicio = time.perf_counter()
+            respuesta = cliente.get(f'/incidentes/{number}')
+            latencias.append(time.perf_counter() - inicio)
+            assert respuesta.status_code == 200, respuesta.status_code
+        registrar(etapa, **resumen_latencias(latencias))
+
+    return resultados
+
+
+# Compara con una ejecución anterior: tiempo (o p50) actual / anterior por etapa; devuelve las regresiones
+def comparar(actual, anterior, umbral):
+    previos = {(r['filas'], r['etapa']): r for r in anterior['resultados']}
+    regresiones = []
+    print(f"\nComparación con {anterior.get('commit', '?')[:10]} (umbral {umbral:.0%}):")
+    for resultado in actual['resultados']:
+        previo = previos.get((resultado['filas'], resultado['etapa']))
+        if previo is None:
+            continue
+        medida = 'segundos' if 'segundos' in resultado else 'p50_ms'
+        razon = resultado[medida] / previo[medida] if previo[medida] else 1
+        marca = 'REGRESIÓN' if razon > 1 + umbral else ''
+        print(f"  {resultado['filas']:>10} {resultado['etapa']:<24} {previo[medida]:>10} -> {resultado[medida]:>10} {medida} ({razon:.2f}x) {marca}")
+        if marca:
+            regresiones.append({**resultado, 'anterior': previo[medida], 'razon': round(razon, 3)})
+    return regresiones
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Benchmark del ETL y de la API de incidentes")
+    parser.add_argument('--filas', nargs='+', default=['10k'], help="Tamaños a medir, por ejemplo 10k 1m 10m")
+    parser.add_argument('--db', required=True, help="Base de datos de pruebas; se vacía en cada tamaño")
+    parser.add_argument('--salida', help="Archivo JSON donde se guardan los resultados")
+    parser.add_argument('--comparar', help="Resultados JSON de otra ejecución para detectar regresiones")
+    parser.add_argument('--umbral', type=float, default=0.10, help="Aumento relativo que se considera regresión")
+    parser.add_argument('--solicitudes', type=int, default=200, help="Solicitudes por cada medición de lectura")
+    parser.add_argument('--modos', nargs='+', default=['completo', 'bloques'], choices=['completo', 'bloques', 'paralelo'])
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help="Procesos de la normalización paralela (y del modo 'paralelo'); 1 la omite")
+    parser.add_argument('--motores', nargs='+', default=list(MOTORES), choices=MOTORES,
+                        help="Motores de lectura del CSV que se comparan")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Veces que se repite cada etapa con tiempo")
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    # El pool toma el nombre de la base de datos de la configuración al crearse, así que se reemplaza antes de importar la API
+    if args.db == config['development'].DB_NAME:
+        parser.error(f"'{args.db}' es la base de datos de trabajo; use una base de datos exclusiva para el benchmark")
+    config['development'].DB_NAME = args.db
+    config['development'].INGESTA_PROCESOS = args.procesos
+    crear_base(args.db, config['development'])
+
+    import main  # API completa: rutas, caché y trabajos de carga
+    from migraciones import asegurar_esquema
+    asegurar_esquema()
+
+    with main.conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("SHOW server_version")
+        version_postgres = cursor.fetchone()[0]
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    ejecucion = {
+        'commit': commit,
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'postgres': version_postgres,
+        'maquina': {'sistema': platform.platform(), 'procesador': platform.processor(), 'nucleos': os.cpu_count()},
+        'semilla': args.semilla,
+        'repeticiones': args.repeticiones,
+        'procesos': args.procesos,
+        'resultados': [],
+    }
+
+    modelo = Modelo()
+    for texto in args.filas:
+        filas = filas_desde_texto(texto)
+        print(f"{filas} filas")
+        inicio = time.perf_counter()
+        base, actualizacion = archivos_sinteticos(filas, args.semilla, modelo)
+        print(f"  datos sintéticos listos en {time.perf_counter() - inicio:.1f} s")
+        ejecucion['resultados'].extend(
+            medir(main, filas, base, actualizacion, args.solicitudes, args.modos, args.repeticiones, args.procesos,
+                  args.motores)
+        )
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(ejecucion, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar(ejecucion, json.load(archivo), args.umbral)
+        if regresiones:
+            sys.exit(1)  # Permite usar el benchmark como verificación en integración continua
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,198 @@
+# Prueba de carga local que compara la API síncrona (Flask, un hilo por solicitud, psycopg2) con el servidor
+# asíncrono (Starlette + asyncpg) atendiendo lecturas con muchos clientes simultáneos.
+# Uso: python benchmarks/carga_concurrente.py --db incidentes_benchmark --concurrencias 10 100 1000 --salida carga.json
+# Cada servidor se inicia en un proceso aparte contra la base de pruebas (que se vacía y se carga con datos
+# sintéticos); los clientes son conexiones HTTP/1.1 de un solo bucle asyncio, en la misma máquina.
+import argparse  # Parámetros de la línea de comandos
+import asyncio  # Clientes simultáneos sin un hilo por cliente
+import json  # Resultados en formato legible por máquina
+import os  # Rutas y variables de entorno de los servidores
+import random  # Incidentes al azar para cada solicitud
+import socket  # Para saber cuándo el servidor ya acepta conexiones
+import subprocess  # Procesos de los servidores
+import sys  # Intérprete con el que se inician los servidores
+import tempfile  # Carpeta para el archivo limpio de la carga inicial
+import time  # Medición de tiempos
+import numpy as np  # Percentiles de latencia
+from benchmark import RAIZ, archivos_sinteticos, crear_base  # Base de pruebas y datos sintéticos del benchmark
+from generador import Modelo, PRIMER_NUMERO, filas_desde_texto  # Números de los incidentes sintéticos
+from config import config  # Parámetros de conexión; el nombre de la base se reemplaza por el de pruebas
+
+CARPETA_SRC = os.path.join(RAIZ, 'src')
+
+# La API síncrona se sirve como con app.run (servidor de Werkzeug con un hilo por solicitud), sin depuración
+# ni registro de cada solicitud en consola, que la haría más lenta
+CODIGO_SINCRONO = """
+import logging, sys
+sys.path.insert(0, sys.argv[1])
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+from main import app
+app.run(host='127.0.0.1', port=int(sys.argv[2]), threaded=True, debug=False)
+"""
+
+
+def comando_servidor(servidor, puerto):
+    if servidor == 'sincrono':
+        return [sys.executable, '-c', CODIGO_SINCRONO, CARPETA_SRC, str(puerto)]
+    return [
+        sys.executable, '-m', 'uvicorn', 'servidor_asincrono:app', '--app-dir', CARPETA_SRC,
+        '--port', str(puerto), '--log-level', 'warning', '--no-access-log'
+    ]
+
+
+# Vacía la base de pruebas y la carga con el archivo sintético, con el mismo trabajo que usa la API
+def preparar_datos(filas, semilla):
+    import main  # Se importa después de reemplazar el nombre de la base de datos
+    from migraciones import asegurar_esquema
+    from huellas import huella_archivo
+    from trabajos import Trabajo
+
+    asegurar_esquema()
+    base, _ = archivos_sinteticos(filas, semilla, Modelo())
+    with main.conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("""
+            TRUNCATE incidents, incidents_resumen, incidents_eliminados, incidents_huellas, archivos_procesados,
+            archivos_avance
+        """)
+        conexion.commit()
+    with tempfile.TemporaryDirectory() as carpeta:
+        main.procesar_carga(
+            Trabajo('carga_concurrente', 'carga'), base, os.path.join(carpeta, 'limpio.parquet'), 'bloques',
+            huella_archivo(base)
+        )
+    with main.conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("ANALYZE incidents")
+        conexion.commit()
+
+
+# Envía un GET y lee la respuesta completa; devuelve el código y si el servidor cerrará la conexión
+async def obtener(lector, escritor, ruta):
+    escritor.write(f'GET {ruta} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await escritor.drain()
+    estado = await lector.readline()
+    if not estado:
+        raise ConnectionError("El servidor cerró la conexión")
+    version, codigo = estado.split()[:2]
+    cerrar = version == b'HTTP/1.0'  # El servidor de Werkzeug responde con HTTP/1.0 y cierra cada conexión
+    largo = 0
+    while (linea := await lector.readline()) not in (b'\r\n', b''):
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        if nombre.lower() == 'content-length':
+            largo = int(valor)
+        elif nombre.lower() == 'connection':
+            cerrar = valor.strip().lower() == 'close'
+    await lector.readexactly(largo)
+    return int(codigo), cerrar
+
+
+# Un cliente: repite solicitudes hasta 'fin', reconectando cuando el servidor cierra la conexión.
+# Tres de cada cuatro solicitudes leen un incidente y la cuarta pide una página del listado.
+async def cliente(puerto, filas, fin, azar, latencias, errores):
+    conexion = None
+    while time.perf_counter() < fin:
+        numero = f'INC{PRIMER_NUMERO + azar.randrange(filas)}'
+        ruta = f'/incidentes/{numero}' if azar.random() < 0.75 else f'/incidentes?limit=50&after={numero}'
+        inicio = time.perf_counter()
+        try:
+            if conexion is None:
+                conexion = await asyncio.open_connection('127.0.0.1', puerto)
+            codigo, cerrar = await obtener(*conexion, ruta)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            errores['conexion'] = errores.get('conexion', 0) + 1
+            cerrar, codigo = True, None
+        if codigo == 200:
+            latencias.append(time.perf_counter() - inicio)
+        elif codigo is not None:
+            errores[codigo] = errores.get(codigo, 0) + 1
+        if cerrar and conexion is not None:
+            conexion[1].close()
+            conexion = None
+    if conexion is not None:
+        conexion[1].close()
+
+
+# Mide un nivel de concurrencia durante 'duracion' segundos
+async def medir_concurrencia(puerto, filas, concurrencia, duracion, semilla):
+    latencias, errores = [], {}
+    inicio = time.perf_counter()
+    fin = inicio + duracion
+    await asyncio.gather(*(
+        cliente(puerto, filas, fin, random.Random(semilla * 100000 + i), latencias, errores)
+        for i in range(concurrencia)
+    ))
+    segundos = time.perf_counter() - inicio
+    ms = np.array(latencias or [0]) * 1000
+    return {
+        'concurrencia': concurrencia,
+        'solicitudes': len(latencias),
+        'errores': {str(k): v for k, v in errores.items()},
+        'solicitudes_por_segundo': round(len(latencias) / segundos, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+# Espera a que el servidor responda; falla si el proceso termina o no responde a tiempo
+def esperar_servidor(proceso, puerto, limite=60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al iniciar (código {proceso.returncode})")
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"El servidor no respondió en {limite} s")
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Prueba de carga: API síncrona contra servidor asíncrono")
+    parser.add_argument('--db', required=True, help="Base de datos de pruebas; se vacía y se vuelve a cargar")
+    parser.add_argument('--filas', default='10k', help="Incidentes sintéticos que se cargan, por ejemplo 10k o 1m")
+    parser.add_argument('--concurrencias', nargs='+', type=int, default=[10, 100, 1000],
+                        help="Clientes simultáneos de cada medición")
+    parser.add_argument('--duracion', type=float, default=10, help="Segundos de cada medición")
+    parser.add_argument('--servidores', nargs='+', default=['sincrono', 'asincrono'], choices=['sincrono', 'asincrono'])
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--salida', help="Archivo JSON donde se guardan los resultados")
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.db == config['development'].DB_NAME:
+        parser.error(f"'{args.db}' es la base de datos de trabajo; use una base de datos exclusiva para la prueba")
+    config['development'].DB_NAME = args.db
+    crear_base(args.db, config['development'])
+    filas = filas_desde_texto(args.filas)
+    print(f"Cargando {filas} incidentes en {args.db}")
+    preparar_datos(filas, args.semilla)
+
+    # Los servidores leen el nombre de la base de datos de la variable de entorno
+    entorno = {**os.environ, 'DB_NAME': args.db}
+    resultados = []
+    for servidor in args.servidores:
+        proceso = subprocess.Popen(comando_servidor(servidor, args.puerto), env=entorno, cwd=RAIZ)
+        try:
+            esperar_servidor(proceso, args.puerto)
+            for concurrencia in args.concurrencias:
+                resultado = {'servidor': servidor, **asyncio.run(
+                    medir_concurrencia(args.puerto, filas, concurrencia, args.duracion, args.semilla)
+                )}
+                resultados.append(resultado)
+                print(f"  {servidor} {concurrencia:>5} clientes: "
+                      f"{json.dumps({k: v for k, v in resultado.items() if k not in ('servidor', 'concurrencia')})}")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'filas': filas, 'duracion': args.duracion, 'nucleos': os.cpu_count(), 'resultados': resultados
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == '__main__':
+    principal()
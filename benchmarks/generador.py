@@ -0,0 +1,149 @@
+# Generador de incidentes sintéticos con las distribuciones del archivo exportado de ServiceNow.
+# Uso: python benchmarks/generador.py 1m datos/incidentes_1m.csv [--actualizacion datos/actualizacion_1m.csv]
+import argparse  # Parámetros de la línea de comandos
+import csv  # Mismo entrecomillado que el archivo original
+import math  # Crecimiento de la cantidad de personas con el tamaño del archivo
+import os  # Rutas de los archivos
+import numpy as np  # Muestreo vectorizado
+import pandas as pd  # Lectura del archivo modelo y escritura por bloques
+import pyarrow as pa  # Formato de fechas vectorizado (mucho más rápido que strftime de pandas)
+import pyarrow.compute as pc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELO_DEFECTO = os.path.join(RAIZ, 'incident_original.csv')
+FORMATO_FECHA = '%m-%d-%Y %H:%M:%S'
+FILAS_POR_BLOQUE = 500000
+PRIMER_NUMERO = 2000000  # Los números de incidente quedan como INC2000000, INC2000001, ...
+
+# Columnas con pocos valores: se muestrean con la misma frecuencia que en el modelo
+CATEGORICAS = ('State', 'Incident CI type', 'User location', 'Assignment Group', 'Urgency', 'Severity')
+# Columnas de personas: la cantidad de valores distintos crece con el tamaño del archivo
+PERSONAS = ('Affected User', 'Assigned to', 'Created By', 'Updated By')
+
+
+# Convierte '10k', '1m' o '10000' en número de filas
+def filas_desde_texto(texto):
+    texto = texto.strip().lower()
+    multiplicador = {'k': 1000, 'm': 1000000}.get(texto[-1], 1)
+    return int(float(texto.rstrip('km')) * multiplicador)
+
+
+# Distribuciones tomadas del archivo modelo: frecuencias, personas, rango de fechas y tiempo hasta la última actualización
+class Modelo:
+    def __init__(self, ruta=MODELO_DEFECTO):
+        df = pd.read_csv(ruta, dtype=str, keep_default_na=False, encoding='utf-8')
+        self.columnas = list(df.columns)
+        self.filas = len(df)
+        self.frecuencias = {}
+        for col in CATEGORICAS:
+            conteo = df[col].value_counts()
+            self.frecuencias[col] = (conteo.index.to_numpy(), (conteo / conteo.sum()).to_numpy())
+        self.personas = {col: df[col] for col in PERSONAS}
+        creado = pd.to_datetime(df['Created'], format=FORMATO_FECHA)
+        actualizado = pd.to_datetime(df['Last update'], format=FORMATO_FECHA)
+        self.primera_fecha = creado.min()
+        self.segundos_rango = (creado.max() - creado.min()).total_seconds()
+        self.demoras = (actualizado - creado).dt.total_seconds().to_numpy()
+
+    # Valores posibles de una columna de personas para un archivo de 'filas' filas: los del modelo más otros
+    # formados con sus mismas partes (nombres y apellidos, o letras y dígitos de los usuarios).
+    # Devuelve también la probabilidad de cada valor y la fracción de vacíos.
+    def valores_persona(self, col, filas, rng):
+        originales = self.personas[col]
+        vacios = float((originales == '').mean())
+        unicos = originales[originales != ''].unique()
+        # Si en el modelo casi no se repiten (usuario afectado) se reparten por igual; si pocas personas
+        # concentran la mayoría (responsable, creado por) se usa una distribución de Zipf
+        exponente = 0 if len(unicos) > 0.8 * (originales != '').sum() else 1
+        cantidad = max(len(unicos), math.ceil(len(unicos) * math.sqrt(filas / self.filas)))
+        if ' ' in ''.join(unicos):
+            partes = [valor.split(' ', 1) for valor in unicos]
+            nombres = np.array([p[0] for p in partes])
+            apellidos = np.array([p[-1] for p in partes])
+            extra = np.char.add(np.char.add(rng.choice(nombres, cantidad), ' '), rng.choice(apellidos, cantidad))
+        else:
+            letras = np.array([valor.rstrip('0123456789') for valor in unicos])
+            extra = np.char.add(rng.choice(letras, cantidad), rng.integers(1, 999, cantidad).astype(str))
+        valores = rng.permutation(np.unique(np.concatenate([unicos, extra])))[:cantidad]
+        pesos = 1 / np.arange(1, len(valores) + 1) ** exponente
+        return valores, pesos / pesos.sum(), vacios
+
+
+# Fechas en el formato del archivo exportado (MM-DD-YYYY HH:MM:SS)
+def formatear_fechas(fechas):
+    segundos = pa.array(np.asarray(fechas, dtype='datetime64[s]'))
+    return pc.strftime(segundos, format=FORMATO_FECHA).to_numpy(zero_copy_only=False)
+
+
+# Genera las filas [inicio, inicio + filas) del archivo; el mismo bloque siempre produce lo mismo
+def generar_bloque(modelo, personas, inicio, filas, semilla):
+    rng = np.random.default_rng([semilla, inicio])
+    datos = {'Number': np.char.add('INC', (PRIMER_NUMERO + np.arange(inicio, inicio + filas)).astype(str))}
+    for col in CATEGORICAS:
+        valores, probabilidades = modelo.frecuencias[col]
+        datos[col] = rng.choice(valores, filas, p=probabilidades)
+    for col, (valores, probabilidades, vacios) in personas.items():
+        elegidos = rng.choice(valores, filas, p=probabilidades).astype(object)
+        elegidos[rng.random(filas) < vacios] = ''
+        datos[col] = elegidos
+
+    # Fechas de creación repartidas en el mismo periodo del modelo; la última actualización suma
+    # una demora tomada de las del modelo
+    creado = modelo.primera_fecha + pd.to_timedelta(rng.random(filas) * modelo.segundos_rango, unit='s')
+    actualizado = creado + pd.to_timedelta(rng.choice(modelo.demoras, filas) * rng.uniform(0.5, 1.5, filas), unit='s')
+    datos['Created'] = formatear_fechas(creado)
+    datos['Last update'] = formatear_fechas(actualizado)
+    return pd.DataFrame(datos, columns=modelo.columnas)
+
+
+# Archivo de actualización: una fracción de los incidentes cambia de estado, responsable y última actualización,
+# y se agregan incidentes nuevos al final
+def modificar_bloque(df, fraccion, rng, modelo):
+    cambian = rng.random(len(df)) < fraccion
+    cantidad = int(cambian.sum())
+    valores, probabilidades = modelo.frecuencias['State']
+    df.loc[cambian, 'State'] = rng.choice(valores, cantidad, p=probabilidades)
+    df.loc[cambian, 'Assigned to'] = rng.permutation(df['Assigned to'].to_numpy())[:cantidad]
+    ultima = pd.to_datetime(df.loc[cambian, 'Last update'], format=FORMATO_FECHA)
+    df.loc[cambian, 'Last update'] = formatear_fechas(ultima + pd.to_timedelta(rng.integers(60, 86400, cantidad), unit='s'))
+    return df[cambian]
+
+
+# Escribe un archivo de 'filas' incidentes (o su actualización) por bloques, sin tenerlo completo en memoria
+def generar_archivo(ruta, filas, semilla=1, modelo=None, actualizacion=False, fraccion_cambios=0.1, fraccion_nuevos=0.01):
+    modelo = modelo or Modelo()
+    rng = np.random.default_rng(semilla)
+    personas = {col: modelo.valores_persona(col, filas, rng) for col in PERSONAS}
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    encabezado = True
+    with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+        for inicio in range(0, filas, FILAS_POR_BLOQUE):
+            bloque = generar_bloque(modelo, personas, inicio, min(FILAS_POR_BLOQUE, filas - inicio), semilla)
+            if actualizacion:
+                bloque = modificar_bloque(bloque, fraccion_cambios, np.random.default_rng([semilla, inicio, 1]), modelo)
+            bloque.to_csv(archivo, index=False, header=encabezado, quoting=csv.QUOTE_ALL)
+            encabezado = False
+        if actualizacion:
+            # Incidentes nuevos: continúan la numeración del archivo original
+            nuevos = int(filas * fraccion_nuevos)
+            if nuevos:
+                generar_bloque(modelo, personas, filas, nuevos, semilla).to_csv(
+                    archivo, index=False, header=False, quoting=csv.QUOTE_ALL
+                )
+    return ruta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera incidentes sintéticos con las distribuciones de incident_original.csv")
+    parser.add_argument('filas', help="Cantidad de filas, por ejemplo 10k, 1m o 10m")
+    parser.add_argument('ruta', help="Archivo CSV de salida")
+    parser.add_argument('--actualizacion', help="Genera también el archivo de actualización correspondiente")
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--modelo', default=MODELO_DEFECTO, help="Archivo exportado del que se toman las distribuciones")
+    args = parser.parse_args()
+
+    modelo = Modelo(args.modelo)
+    filas = filas_desde_texto(args.filas)
+    print(f"Generado {generar_archivo(args.ruta, filas, args.semilla, modelo)}")
+    if args.actualizacion:
+        print(f"Generado {generar_archivo(args.actualizacion, filas, args.semilla, modelo, actualizacion=True)}")
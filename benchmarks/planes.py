@@ -0,0 +1,125 @@
+# Revisa con EXPLAIN que el listado y las exportaciones usen los índices de los filtros (ver migraciones.py).
+# Uso: python benchmarks/planes.py --db incidentes_benchmark --filas 1m
+#      python benchmarks/planes.py --db incidentes_benchmark   (usa los incidentes que ya tiene la base)
+# Prueba cada combinación de uno, dos y tres filtros de main.filtros_listado, tanto en la consulta paginada como
+# en la del cursor con nombre de la exportación, y termina con error si algún plan recorre secuencialmente
+# 'incidents' o una de sus particiones con datos.
+import argparse  # Parámetros de la línea de comandos
+import json  # Resultados en formato legible por máquina
+import random  # Incidente del que se toman los valores de los filtros
+import sys  # Código de salida cuando algún plan no usa índices
+from itertools import combinations  # Combinaciones de filtros
+from werkzeug.datastructures import MultiDict  # Parámetros de la solicitud, como los recibe Flask
+from benchmark import crear_base  # Base de pruebas del benchmark
+from carga_concurrente import preparar_datos  # Carga de los incidentes sintéticos
+from generador import filas_desde_texto  # Tamaños como 10k o 1m
+from config import config  # Parámetros de conexión; el nombre de la base se reemplaza por el de pruebas
+
+
+# Nodos del plan (en formato JSON) que recorren secuencialmente una tabla
+def recorridos_secuenciales(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for hijo in plan.get('Plans', []):
+        yield from recorridos_secuenciales(hijo)
+
+
+# Valores de los filtros tomados de un incidente al azar, para que cada filtro encuentre filas
+def valores_filtros(main, cursor, semilla):
+    cursor.execute("SELECT count(*) FROM incidents")
+    total = cursor.fetchone()[0]
+    if not total:
+        return None
+    cursor.execute(main.SQL_LISTADO + " ORDER BY number OFFSET %s LIMIT 1", (random.Random(semilla).randrange(total),))
+    incidente = dict(zip([c.name for c in cursor.description], cursor.fetchone()))
+    valores = {columna: incidente[columna] for columna in main.FILTROS_IGUALDAD}
+    for nombre, (columna, _) in main.FILTROS_RANGO.items():
+        valores[nombre] = incidente[columna].isoformat()
+    return valores
+
+
+# Devuelve, por cada consulta, los filtros usados y las tablas grandes que el plan recorre secuencialmente
+def revisar_planes(main, conexion, valores, minimo_filas):
+    with conexion.cursor() as cursor:
+        # Las tablas pequeñas (por ejemplo las particiones de meses futuros) se recorren enteras aunque tengan índice
+        cursor.execute("""
+            SELECT c.relname FROM pg_class c
+            WHERE (c.oid = 'incidents'::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'incidents'::regclass))
+              AND c.reltuples >= %s
+        """, (minimo_filas,))
+        grandes = {fila[0] for fila in cursor.fetchall()}
+
+    resultados = []
+    nombres = list(main.FILTROS_IGUALDAD) + list(main.FILTROS_RANGO)
+    for cantidad in (1, 2, 3):
+        for filtros in combinations(nombres, cantidad):
+            condiciones, parametros, _ = main.filtros_listado(MultiDict({n: valores[n] for n in filtros}))
+            donde = " WHERE " + " AND ".join(condiciones)
+            consultas = {
+                # Primera página de GET /incidentes con filtros (siempre paginada)
+                'pagina': (main.SQL_LISTADO + donde + " ORDER BY number LIMIT %s",
+                           parametros + [config['development'].PAGINA_DEFECTO]),
+                # Exportación: psycopg2 declara un cursor con nombre, que el planificador optimiza para las primeras filas
+                'exportacion': ("DECLARE planes CURSOR FOR" + main.SQL_LISTADO + donde + " ORDER BY number", parametros),
+            }
+            for consulta, (sql, argumentos) in consultas.items():
+                with conexion.cursor() as cursor:
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, argumentos)
+                    plan = cursor.fetchone()[0][0]['Plan']
+                conexion.rollback()
+                secuenciales = sorted(set(recorridos_secuenciales(plan)) & grandes)
+                resultados.append({'consulta': consulta, 'filtros': list(filtros), 'secuenciales': secuenciales})
+    return resultados
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Revisa que el listado y las exportaciones usen índices")
+    parser.add_argument('--db', required=True, help="Base de datos de pruebas")
+    parser.add_argument('--filas', help="Incidentes sintéticos que se cargan antes (la base se vacía); sin este "
+                                        "parámetro se usan los incidentes que ya tiene")
+    parser.add_argument('--minimo-filas', type=int, default=1000,
+                        help="Filas estimadas a partir de las que una tabla o partición no debe recorrerse entera")
+    parser.add_argument('--salida', help="Archivo JSON donde se guardan los resultados")
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.db == config['development'].DB_NAME:
+        parser.error(f"'{args.db}' es la base de datos de trabajo; use una base de datos exclusiva para la revisión")
+    config['development'].DB_NAME = args.db
+    crear_base(args.db, config['development'])
+    if args.filas:
+        filas = filas_desde_texto(args.filas)
+        print(f"Cargando {filas} incidentes en {args.db}")
+        preparar_datos(filas, args.semilla)
+
+    import main  # Se importa después de reemplazar el nombre de la base de datos
+    from migraciones import asegurar_esquema
+    asegurar_esquema()
+
+    with main.conexion_db() as conexion:
+        with conexion.cursor() as cursor:
+            cursor.execute("ANALYZE incidents")
+            valores = valores_filtros(main, cursor, args.semilla)
+        conexion.commit()
+        if valores is None:
+            parser.error(f"'{args.db}' no tiene incidentes; use --filas para cargarlos")
+        resultados = revisar_planes(main, conexion, valores, args.minimo_filas)
+
+    fallidos = [r for r in resultados if r['secuenciales']]
+    for resultado in fallidos:
+        print(f"  {resultado['consulta']} {'+'.join(resultado['filtros'])}: "
+              f"recorre secuencialmente {', '.join(resultado['secuenciales'])}")
+    print(f"{len(resultados)} planes revisados, {len(fallidos)} con recorridos secuenciales")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({'valores': valores, 'resultados': resultados}, archivo, indent=2, ensure_ascii=False, default=str)
+        print(f"Resultados guardados en {args.salida}")
+
+    if fallidos:
+        sys.exit(1)  # Permite usar la revisión como verificación en integración continua
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,208 @@
+# Carga masiva de muchos archivos CSV exportados: cada archivo se lee, se normaliza y se carga por bloques en un
+# pool de procesos (un archivo por proceso). Cada bloque se confirma junto con el avance del archivo, así una
+# carga interrumpida continúa donde quedó, y los archivos ya procesados (misma huella) se omiten.
+# Uso: python carga_masiva.py exportaciones/ "historico/**/*.csv" --procesos 4 --limpios limpios/
+#      python carga_masiva.py actualizaciones/ --tipo actualizacion --procesos 1
+# Los dos tipos fusionan los archivos con 'incidents' (los incidentes que ya existen se actualizan); el tipo solo
+# separa el registro de archivos procesados. Si varios archivos traen el mismo incidente y el orden importa, use
+# --procesos 1 (los archivos se procesan en orden alfabético).
+import argparse  # Parámetros de la línea de comandos
+import glob  # Archivos de un patrón
+import multiprocessing  # Contexto 'spawn' y cola de avance compartida entre procesos
+import os  # Rutas de los archivos
+import queue  # Espera del avance con tiempo máximo
+import sys  # Para agregar la carpeta src a la ruta de importación
+import time  # Duración y filas por segundo
+from concurrent.futures import ProcessPoolExecutor  # Pool de procesos, un archivo por proceso
+
+# Permite reutilizar los módulos de la API (carpeta src) desde este script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from config import config  # Motor de lectura, tamaño de bloque y procesos
+from basedatos import conexion_db  # Conexión propia de cada proceso
+from normalizacion import normalizar_incidentes  # Normalización compartida con la API
+from ingesta import procesar_por_bloques  # Lectura y carga solapadas
+from carga import copiar_dataframe, crear_staging  # COPY a la tabla temporal de la fusión
+from columnar import EscritorParquet  # Archivo limpio opcional (como transform.py)
+from lectores import MOTORES, detectar_codificacion  # Motores de lectura y codificación de cada archivo
+from huellas import (
+    FiltroCambios, borrar_avance, buscar_archivo, guardar_avance, huella_archivo, leer_avance, registrar_archivo
+)  # Archivos ya procesados, avance por bloques y filas sin cambios
+
+configuracion = config['development']
+TIPOS = ('carga', 'actualizacion')
+
+
+# Archivos CSV de las entradas: carpetas (sus archivos .csv), patrones glob o archivos sueltos, sin repetir
+def archivos_de(entradas):
+    archivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            archivos.extend(sorted(glob.glob(os.path.join(entrada, '*.csv'))))
+        elif os.path.isfile(entrada):
+            archivos.append(entrada)
+        else:
+            archivos.extend(sorted(glob.glob(entrada, recursive=True)))
+    return list(dict.fromkeys(os.path.abspath(archivo) for archivo in archivos))
+
+
+# Procesa un archivo completo en un proceso del pool e informa cada bloque confirmado en 'avisos'.
+# Los bloques ya confirmados en una ejecución anterior se leen (para llegar a los siguientes y completar el
+# archivo limpio) pero no se vuelven a cargar. Devuelve el resultado del archivo.
+def procesar_archivo(ruta, tipo, tamano_bloque, motor, carpeta_limpios, forzar, avisos):
+    inicio = time.perf_counter()
+    huella = huella_archivo(ruta)
+    with conexion_db() as conexion:
+        if not forzar and buscar_archivo(conexion, huella, tipo) is not None:
+            return {'ruta': ruta, 'estado': 'omitido'}
+        avance = leer_avance(conexion, huella, tipo)
+        conexion.commit()
+
+        # Al continuar se usa el tamaño de bloque con el que se empezó, para que los bloques coincidan
+        desde = avance['bloques'] if avance else 0
+        tamano_bloque = avance['tamano_bloque'] if avance else tamano_bloque
+        estado = {'bloques': 0, 'filas': avance['filas'] if avance else 0, 'sin_cambios': 0,
+                  'insertados': 0, 'actualizados': 0}
+        escritor = None
+        if carpeta_limpios:
+            nombre = os.path.splitext(os.path.basename(ruta))[0]
+            escritor = EscritorParquet(os.path.join(carpeta_limpios, f'{nombre}_limpio.parquet'))
+
+        # Cada bloque se carga y se confirma con su avance en una sola transacción
+        def cargar(bloque):
+            estado['bloques'] += 1
+            if escritor is not None:
+                escritor.escribir(bloque)
+            if estado['bloques'] <= desde:
+                return
+            # Los dos tipos pasan por la tabla temporal: un incidente que ya existe se actualiza en lugar de
+            # hacer fallar el bloque (igual que /incidentes/upload)
+            filtro = FiltroCambios(conexion)
+            crear_staging(conexion)
+            copiar_dataframe(conexion, filtro.filtrar(bloque), tabla='incidents_staging')
+            conteos = filtro.fusionar()
+            estado['insertados'] += conteos['insertados']
+            estado['actualizados'] += conteos['actualizados']
+            filtro.sin_cambios += conteos['sin_cambios']
+            estado['sin_cambios'] += filtro.sin_cambios
+            estado['filas'] += len(bloque)
+            guardar_avance(conexion, huella, tipo, ruta, tamano_bloque, estado['bloques'], estado['filas'])
+            conexion.commit()
+            avisos.put((ruta, len(bloque)))
+
+        try:
+            estadisticas = procesar_por_bloques(
+                ruta, normalizar_incidentes, cargar, tamano_bloque, configuracion.INGESTA_PROFUNDIDAD_COLA,
+                motor=motor, codificacion=configuracion.INGESTA_CODIFICACION or detectar_codificacion(ruta)
+            )
+        finally:
+            if escritor is not None:
+                escritor.cerrar()
+
+        resultado = {
+            'filas': estado['filas'],
+            'insertados': estado['insertados'],
+            'actualizados': estado['actualizados'],
+            'sin_cambios': estado['sin_cambios'],
+            'filas_por_segundo': estadisticas['filas_por_segundo'],
+            'bloques': estado['bloques'],
+            'reanudado_desde_bloque': desde,
+            'motor': motor
+        }
+        registrar_archivo(conexion, huella, tipo, resultado)
+        borrar_avance(conexion, huella, tipo)
+        conexion.commit()
+    return {'ruta': ruta, 'estado': 'completado', 'segundos': round(time.perf_counter() - inicio, 1), **resultado}
+
+
+# Muestra el avance general: archivos terminados, filas cargadas en esta ejecución y filas por segundo
+def mostrar_avance(terminados, total, filas, inicio):
+    segundos = time.perf_counter() - inicio
+    print(f"[{terminados}/{total} archivos] {filas} filas cargadas en {segundos:.0f} s "
+          f"({filas / segundos if segundos else 0:.0f} filas/s)", flush=True)
+
+
+# Reparte los archivos en el pool de procesos y muestra el avance; devuelve las filas cargadas, los archivos
+# terminados y los que fallaron
+def ejecutar(args, archivos, inicio):
+    filas = 0
+    terminados = 0
+    fallidos = []
+    with multiprocessing.Manager() as administrador:
+        avisos = administrador.Queue()  # Los procesos informan aquí cada bloque confirmado
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.procesos, mp_context=contexto) as ejecutor:
+            pendientes = {
+                ejecutor.submit(
+                    procesar_archivo, archivo, args.tipo, args.tamano_bloque, args.motor, args.limpios,
+                    args.forzar, avisos
+                ): archivo
+                for archivo in archivos
+            }
+            proximo_reporte = time.perf_counter() + args.intervalo
+            while pendientes:
+                try:
+                    filas += avisos.get(timeout=0.5)[1]
+                except queue.Empty:
+                    pass
+                for futuro in [f for f in pendientes if f.done()]:
+                    archivo = pendientes.pop(futuro)
+                    terminados += 1
+                    try:
+                        resultado = futuro.result()
+                    except Exception as ex:
+                        fallidos.append(archivo)
+                        print(f"Error en {archivo}: {ex}", flush=True)
+                        continue
+                    if resultado['estado'] == 'omitido':
+                        print(f"{archivo}: ya procesado, se omite", flush=True)
+                    else:
+                        reanudado = f", continuó desde el bloque {resultado['reanudado_desde_bloque']}" \
+                            if resultado['reanudado_desde_bloque'] else ''
+                        print(f"{archivo}: {resultado['filas']} filas ({resultado['sin_cambios']} sin cambios) "
+                              f"en {resultado['segundos']} s{reanudado}", flush=True)
+                if time.perf_counter() >= proximo_reporte:
+                    mostrar_avance(terminados, len(archivos), filas, inicio)
+                    proximo_reporte += args.intervalo
+        while not avisos.empty():
+            filas += avisos.get()[1]
+    return filas, terminados, fallidos
+
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Carga masiva de archivos CSV de incidentes con avance recuperable")
+    parser.add_argument('entradas', nargs='+', help="Carpetas, patrones glob (entre comillas) o archivos CSV")
+    parser.add_argument('--tipo', choices=TIPOS, default='carga',
+                        help="Registro de archivos procesados ('carga' o 'actualizacion'); ambos fusionan con los incidentes existentes")
+    parser.add_argument('--procesos', type=int, default=configuracion.INGESTA_PROCESOS, help="Archivos a la vez")
+    parser.add_argument('--tamano-bloque', type=int, default=configuracion.INGESTA_TAMANO_BLOQUE,
+                        help="Filas por bloque (cada bloque se confirma por separado)")
+    parser.add_argument('--motor', choices=MOTORES, default=configuracion.INGESTA_MOTOR, help="Motor de lectura del CSV")
+    parser.add_argument('--limpios', help="Carpeta donde se guarda el Parquet limpio de cada archivo")
+    parser.add_argument('--forzar', action='store_true', help="Vuelve a procesar archivos ya registrados")
+    parser.add_argument('--intervalo', type=float, default=10, help="Segundos entre cada reporte de avance")
+    args = parser.parse_args()
+
+    archivos = archivos_de(args.entradas)
+    if not archivos:
+        parser.error("No se encontraron archivos CSV en las entradas indicadas")
+    if args.limpios:
+        os.makedirs(args.limpios, exist_ok=True)
+    print(f"{len(archivos)} archivos, {args.procesos} procesos, bloques de {args.tamano_bloque} filas", flush=True)
+
+    inicio = time.perf_counter()
+    try:
+        filas, terminados, fallidos = ejecutar(args, archivos, inicio)
+    except KeyboardInterrupt:
+        # Los bloques confirmados quedan guardados: la siguiente ejecución continúa desde ahí
+        print("Carga interrumpida; vuelva a ejecutar el mismo comando para continuar", flush=True)
+        sys.exit(130)
+
+    mostrar_avance(terminados, len(archivos), filas, inicio)
+    if fallidos:
+        print(f"{len(fallidos)} archivos con error; vuelva a ejecutar el mismo comando para continuar", flush=True)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    principal()
@@ -1,52 +1,62 @@
 # Importación de las bibliotecas necesarias
-import psycopg2  # Biblioteca para conectarse a la base de datos PostgreSQL
+import argparse  # Archivo que se carga, indicado en la línea de comandos
 import pandas as pd  # Biblioteca para manejar datos tabulares, como archivos CSV
+import os  # Para construir la ruta hacia los módulos de la carpeta src
+import sys  # Para agregar la carpeta src a la ruta de importación
 
-# Leer el archivo CSV usando pandas y almacenar los datos en un DataFrame
-df = pd.read_csv("C:/Users/negro/Documents/gtim-etl-inc-1/incident_limpio.csv")
+# Permite reutilizar los módulos de la API (carpeta src) desde este script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from basedatos import obtener_conexion, liberar_conexion  # Conexión con los parámetros de config.py
+from carga import copiar_dataframe, crear_staging  # Carga masiva con COPY FROM STDIN a la tabla temporal
+from huellas import FiltroCambios  # Omite las filas ya cargadas y fusiona el resto con 'incidents'
+from migraciones import asegurar_esquema  # Crea la tabla 'incidents' y sus índices si hace falta
+
+# Uso: python cargar.py incident_limpio.parquet; para muchos archivos CSV, ver carga_masiva.py
+parser = argparse.ArgumentParser(description="Carga en 'incidents' el archivo Parquet limpio que genera transform.py")
+parser.add_argument('archivo', help="Archivo Parquet limpio")
+args = parser.parse_args()
+
+# Leer el archivo limpio que genera transform.py (Parquet: las fechas ya vienen como timestamp)
+df = pd.read_parquet(args.archivo)
+
+# Se inicializa en None para poder cerrarla con seguridad en el bloque finally
+connection = None
 
 # Intentar establecer una conexión a la base de datos PostgreSQL
 try:
-    # Conectar a la base de datos con los parámetros proporcionados (host, usuario, contraseña, base de datos)
-    connection = psycopg2.connect(
-        host='localhost',  # Dirección del servidor de la base de datos
-        user='postgres',   # Usuario para acceder a la base de datos
-        password='31102003',  # Contraseña de acceso a la base de datos
-        database='proyecto-incident'  # Nombre de la base de datos a la que se va a conectar
-    )
+    # Conectar a la base de datos con los parámetros de config.py (variables DB_HOST, DB_USER, DB_PASSWORD, DB_NAME)
+    connection = obtener_conexion()
+    if connection is None:
+        raise ConnectionError("No se pudo conectar a la base de datos")
 
     # Si la conexión es exitosa, imprimir un mensaje
     print("Conexión exitosa")
+
+    # Aplica las migraciones pendientes antes de cargar
+    asegurar_esquema()
     
-    # Crear un cursor para ejecutar comandos SQL en la base de datos
-    cursor = connection.cursor()
-
-    # Iterar sobre las filas del DataFrame (df) para insertar cada fila en la tabla 'incidents'
-    for index, row in df.iterrows():
-        # Definir la consulta SQL para insertar los datos de cada fila en la tabla
-        query = """
-            INSERT INTO incidents (number, state, created, last_update, incident_ci_type, affected_user,
-                                  user_location, assignment_group, assigned_to, urgency, severity, created_by, updated_by)
-            VALUES (%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        # Ejecutar la consulta SQL, pasando los valores de la fila como parámetros
-        # Se convierte la fila a una tupla para que coincida con el formato de la consulta SQL
-        cursor.execute(query, tuple(row))
+    # Igual que /incidentes/upload: las filas ya cargadas (misma huella) se omiten, el resto se envía con COPY a la
+    # tabla temporal y se fusiona con 'incidents', así un incidente que ya existe se actualiza en lugar de duplicarse
+    filtro = FiltroCambios(connection)
+    crear_staging(connection)
+    estadisticas = copiar_dataframe(connection, filtro.filtrar(df), tabla='incidents_staging')
+    conteos = filtro.fusionar()
 
     # Realizar un commit para guardar los cambios en la base de datos
     connection.commit()
 
     # Imprimir un mensaje de éxito si los datos se importaron correctamente
     print("Datos importados exitosamente")
+    print(f"{conteos['insertados']} insertados, {conteos['actualizados']} actualizados, "
+          f"{conteos['sin_cambios'] + filtro.sin_cambios} sin cambios")
+    print(f"{estadisticas['filas']} filas enviadas en {estadisticas['segundos']} s ({estadisticas['filas_por_segundo']} filas/s)")
 
 # Si ocurre un error durante la conexión o la ejecución del código, se captura y muestra el error
 except Exception as ex:
     print(f"Error: {ex}")
 
 finally:
-    # Cerrar el cursor y la conexión a la base de datos en el bloque finally para asegurar que se cierre incluso si ocurre un error
-    if cursor:
-        cursor.close()
+    # Cerrar la conexión a la base de datos en el bloque finally para asegurar que se cierre incluso si ocurre un error
     if connection:
-        connection.close()
+        connection.rollback()  # Sin efecto si ya se hizo commit
+        liberar_conexion(connection)
@@ -1,29 +1,14 @@
 # Importación de las bibliotecas necesarias
 from flask import Flask, jsonify, request  # Flask para crear la API
-import psycopg2  # Conector para PostgreSQL
 import csv  # Biblioteca para manipulación de archivos CSV
 import io  # Para manejar los flujos de entrada y salida de datos
 from psycopg2.extras import RealDictCursor  # Para trabajar con los resultados de la base de datos como diccionarios
 from config import config  # Importa la configuración de la base de datos
+from basedatos import obtener_conexion, liberar_conexion  # Pool de conexiones compartido
 
 app = Flask(__name__)  # Inicializa la aplicación Flask
 app.config.from_object(config['development'])  # Configura la aplicación con los parámetros de desarrollo definidos en el archivo config.py
 
-# Función para establecer la conexión con la base de datos PostgreSQL
-def obtener_conexion():
-    try:
-        # Se establece la conexión con la base de datos usando parámetros definidos directamente
-        return psycopg2.connect(
-            host="localhost",
-            database="proyecto-incident",
-            user="postgres",
-            password="31102003"
-        )
-    except Exception as ex:
-        # Si ocurre un error en la conexión, se muestra un mensaje y se retorna None
-        print(f"Error de conexión a la base de datos: {ex}")
-        return None
-
 # Ruta para listar todos los incidentes (GET)
 @app.route('/incidentes', methods=['GET'])
 def listar_incidentes():
@@ -43,14 +28,14 @@ def listar_incidentes():
             cursor.execute(sql)  # Ejecuta la consulta
             datos = cursor.fetchall()  # Recupera todos los registros
 
-        conexion.close()  # Cierra la conexión a la base de datos
-
         # Retorna los datos en formato JSON
         return jsonify({'incidentes': datos, 'mensaje': "Incidentes listados"})
 
     except Exception as ex:
         # Si ocurre un error durante la ejecución de la consulta, se captura y se retorna un mensaje de error
         return jsonify({'error': str(ex), 'mensaje': "Error al obtener los datos"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para obtener los detalles de un incidente específico (GET)
 @app.route('/incidentes/<string:number>', methods=['GET'])
@@ -80,6 +65,8 @@ def leer_incidente(number):
     except Exception as ex:
         # Si ocurre un error al ejecutar la consulta, se retorna el mensaje de error
         return jsonify({'error': str(ex), 'mensaje': "Error al obtener el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para agregar un nuevo incidente (POST)
 @app.route('/incidentes', methods=['POST'])
@@ -107,16 +94,15 @@ def agregar_incidente():
             ))
             conexion.commit()  # Guardar los cambios en la base de datos
 
-        conexion.close()
         # Responde con un mensaje de éxito
         return jsonify({'mensaje': "Incidente agregado exitosamente"}), 201
 
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Si ocurre un error, deshacer los cambios
-            conexion.close()
+        conexion.rollback()  # Si ocurre un error, deshacer los cambios
         # Retorna un error si algo falla
         return jsonify({'error': str(ex), 'mensaje': "Error al agregar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para actualizar un incidente existente (PUT)
 @app.route('/incidentes/<string:number>', methods=['PUT'])
@@ -165,15 +151,14 @@ def actualizar_incidente(number):
             ))
             conexion.commit()  # Guardar los cambios
 
-        conexion.close()
         # Responde con un mensaje de éxito
         return jsonify({'mensaje': "Incidente actualizado exitosamente"}), 200
 
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Deshacer cambios en caso de error
-            conexion.close()
+        conexion.rollback()  # Deshacer cambios en caso de error
         return jsonify({'error': str(ex), 'mensaje': "Error al actualizar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para eliminar un incidente (DELETE)
 @app.route('/incidentes/<string:number>', methods=['DELETE'])
@@ -202,15 +187,14 @@ def eliminar_incidente(number):
             cursor.execute(sql_delete, (number,))
             conexion.commit()  # Guardar los cambios
 
-        conexion.close()
         # Responde con un mensaje de éxito
         return jsonify({'mensaje': "Incidente eliminado exitosamente"}), 200
 
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Deshacer cambios en caso de error
-            conexion.close()
+        conexion.rollback()  # Deshacer cambios en caso de error
         return jsonify({'error': str(ex), 'mensaje': "Error al eliminar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 
 # Manejador de error 404: si la ruta no existe
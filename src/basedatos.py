@@ -0,0 +1,193 @@
+# Pool de conexiones a PostgreSQL compartido por todo el proceso
+import threading  # Para proteger el pool y sus contadores entre hilos
+import time  # Para saber cuánto tiempo lleva inactiva cada conexión
+from contextlib import contextmanager  # Para ofrecer el pool como bloque 'with'
+import psycopg2  # Conector para PostgreSQL
+from psycopg2 import errors, extensions, pool  # Errores de candados, estados de transacción y error de pool agotado
+from config import config  # Parámetros de conexión y tamaño del pool
+
+configuracion = config['development']
+
+
+# Pool con tiempo máximo de espera, verificación de conexiones inactivas y estadísticas de uso.
+# Las conexiones inactivas se guardan en una lista propia: se abren 'minimo' al crear el pool y, una vez abiertas,
+# se conservan hasta 'maximo' para no reconectar (el semáforo nunca deja que haya más de 'maximo' a la vez).
+class PoolConexiones:
+    def __init__(self, minimo, maximo, tiempo_espera, verificar_tras, **parametros):
+        self._parametros = parametros
+        self._inactivas = [psycopg2.connect(**parametros) for _ in range(minimo)]
+        # El semáforo permite esperar un tiempo cuando están todas entregadas, en lugar de fallar de inmediato
+        self._disponibles = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        self._ultimo_uso = {}  # id(conexion) -> momento en que se devolvió al pool
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tiempo_espera = tiempo_espera
+        self.verificar_tras = verificar_tras
+        self.en_uso = 0
+        self.entregadas = 0
+        self.agotadas = 0
+        self.reconexiones = 0
+
+    # Comprueba que una conexión siga viva antes de entregarla
+    def _esta_sana(self, conexion):
+        if conexion.closed:
+            return False
+        # Solo se consulta al servidor si la conexión lleva tiempo sin usarse, para no pagar un viaje extra siempre
+        inactiva = time.monotonic() - self._ultimo_uso.get(id(conexion), 0)
+        if inactiva < self.verificar_tras:
+            return True
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conexion.rollback()  # Cierra la transacción abierta por la verificación
+            return True
+        except psycopg2.Error:
+            return False
+
+    # Entrega una conexión del pool, esperando como máximo 'tiempo_espera' segundos
+    def obtener(self):
+        if not self._disponibles.acquire(timeout=self.tiempo_espera):
+            with self._lock:
+                self.agotadas += 1
+            raise pool.PoolError(f"No hay conexiones libres después de {self.tiempo_espera} s")
+
+        try:
+            with self._lock:
+                conexion = self._inactivas.pop() if self._inactivas else None
+            if conexion is None:
+                conexion = psycopg2.connect(**self._parametros)
+            elif not self._esta_sana(conexion):
+                # La conexión estaba caída: se descarta y se abre una nueva
+                self._cerrar(conexion)
+                conexion = psycopg2.connect(**self._parametros)
+                with self._lock:
+                    self.reconexiones += 1
+        except Exception:
+            self._disponibles.release()
+            raise
+
+        with self._lock:
+            self.en_uso += 1
+            self.entregadas += 1
+        return conexion
+
+    # Devuelve una conexión al pool dejando limpia su transacción
+    def liberar(self, conexion):
+        cerrar = bool(conexion.closed)
+        if not cerrar:
+            try:
+                # Cualquier transacción pendiente se deshace para que el siguiente uso empiece limpio
+                if conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conexion.rollback()
+            except psycopg2.Error:
+                cerrar = True
+
+        if cerrar:
+            self._cerrar(conexion)
+        with self._lock:
+            if not cerrar:
+                self._ultimo_uso[id(conexion)] = time.monotonic()
+                self._inactivas.append(conexion)
+            self.en_uso -= 1
+        self._disponibles.release()
+
+    def _cerrar(self, conexion):
+        with self._lock:
+            self._ultimo_uso.pop(id(conexion), None)
+        try:
+            conexion.close()
+        except psycopg2.Error:
+            pass
+
+    # Estadísticas del pool para monitoreo
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'en_uso': self.en_uso,
+                'libres': self.maximo - self.en_uso,
+                'entregadas': self.entregadas,
+                'agotadas': self.agotadas,
+                'reconexiones': self.reconexiones
+            }
+
+
+_pool = None  # Pool único del proceso, se crea con la primera conexión solicitada
+_pool_lock = threading.Lock()
+
+
+# Devuelve el pool del proceso, creándolo la primera vez
+def obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexiones(
+                    configuracion.DB_POOL_MIN,
+                    configuracion.DB_POOL_MAX,
+                    configuracion.DB_POOL_TIMEOUT,
+                    configuracion.DB_POOL_VERIFICAR,
+                    host=configuracion.DB_HOST,
+                    database=configuracion.DB_NAME,
+                    user=configuracion.DB_USER,
+                    password=configuracion.DB_PASSWORD
+                )
+    return _pool
+
+
+# Obtiene una conexión del pool; retorna None si no hay conexión disponible
+def obtener_conexion():
+    try:
+        return obtener_pool().obtener()
+    except Exception as ex:
+        print(f"Error de conexión a la base de datos: {ex}")  # Si ocurre un error, se imprime en la consola
+        return None
+
+
+# Devuelve la conexión al pool (reemplaza a conexion.close())
+def liberar_conexion(conexion):
+    if conexion is not None:
+        obtener_pool().liberar(conexion)
+
+
+# Bloque 'with' que entrega una conexión, deshace la transacción si hay error y siempre la devuelve al pool
+@contextmanager
+def conexion_db():
+    conexion = obtener_pool().obtener()
+    try:
+        yield conexion
+    except Exception:
+        if not conexion.closed:
+            conexion.rollback()
+        raise
+    finally:
+        liberar_conexion(conexion)
+
+
+# Estadísticas del pool; si aún no se ha creado se reporta vacío
+def estadisticas_pool():
+    if _pool is None:
+        return {'minimo': configuracion.DB_POOL_MIN, 'maximo': configuracion.DB_POOL_MAX, 'en_uso': 0, 'libres': 0,
+                'entregadas': 0, 'agotadas': 0, 'reconexiones': 0}
+    return _pool.estadisticas()
+
+
+# Toma el candado exclusivo de las tablas (para cambios de estructura) con un tiempo máximo por intento: mientras
+# se espera un candado, las lecturas nuevas quedan en cola detrás, así que es mejor soltarlo y reintentar que
+# bloquearlas detrás de una carga larga. Un bloqueo mutuo con otra transacción también se reintenta.
+def bloquear_tablas(cursor, tablas, espera, intentos):
+    for intento in range(intentos):
+        cursor.execute("SAVEPOINT candado_tablas")
+        cursor.execute("SET LOCAL lock_timeout = %s", (f'{int(espera * 1000)}ms',))
+        try:
+            cursor.execute(f"LOCK TABLE {', '.join(tablas)} IN ACCESS EXCLUSIVE MODE")
+        except (errors.LockNotAvailable, errors.DeadlockDetected):
+            cursor.execute("ROLLBACK TO SAVEPOINT candado_tablas")
+            time.sleep(min(espera, 0.1 * 2 ** intento))
+            continue
+        cursor.execute("SET LOCAL lock_timeout = 0")
+        cursor.execute("RELEASE SAVEPOINT candado_tablas")
+        return
+    raise TimeoutError(f"No se obtuvo el candado de {', '.join(tablas)} después de {intentos} intentos")
@@ -0,0 +1,87 @@
+# Pool de conexiones asíncrono a PostgreSQL (asyncpg) para el servidor ASGI: una solicitud que espera una
+# conexión o el resultado de una consulta no ocupa un hilo, así un solo proceso atiende miles de lecturas a la vez
+import asyncio  # Tiempo de espera al pedir una conexión
+import itertools  # Numeración de los parámetros
+import json  # Columnas JSONB como objetos de Python
+import re  # Conversión de los parámetros %s a $1, $2, ...
+from contextlib import asynccontextmanager  # Para ofrecer el pool como bloque 'async with'
+import asyncpg  # Conector asíncrono para PostgreSQL
+from config import config  # Parámetros de conexión y tamaño del pool
+
+configuracion = config['development']
+
+
+# asyncpg usa parámetros numerados ($1, $2, ...); los filtros compartidos con la API síncrona usan %s
+def posicionales(sql):
+    numeros = itertools.count(1)
+    return re.sub(r'%s', lambda _: f'${next(numeros)}', sql)
+
+
+# Cada conexión nueva devuelve las columnas JSONB como objetos de Python, igual que psycopg2
+async def _preparar_conexion(conexion):
+    await conexion.set_type_codec('jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+# Pool con tiempo máximo de espera y estadísticas de uso, como PoolConexiones de basedatos.py. Solo se usa
+# desde el bucle de eventos del servidor, así que los contadores no necesitan lock.
+class PoolAsincrono:
+    def __init__(self, minimo, maximo, tiempo_espera, **parametros):
+        self._parametros = parametros
+        self._pool = None
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tiempo_espera = tiempo_espera
+        self.en_uso = 0
+        self.entregadas = 0
+        self.agotadas = 0
+
+    # Abre las conexiones iniciales; se llama al iniciar el servidor
+    async def abrir(self):
+        self._pool = await asyncpg.create_pool(
+            min_size=self.minimo, max_size=self.maximo, init=_preparar_conexion, **self._parametros
+        )
+
+    async def cerrar(self):
+        if self._pool is not None:
+            await self._pool.close()
+
+    # Bloque 'async with' que entrega una conexión, esperando como máximo 'tiempo_espera' segundos, y siempre
+    # la devuelve al pool (asyncpg deshace la transacción que haya quedado abierta)
+    @asynccontextmanager
+    async def conexion(self):
+        try:
+            conexion = await self._pool.acquire(timeout=self.tiempo_espera)
+        except asyncio.TimeoutError:
+            self.agotadas += 1
+            raise ConnectionError(f"No hay conexiones libres después de {self.tiempo_espera} s") from None
+        self.en_uso += 1
+        self.entregadas += 1
+        try:
+            yield conexion
+        finally:
+            self.en_uso -= 1
+            await self._pool.release(conexion)
+
+    # Estadísticas del pool para monitoreo, con las mismas claves que las del pool síncrono
+    def estadisticas(self):
+        return {
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'en_uso': self.en_uso,
+            'libres': self.maximo - self.en_uso,
+            'entregadas': self.entregadas,
+            'agotadas': self.agotadas
+        }
+
+
+# Pool del servidor asíncrono con la configuración de la base de datos
+def crear_pool():
+    return PoolAsincrono(
+        configuracion.ASGI_POOL_MIN,
+        configuracion.ASGI_POOL_MAX,
+        configuracion.DB_POOL_TIMEOUT,
+        host=configuracion.DB_HOST,
+        database=configuracion.DB_NAME,
+        user=configuracion.DB_USER,
+        password=configuracion.DB_PASSWORD
+    )
@@ -0,0 +1,208 @@
+# Caché de lectura para los incidentes consultados con frecuencia
+import threading  # Para proteger el caché local entre hilos
+import time  # Para la expiración de las entradas (TTL)
+import uuid  # Versión de una entrada del caché compartido
+from collections import OrderedDict  # Orden de uso para descartar la entrada menos usada (LRU)
+from datetime import datetime  # Fechas de los incidentes guardados en el caché compartido
+from serializacion import a_json, desde_json  # Los valores del caché compartido se guardan como JSON
+
+try:
+    import redis  # Caché compartido opcional entre procesos
+except ImportError:
+    redis = None
+
+
+# Caché en memoria del proceso con tamaño máximo (LRU) y tiempo de vida por entrada (TTL).
+# 'version' cambia con cada invalidación: un valor leído de la base de datos antes de una invalidación ya no se
+# guarda (ver CacheIncidentes.obtener).
+class CacheLocal:
+    def __init__(self, tamano, ttl):
+        self.tamano = tamano
+        self.ttl = ttl
+        self.version = 0
+        self._datos = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                del self._datos[clave]  # La entrada expiró
+                return None
+            self._datos.move_to_end(clave)  # Marca la entrada como usada recientemente
+            return entrada[1]
+
+    # Guarda el valor solo si no hubo invalidaciones desde 'version'
+    def guardar(self, clave, valor, version):
+        with self._lock:
+            if version != self.version:
+                return
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)  # Descarta la entrada menos usada
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+            self.version += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.version += 1
+
+    def __len__(self):
+        return len(self._datos)
+
+
+# Valor del caché compartido como JSON, nunca con pickle: quien pueda escribir en el servidor de caché no debe
+# poder ejecutar código en la API. Las fechas se escriben en ISO 8601 y se indican aparte para recuperarlas.
+def valor_a_json(valor):
+    return a_json({'fechas': [k for k, v in valor.items() if isinstance(v, datetime)], 'valor': valor})
+
+
+def valor_desde_json(texto):
+    datos = desde_json(texto)
+    valor = datos['valor']
+    for clave in datos['fechas']:
+        valor[clave] = datetime.fromisoformat(valor[clave])
+    return valor
+
+
+# Scripts del caché compartido: cada operación es un solo viaje al servidor y ve la generación y la versión
+# actuales. KEYS[1] es la clave de la generación; ARGV[1] el prefijo y ARGV[2] la clave del incidente.
+# Lectura: devuelve la generación, la versión de la clave y el valor (nil si no está).
+_LUA_OBTENER = """
+local generacion = redis.call('GET', KEYS[1]) or '0'
+local version = redis.call('GET', ARGV[1] .. ':version:' .. ARGV[2]) or ''
+return {generacion, version, redis.call('GET', ARGV[1] .. ':' .. generacion .. ':' .. ARGV[2])}
+"""
+# Escritura condicional: solo si la generación y la versión siguen siendo las de la lectura (ARGV[3] y ARGV[4])
+_LUA_GUARDAR = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[3] then return 0 end
+if (redis.call('GET', ARGV[1] .. ':version:' .. ARGV[2]) or '') ~= ARGV[4] then return 0 end
+redis.call('SET', ARGV[1] .. ':' .. ARGV[3] .. ':' .. ARGV[2], ARGV[5], 'EX', ARGV[6])
+return 1
+"""
+# Invalidación: versión nueva (ARGV[3], que expira en ARGV[4] segundos) y borrado del valor de la generación actual
+_LUA_INVALIDAR = """
+local generacion = redis.call('GET', KEYS[1]) or '0'
+redis.call('SET', ARGV[1] .. ':version:' .. ARGV[2], ARGV[3], 'EX', ARGV[4])
+redis.call('DEL', ARGV[1] .. ':' .. generacion .. ':' .. ARGV[2])
+return 1
+"""
+
+
+# Caché compartido en Redis (o cualquier servidor compatible con scripts Lua, por ejemplo uno local para pruebas).
+# Vaciarlo incrementa una "generación" incluida en las claves, así no hay que borrar clave por clave; invalidar una
+# clave le asigna una versión nueva. La lectura devuelve la generación y la versión que vio, y la escritura del
+# valor leído de la base de datos solo se hace si no cambiaron: así una lectura concurrente no vuelve a guardar un
+# valor anterior a una invalidación ya hecha por otro proceso.
+class CacheCompartido:
+    def __init__(self, url, ttl, prefijo='incidentes'):
+        if redis is None:
+            raise RuntimeError("Para usar CACHE_URL se necesita el paquete 'redis'")
+        self._cliente = redis.Redis.from_url(url)
+        self.ttl = ttl
+        # Las versiones duran más que los valores: si una expira entre la lectura y la escritura de otra
+        # solicitud, la escritura de esa solicitud se descarta o ya no importa
+        self.ttl_version = max(60, 10 * ttl)
+        self.prefijo = prefijo
+        self._generacion = f'{prefijo}:generacion'
+        self._obtener = self._cliente.register_script(_LUA_OBTENER)
+        self._guardar = self._cliente.register_script(_LUA_GUARDAR)
+        self._invalidar = self._cliente.register_script(_LUA_INVALIDAR)
+
+    # Devuelve (valor o None, versión leída)
+    def obtener(self, clave):
+        generacion, version, valor = self._obtener(keys=[self._generacion], args=[self.prefijo, clave])
+        return (valor_desde_json(valor) if valor is not None else None), (generacion.decode(), version.decode())
+
+    def guardar(self, clave, valor, version):
+        generacion, version_clave = version
+        self._guardar(
+            keys=[self._generacion],
+            args=[self.prefijo, clave, generacion, version_clave, valor_a_json(valor), self.ttl]
+        )
+
+    def invalidar(self, clave):
+        self._invalidar(keys=[self._generacion], args=[self.prefijo, clave, uuid.uuid4().hex, self.ttl_version])
+
+    def limpiar(self):
+        self._cliente.incr(self._generacion)
+
+
+# Caché de lectura de incidentes: el local del proceso o, si está configurado, el compartido. Con el compartido no
+# se guarda además una copia en cada proceso, porque las invalidaciones de un proceso no llegarían a los demás.
+# Lleva contadores de aciertos y fallos para ajustar su tamaño.
+class CacheIncidentes:
+    def __init__(self, tamano, ttl, url=None):
+        self.compartido = CacheCompartido(url, ttl) if url else None
+        self.local = CacheLocal(tamano, ttl) if self.compartido is None else None
+        self.tamano = tamano
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    # Ejecuta una operación en el caché compartido; si el servidor no responde se sigue sin caché
+    def _en_compartido(self, operacion, *args):
+        try:
+            return getattr(self.compartido, operacion)(*args)
+        except Exception as ex:
+            print(f"Error en el caché compartido: {ex}")
+            return None
+
+    def _contar(self, acierto):
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+
+    # Devuelve (valor o None, versión). Si no estaba, la versión se pasa a 'guardar' junto con el valor leído de
+    # la base de datos: se lee antes de consultarla, así una invalidación intermedia impide guardar un valor viejo.
+    def obtener(self, clave):
+        if self.compartido is not None:
+            valor, version = self._en_compartido('obtener', clave) or (None, None)
+        else:
+            version = self.local.version
+            valor = self.local.obtener(clave)
+        self._contar(valor is not None)
+        return valor, version
+
+    def guardar(self, clave, valor, version):
+        if self.compartido is None:
+            self.local.guardar(clave, valor, version)
+        elif version is not None:  # Sin versión el servidor no respondió al leer
+            self._en_compartido('guardar', clave, valor, version)
+
+    # Elimina una entrada; se llama después de confirmar el cambio en la base de datos
+    def invalidar(self, clave):
+        if self.compartido is None:
+            self.local.invalidar(clave)
+        else:
+            self._en_compartido('invalidar', clave)
+
+    # Vacía todo el caché (cargas de archivos y borrado total)
+    def limpiar(self):
+        if self.compartido is None:
+            self.local.limpiar()
+        else:
+            self._en_compartido('limpiar')
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0,
+                'entradas_locales': len(self.local) if self.local is not None else 0,
+                'tamano': self.tamano,
+                'ttl': self.ttl,
+                'compartido': self.compartido is not None
+            }
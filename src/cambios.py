@@ -0,0 +1,172 @@
+# Registro de cambios de 'incidents' para sistemas que mantienen una copia: solo se envía lo que cambió
+import base64  # Cursor opaco para el cliente
+import json  # Contenido del cursor
+from datetime import datetime  # Validación del parámetro 'since'
+from psycopg2.extras import RealDictCursor  # Resultados como diccionarios
+from migraciones import asegurar_esquema  # Posición de cada cambio y tabla de eliminados (migraciones 5 y 8)
+
+# Posición anterior a cualquier cambio: (transacción, secuencia) del último cambio entregado (ver migración 8) y
+# las transacciones pendientes (ver consultar_cambios)
+INICIO = ('0', 0, ())
+
+# Incidentes y marcas de eliminados mezclados en orden de posición (cambio_xid, cambio), que asigna el servidor al
+# escribir la fila: los posteriores a la posición y los de las transacciones pendientes que ya confirmaron, desde
+# lo último entregado de cada una. Cada parte usa su índice y se corta en 'limite', así el costo depende del tamaño
+# de la página y no del de la tabla.
+_SQL_CAMBIOS = """
+WITH pendientes AS (
+    SELECT p.xid::xid8 AS xid, p.cambio FROM unnest(%(pendientes_xid)s::text[], %(pendientes_cambio)s::bigint[]) AS p (xid, cambio)
+)
+SELECT c.* FROM (
+    (SELECT cambio_xid AS posicion_xid, cambio AS posicion, false AS eliminado, NULL::timestamp AS eliminado_en,
+            number, state, created, last_update, incident_ci_type, affected_user, user_location,
+            assignment_group, assigned_to, urgency, severity, created_by, updated_by
+     FROM incidents
+     WHERE (cambio_xid, cambio) > (%(xid)s::xid8, %(cambio)s)
+     ORDER BY cambio_xid, cambio
+     LIMIT %(limite)s)
+    UNION ALL
+    (SELECT cambio_xid, cambio, true, eliminado_en,
+            number, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+     FROM incidents_eliminados
+     WHERE (cambio_xid, cambio) > (%(xid)s::xid8, %(cambio)s)
+     ORDER BY cambio_xid, cambio
+     LIMIT %(limite)s)
+    UNION ALL
+    (SELECT i.* FROM pendientes p, LATERAL (
+        SELECT cambio_xid, cambio, false, NULL::timestamp,
+               number, state, created, last_update, incident_ci_type, affected_user, user_location,
+               assignment_group, assigned_to, urgency, severity, created_by, updated_by
+        FROM incidents
+        WHERE cambio_xid = p.xid AND cambio > p.cambio
+        ORDER BY cambio
+        LIMIT %(limite)s
+     ) i)
+    UNION ALL
+    (SELECT e.* FROM pendientes p, LATERAL (
+        SELECT cambio_xid, cambio, true, eliminado_en,
+               number, NULL, NULL::timestamp, NULL::timestamp, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+        FROM incidents_eliminados
+        WHERE cambio_xid = p.xid AND cambio > p.cambio
+        ORDER BY cambio
+        LIMIT %(limite)s
+     ) e)
+) c
+ORDER BY c.posicion_xid, c.posicion
+LIMIT %(limite)s
+"""
+
+# Transacciones que siguen en curso según la instantánea de la consulta
+_SQL_EN_CURSO = """
+SELECT coalesce(array_agg(x::text), '{}') AS en_curso FROM pg_snapshot_xip(pg_current_snapshot()) AS x
+"""
+
+# Posición justo antes del primer cambio con 'last_update' (o fecha de eliminación) igual o posterior a 'since'.
+# Desde ahí se entregan también los cambios posteriores con fechas anteriores, que el cliente tampoco tiene. Sin
+# ninguno, se empieza después de la última transacción asignada; las que siguen en curso quedan pendientes.
+_SQL_DESDE = """
+SELECT coalesce(
+    (SELECT ARRAY[p.cambio_xid::text, (p.cambio - 1)::text] FROM (
+        (SELECT cambio_xid, cambio FROM incidents WHERE last_update >= %(since)s ORDER BY cambio_xid, cambio LIMIT 1)
+        UNION ALL
+        (SELECT cambio_xid, cambio FROM incidents_eliminados WHERE eliminado_en >= %(since)s
+         ORDER BY cambio_xid, cambio LIMIT 1)
+     ) p ORDER BY p.cambio_xid, p.cambio LIMIT 1),
+    ARRAY[pg_snapshot_xmax(pg_current_snapshot())::text, '-1']
+) AS posicion
+"""
+
+
+# Codifica la posición del último cambio entregado y las transacciones pendientes
+def codificar_cursor(posicion):
+    xid, cambio, pendientes = posicion
+    return base64.urlsafe_b64encode(json.dumps([xid, cambio, [list(p) for p in pendientes]]).encode()).decode()
+
+
+def _es_posicion(xid, cambio):
+    return isinstance(xid, str) and xid.isdigit() and isinstance(cambio, int)
+
+
+# Decodifica un cursor recibido del cliente; ValueError si no es válido. Los cursores sin pendientes (anteriores a
+# que existieran) siguen siendo válidos.
+def decodificar_cursor(cursor):
+    try:
+        contenido = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        xid, cambio, pendientes = contenido if len(contenido) == 3 else (*contenido, [])
+        pendientes = tuple((p_xid, p_cambio) for p_xid, p_cambio in pendientes)
+        if not (_es_posicion(xid, cambio) and all(_es_posicion(*p) for p in pendientes)):
+            raise ValueError
+    except Exception:
+        raise ValueError("El parámetro 'cursor' no es válido")
+    return xid, cambio, pendientes
+
+
+# Fecha del parámetro 'since'; ValueError si no es válida
+def fecha_desde(since):
+    try:
+        return datetime.fromisoformat(since)
+    except ValueError:
+        raise ValueError(f"Fecha inválida en 'since': {since}")
+
+
+# Nueva posición tras entregar 'filas' (en orden de posición) a partir de la posición (xid, cambio, pendientes).
+# Una transacción anterior a la posición que seguía en curso no era visible: queda pendiente con lo último entregado
+# de ella y sus cambios se entregan cuando confirma, sin detener el resto del registro. Deja de estar pendiente
+# cuando terminó y ya se entregó todo lo suyo, es decir, si la página no se cortó antes de llegar a ella.
+def avanzar_posicion(posicion, filas, hay_mas, en_curso):
+    xid, cambio, pendientes = posicion
+    pendientes = dict(pendientes)
+    for fila in filas:
+        fila_xid = str(fila['posicion_xid'])
+        if fila_xid in pendientes:
+            pendientes[fila_xid] = fila['posicion']
+        else:
+            xid, cambio = fila_xid, fila['posicion']
+    ultima = int(filas[-1]['posicion_xid']) if filas else None
+    en_curso = set(en_curso)
+    pendientes = {
+        p_xid: p_cambio for p_xid, p_cambio in pendientes.items()
+        if p_xid in en_curso or (hay_mas and int(p_xid) >= ultima)
+    }
+    for p_xid in en_curso:
+        if int(p_xid) < int(xid):
+            pendientes.setdefault(p_xid, -1)
+    return xid, cambio, tuple(sorted(pendientes.items(), key=lambda p: int(p[0])))
+
+
+# Devuelve (cambios, nueva posición, hay_mas) a partir de la posición indicada o, sin posición, de la fecha 'desde'.
+# Las consultas comparten una instantánea (REPEATABLE READ), así las transacciones en curso son exactamente las que
+# no se vieron.
+def consultar_cambios(conexion, posicion, limite, desde=None):
+    asegurar_esquema()
+    conexion.rollback()  # La instantánea tiene que ser la de una transacción nueva
+    with conexion.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute(_SQL_EN_CURSO)
+        en_curso = cursor.fetchone()['en_curso']
+        if posicion is None:
+            cursor.execute(_SQL_DESDE, {'since': desde})
+            xid, cambio = cursor.fetchone()['posicion']
+            posicion = avanzar_posicion((xid, int(cambio), ()), [], False, en_curso)
+        xid, cambio, pendientes = posicion
+        # Se pide una fila de más para saber si quedan cambios sin entregar
+        cursor.execute(_SQL_CAMBIOS, {
+            'xid': xid, 'cambio': cambio, 'limite': limite + 1,
+            'pendientes_xid': [p[0] for p in pendientes], 'pendientes_cambio': [p[1] for p in pendientes]
+        })
+        filas = cursor.fetchall()
+    conexion.rollback()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    posicion = avanzar_posicion(posicion, filas, hay_mas, en_curso)
+
+    cambios = []
+    for fila in filas:
+        if fila['eliminado']:
+            cambios.append({'number': fila['number'], 'eliminado': True, 'eliminado_en': fila['eliminado_en']})
+        else:
+            for clave in ('posicion_xid', 'posicion', 'eliminado_en'):
+                del fila[clave]
+            cambios.append(dict(fila))
+    return cambios, posicion, hay_mas
@@ -0,0 +1,126 @@
+# Módulo de carga masiva de incidentes en PostgreSQL usando COPY FROM STDIN
+import io  # Para construir el búfer en memoria que se envía a COPY
+import time  # Para medir la duración de la carga y calcular filas por segundo
+from normalizacion import COLUMNAS  # Columnas de la tabla 'incidents' en el orden en que se cargan
+from metricas import medir  # Duración de la serialización y del COPY
+from particiones import asegurar_particiones  # Partición de cada mes antes de copiar
+
+# Tablas cuyas filas terminan en 'incidents': antes del COPY se crean las particiones de sus meses
+TABLAS_PARTICIONADAS = ('incidents', 'incidents_staging')
+
+# Formato con el que se escriben las fechas en el búfer (PostgreSQL lo interpreta como TIMESTAMP)
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Orden de la fusión: si el archivo repite un incidente se conserva la versión con el 'last_update' más reciente
+# (huellas.FiltroCambios registra la huella de esa misma fila)
+ORDEN_FUSION = 'number, last_update DESC NULLS LAST'
+
+# Cantidad de filas que se serializan en cada búfer antes de enviarlo a la base de datos
+FILAS_POR_BLOQUE = 50000
+
+
+# Convierte un bloque del DataFrame a CSV dentro de un búfer en memoria
+def dataframe_a_buffer(df):
+    buffer = io.StringIO()
+    # Los valores nulos (NaN/NaT) se escriben como campo vacío sin comillas, que COPY interpreta como NULL
+    df.to_csv(buffer, index=False, header=False, date_format=FORMATO_FECHA, na_rep='')
+    buffer.seek(0)  # Regresa al inicio para que COPY lea desde el principio
+    return buffer
+
+
+# Carga un DataFrame completo en la tabla indicada con COPY, sin hacer commit (lo decide quien llama).
+# 'al_avanzar' (opcional) recibe las filas enviadas hasta el momento después de cada bloque y 'tramos' (opcional)
+# acumula por separado el tiempo de serializar a CSV y el de enviar con COPY.
+def copiar_dataframe(conexion, df, tabla='incidents', filas_por_bloque=FILAS_POR_BLOQUE, al_avanzar=None, tramos=None):
+    # El DataFrame se carga por posición, igual que la inserción fila por fila que reemplaza
+    if len(df.columns) != len(COLUMNAS):
+        raise ValueError(f"Se esperaban {len(COLUMNAS)} columnas y se recibieron {len(df.columns)}")
+
+    sql = f"COPY {tabla} ({', '.join(COLUMNAS)}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    inicio = time.perf_counter()
+
+    if tabla in TABLAS_PARTICIONADAS:
+        with medir(tramos, 'particiones'):
+            asegurar_particiones(conexion, df.iloc[:, COLUMNAS.index('created')])
+
+    with conexion.cursor() as cursor:
+        # Se envía el DataFrame en bloques para que el búfer en memoria no crezca con el tamaño del archivo
+        for desde in range(0, len(df), filas_por_bloque):
+            with medir(tramos, 'serializacion'):
+                buffer = dataframe_a_buffer(df.iloc[desde:desde + filas_por_bloque])
+            with medir(tramos, 'copia'):
+                cursor.copy_expert(sql, buffer)
+            if al_avanzar:
+                al_avanzar(min(desde + filas_por_bloque, len(df)))
+
+    return estadisticas_carga(len(df), time.perf_counter() - inicio)
+
+
+# Construye el resumen de una carga: filas, duración y velocidad en filas por segundo
+def estadisticas_carga(filas, segundos):
+    return {
+        'filas': filas,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos) if segundos > 0 else filas
+    }
+
+
+# Columnas que se comparan y se sobrescriben cuando un incidente ya existe (igual que el ON CONFLICT original)
+COLUMNAS_ACTUALIZABLES = (
+    'state', 'last_update', 'incident_ci_type', 'affected_user', 'user_location',
+    'assignment_group', 'assigned_to', 'urgency', 'severity', 'updated_by'
+)
+
+
+# Crea la tabla temporal de preparación con la misma estructura que 'incidents'; se elimina al hacer commit
+def crear_staging(conexion):
+    with conexion.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE incidents_staging (LIKE incidents INCLUDING DEFAULTS) ON COMMIT DROP
+        """)
+
+
+# Fusiona la tabla temporal con 'incidents' en una sola sentencia y devuelve los conteos.
+# Solo se reescriben las filas cuyas columnas actualizables realmente cambiaron. 'incidents' está particionada
+# por 'created' y la llave única de 'number' está en 'incidents_numeros' (ver migraciones.py), así que no se puede
+# usar ON CONFLICT (number): se actualizan los incidentes que ya existen y se insertan los que no, con la misma foto
+# de la tabla. Si otra transacción inserta el mismo número al mismo tiempo, la llave de 'incidents_numeros' hace
+# fallar la fusión en lugar de duplicar el incidente.
+def fusionar_staging(conexion):
+    columnas = ', '.join(COLUMNAS)
+    asignaciones = ', '.join(f"{col} = f.{col}" for col in COLUMNAS_ACTUALIZABLES)
+    actuales = ', '.join(f"i.{col}" for col in COLUMNAS_ACTUALIZABLES)
+    nuevas = ', '.join(f"f.{col}" for col in COLUMNAS_ACTUALIZABLES)
+
+    with conexion.cursor() as cursor:
+        # Si el archivo repite un incidente se conserva la versión con el 'last_update' más reciente,
+        # porque una sentencia no puede modificar la misma fila dos veces
+        cursor.execute(f"""
+            WITH fuente AS (
+                SELECT DISTINCT ON (number) {columnas}
+                FROM incidents_staging
+                WHERE number IS NOT NULL
+                ORDER BY {ORDEN_FUSION}
+            ), actualizados AS (
+                UPDATE incidents i SET {asignaciones}
+                FROM fuente f
+                WHERE i.number = f.number AND ({actuales}) IS DISTINCT FROM ({nuevas})
+                RETURNING 1
+            ), insertados AS (
+                INSERT INTO incidents ({columnas})
+                SELECT {columnas} FROM fuente f
+                WHERE NOT EXISTS (SELECT 1 FROM incidents i WHERE i.number = f.number)
+                RETURNING 1
+            )
+            SELECT
+                (SELECT count(*) FROM fuente),
+                (SELECT count(*) FROM insertados),
+                (SELECT count(*) FROM actualizados)
+        """)
+        total, insertados, actualizados = cursor.fetchone()
+
+    return {
+        'insertados': insertados,
+        'actualizados': actualizados,
+        'sin_cambios': total - insertados - actualizados
+    }
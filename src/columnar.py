@@ -0,0 +1,102 @@
+# Salida columnar (Parquet / Arrow) de los incidentes: tipos conservados, texto con diccionario y compresión
+import pyarrow as pa  # Formato columnar en memoria y flujo Arrow IPC
+import pyarrow.parquet as pq  # Archivos Parquet
+from normalizacion import COLUMNAS, COLUMNAS_CATEGORICAS, COLUMNAS_FECHA  # Columnas y sus tipos
+
+COMPRESION = 'zstd'
+
+# Esquema fijo para que todos los bloques de un mismo archivo coincidan: fechas como timestamp y las columnas
+# de pocos valores como diccionario (cada valor distinto se guarda una vez por grupo de filas)
+ESQUEMA = pa.schema([
+    pa.field(col, pa.timestamp('us') if col in COLUMNAS_FECHA
+             else pa.dictionary(pa.int32(), pa.string()) if col in COLUMNAS_CATEGORICAS
+             else pa.string())
+    for col in COLUMNAS
+])
+
+# Formatos de GET /incidentes/export: tipo MIME y extensión del archivo descargado
+FORMATOS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+# Convierte un DataFrame normalizado en una tabla Arrow con el esquema fijo
+def tabla_arrow(df):
+    return pa.Table.from_pandas(df[list(COLUMNAS)], schema=ESQUEMA, preserve_index=False)
+
+
+# Convierte filas de la base de datos (tuplas en el orden de COLUMNAS) en un lote Arrow, columna por columna
+def lote_arrow(filas):
+    columnas = list(zip(*filas)) if filas else [()] * len(COLUMNAS)
+    arreglos = []
+    for campo, valores in zip(ESQUEMA, columnas):
+        if pa.types.is_dictionary(campo.type):
+            arreglos.append(pa.array(valores, pa.string()).dictionary_encode())
+        else:
+            arreglos.append(pa.array(valores, campo.type))
+    return pa.RecordBatch.from_arrays(arreglos, schema=ESQUEMA)
+
+
+# Escribe el DataFrame normalizado completo como Parquet
+def escribir_parquet(df, ruta):
+    pq.write_table(tabla_arrow(df), ruta, compression=COMPRESION)
+
+
+# Escritor de Parquet por bloques: cada bloque se agrega como un grupo de filas del mismo archivo
+class EscritorParquet:
+    def __init__(self, ruta):
+        self._escritor = pq.ParquetWriter(ruta, ESQUEMA, compression=COMPRESION)
+
+    def escribir(self, df):
+        self._escritor.write_table(tabla_arrow(df))
+
+    def cerrar(self):
+        self._escritor.close()
+
+
+# Destino en memoria que acumula lo escrito hasta que se entrega al cliente
+class _Salida:
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+# Genera los bytes del archivo Parquet o del flujo Arrow a partir de bloques de filas, sin armar el archivo
+# completo en memoria: cada bloque se envía en cuanto se escribe
+def exportar_bloques(bloques, formato):
+    salida = _Salida()
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(salida, ESQUEMA, compression=COMPRESION)
+        escribir = lambda lote: escritor.write_table(pa.Table.from_batches([lote]))
+    else:
+        escritor = pa.ipc.new_stream(salida, ESQUEMA)
+        escribir = escritor.write_batch
+
+    try:
+        for filas in bloques:
+            escribir(lote_arrow(filas))
+            yield salida.vaciar()
+    finally:
+        escritor.close()
+    yield salida.vaciar()  # Pie del archivo Parquet o marca de fin del flujo Arrow
@@ -1,7 +1,75 @@
+import os  # Permite sobrescribir la configuración con variables de entorno
+# Antes de desplegar una versión nueva hay que aplicar las migraciones del esquema: python src/migraciones.py
+# (usa estas mismas variables de entorno; ver migraciones.py)
+# Dependencias: requirements.txt y, según lo que se use, requirements-asgi.txt (servidor asíncrono) y
+# requirements-redis.txt (CACHE_URL)
+
 # Definición de la clase DevelopmentConfig que almacena la configuración para el entorno de desarrollo
 class DevelopmentConfig:
     DEBUG = True  # Habilita el modo de depuración (debugging) en el entorno de desarrollo
 
+    # Parámetros de conexión a la base de datos PostgreSQL
+    DB_HOST = os.environ.get('DB_HOST', 'localhost')
+    DB_NAME = os.environ.get('DB_NAME', 'proyecto-incident')
+    DB_USER = os.environ.get('DB_USER', 'postgres')
+    DB_PASSWORD = os.environ.get('DB_PASSWORD', '31102003')
+
+    # Pool de conexiones compartido por todas las rutas de la API
+    DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))  # Conexiones que se abren al iniciar
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))  # Máximo de conexiones abiertas al mismo tiempo
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # Segundos de espera por una conexión libre
+    DB_POOL_VERIFICAR = float(os.environ.get('DB_POOL_VERIFICAR', 30))  # Segundos inactiva antes de verificarla con SELECT 1
+
+    # Servidor asíncrono (servidor_asincrono.py): pool de asyncpg, las solicitudes esperan una conexión sin ocupar un hilo
+    ASGI_POOL_MIN = int(os.environ.get('ASGI_POOL_MIN', 2))  # Conexiones que se abren al iniciar
+    ASGI_POOL_MAX = int(os.environ.get('ASGI_POOL_MAX', 20))  # Máximo de conexiones abiertas al mismo tiempo
+    ASGI_HOST = os.environ.get('ASGI_HOST', '127.0.0.1')
+    ASGI_PUERTO = int(os.environ.get('ASGI_PUERTO', 8000))
+
+    # Listado de incidentes
+    PAGINA_DEFECTO = int(os.environ.get('PAGINA_DEFECTO', 500))  # Incidentes por página cuando se pagina sin 'limit'
+    PAGINA_MAXIMA = int(os.environ.get('PAGINA_MAXIMA', 5000))  # Tope para el parámetro 'limit'
+    EXPORTAR_BLOQUE = int(os.environ.get('EXPORTAR_BLOQUE', 2000))  # Filas por bloque en la exportación en streaming
+    EXPORTAR_FILAS_POR_GRUPO = int(os.environ.get('EXPORTAR_FILAS_POR_GRUPO', 65536))  # Filas por grupo en /incidentes/export (Parquet/Arrow)
+
+    # Ingesta de archivos CSV ('completo' lee todo el archivo; 'bloques' lee y carga por bloques solapados;
+    # 'paralelo' es como 'bloques' pero lee y normaliza en varios procesos; 'directo' es como 'bloques' pero lee
+    # del cuerpo de la solicitud a medida que llega, sin archivos temporales)
+    INGESTA_MODO = os.environ.get('INGESTA_MODO', 'completo')
+    # Motor de lectura del CSV ('pandas', 'pyarrow' o 'streaming', ver lectores.py); cada carga puede elegir otro con 'motor'
+    INGESTA_MOTOR = os.environ.get('INGESTA_MOTOR', 'pyarrow')
+    INGESTA_CODIFICACION = os.environ.get('INGESTA_CODIFICACION', '')  # Vacío: se detecta en cada archivo
+    INGESTA_TAMANO_BLOQUE = int(os.environ.get('INGESTA_TAMANO_BLOQUE', 50000))  # Filas por bloque
+    INGESTA_PROFUNDIDAD_COLA = int(os.environ.get('INGESTA_PROFUNDIDAD_COLA', 2))  # Bloques limpios en espera de carga
+    # Modo 'paralelo': el archivo se divide en rangos de bytes que se leen y normalizan en varios procesos
+    INGESTA_PROCESOS = int(os.environ.get('INGESTA_PROCESOS', os.cpu_count() or 1))  # Procesos lectores
+    INGESTA_TAMANO_RANGO = int(os.environ.get('INGESTA_TAMANO_RANGO', 64 * 1024 * 1024))  # Bytes por rango
+    # Modo 'directo': el archivo se lee del cuerpo de la solicitud sin guardarlo; con ARCHIVAR_ORIGINALES (o
+    # 'archivar=true') se guarda además comprimido con zstd en un hilo aparte
+    ARCHIVAR_ORIGINALES = os.environ.get('ARCHIVAR_ORIGINALES', 'false').lower() in ('1', 'true', 'si')
+
+    # Trabajos en segundo plano para /incidentes/upload y /incidentes/update
+    TRABAJOS_CONCURRENTES = int(os.environ.get('TRABAJOS_CONCURRENTES', 2))  # Archivos que se cargan a la vez en la base de datos
+    TRABAJOS_EN_COLA = int(os.environ.get('TRABAJOS_EN_COLA', 10))  # Archivos que pueden esperar turno antes de rechazar nuevos
+    TRABAJOS_RETENCION = int(os.environ.get('TRABAJOS_RETENCION', 3600))  # Segundos que se conservan el estado y los archivos de un trabajo terminado
+
+    # Caché de lectura para GET /incidentes/<number>
+    CACHE_TAMANO = int(os.environ.get('CACHE_TAMANO', 1024))  # Incidentes que se guardan en memoria por proceso (sin CACHE_URL)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 30))  # Segundos de vida de cada entrada
+    CACHE_URL = os.environ.get('CACHE_URL', '')  # Caché compartido opcional, por ejemplo 'redis://localhost:6379/0'; reemplaza al de cada proceso
+
+    # Operaciones por lote (/incidentes/batch)
+    LOTE_MAXIMO = int(os.environ.get('LOTE_MAXIMO', 5000))  # Máximo de incidentes por solicitud
+
+    # Recarga completa con tabla sombra (/incidentes/reload y /incidentes/delete)
+    RECARGA_ESPERA_CANDADO = float(os.environ.get('RECARGA_ESPERA_CANDADO', 2))  # Segundos por intento de intercambio
+    RECARGA_INTENTOS = int(os.environ.get('RECARGA_INTENTOS', 30))  # Intentos antes de abandonar la recarga
+
+    # Particiones mensuales de 'incidents' (particiones.py)
+    PARTICIONES_ESPERA_CANDADO = float(os.environ.get('PARTICIONES_ESPERA_CANDADO', 0.5))  # Segundos para crear el mes de una carga; si no, va a la partición por defecto
+    PARTICIONES_MESES_FUTUROS = int(os.environ.get('PARTICIONES_MESES_FUTUROS', 3))  # Meses que el mantenimiento crea por adelantado
+    PARTICIONES_RETENER_MESES = int(os.environ.get('PARTICIONES_RETENER_MESES', 0))  # Meses que conserva el mantenimiento (0: todos)
+
 # Creación de un diccionario de configuración con el entorno 'development' apuntando a la clase DevelopmentConfig
 config = {
     'development': DevelopmentConfig  # Utiliza la configuración de desarrollo para este entorno
@@ -0,0 +1,165 @@
+# Huellas de archivos y de filas para no volver a procesar lo que ya está en la base de datos
+import hashlib  # Huella SHA-256 del archivo subido
+import io  # Búfer en memoria para enviar las huellas de las filas con COPY
+from psycopg2.extras import Json  # Para guardar el resultado del procesamiento como JSONB
+import pandas as pd  # Cálculo vectorizado de la huella de cada fila
+from migraciones import asegurar_esquema  # Las tablas de huellas se crean en la migración 3
+from normalizacion import COLUMNAS  # Columnas que forman parte de la huella de un incidente
+from carga import FORMATO_FECHA, ORDEN_FUSION, fusionar_staging  # Fusión de las filas enviadas y fila que conserva
+
+
+# Huella SHA-256 del contenido del archivo, leído por partes para no cargarlo completo en memoria
+def huella_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for parte in iter(lambda: archivo.read(1024 * 1024), b''):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+# Devuelve el resultado guardado si el archivo ya se procesó con ese tipo de operación, o None
+def buscar_archivo(conexion, huella, tipo):
+    asegurar_esquema()
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT resultado FROM archivos_procesados WHERE huella = %s AND tipo = %s", (huella, tipo)
+        )
+        fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+# Registra el archivo como procesado dentro de la misma transacción de la carga
+def registrar_archivo(conexion, huella, tipo, resultado):
+    asegurar_esquema()
+    with conexion.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO archivos_procesados (huella, tipo, resultado) VALUES (%s, %s, %s)
+            ON CONFLICT (huella, tipo) DO UPDATE SET procesado_en = now(), resultado = EXCLUDED.resultado
+        """, (huella, tipo, Json(resultado)))
+
+
+# Avance guardado de la carga por bloques de un archivo ({'bloques', 'filas', 'tamano_bloque'}), o None
+def leer_avance(conexion, huella, tipo):
+    asegurar_esquema()
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT bloques, filas, tamano_bloque FROM archivos_avance WHERE huella = %s AND tipo = %s", (huella, tipo)
+        )
+        fila = cursor.fetchone()
+    return {'bloques': fila[0], 'filas': fila[1], 'tamano_bloque': fila[2]} if fila else None
+
+
+# Guarda cuántos bloques del archivo ya se cargaron, dentro de la misma transacción que el último de ellos
+def guardar_avance(conexion, huella, tipo, ruta, tamano_bloque, bloques, filas):
+    with conexion.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO archivos_avance (huella, tipo, ruta, tamano_bloque, bloques, filas) VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (huella, tipo) DO UPDATE SET
+                ruta = EXCLUDED.ruta, bloques = EXCLUDED.bloques, filas = EXCLUDED.filas, actualizado_en = now()
+        """, (huella, tipo, ruta, tamano_bloque, bloques, filas))
+
+
+# Borra el avance del archivo; se llama al registrarlo como procesado
+def borrar_avance(conexion, huella, tipo):
+    with conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM archivos_avance WHERE huella = %s AND tipo = %s", (huella, tipo))
+
+
+# Huella de 64 bits de cada fila normalizada (mismo valor para el mismo contenido, sin importar el tipo de columna)
+def huellas_filas(df):
+    return pd.util.hash_pandas_object(df[list(COLUMNAS)], index=False).astype('int64', copy=False)
+
+
+# Olvida los archivos procesados y el avance de las cargas a medias, que ya no describen el contenido de la tabla
+def olvidar_archivos(conexion):
+    with conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM archivos_procesados")
+        cursor.execute("DELETE FROM archivos_avance")  # Una carga masiva a medias debe empezar de nuevo
+
+
+# Descarta de cada DataFrame las filas cuya huella coincide con la guardada, fusiona lo enviado (fusionar) y guarda
+# las huellas de las filas que quedaron en 'incidents'. Todo ocurre en la transacción de la carga, así que se deshace
+# si la carga falla. Las huellas de los incidentes que cambian por otro camino (la API, un lote o SQL directo) las
+# borran los triggers de 'incidents' (migración 10); también las de los que actualiza la fusión, por eso se
+# registran después de ella.
+class FiltroCambios:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.sin_cambios = 0  # Filas descartadas por no tener cambios
+        asegurar_esquema()
+        with conexion.cursor() as cursor:
+            # Huellas del bloque que se está filtrando y de todas las filas del archivo, enviadas o no
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS huellas_bloque (
+                    number VARCHAR(50), huella BIGINT, last_update TIMESTAMP
+                ) ON COMMIT DROP;
+                CREATE TEMP TABLE IF NOT EXISTS huellas_archivo (
+                    number VARCHAR(50), huella BIGINT, last_update TIMESTAMP, enviada BOOLEAN
+                ) ON COMMIT DROP;
+            """)
+
+    # Devuelve solo las filas nuevas o modificadas del DataFrame
+    def filtrar(self, df):
+        if df.empty:
+            return df
+
+        huellas = huellas_filas(df)
+        buffer = io.StringIO()
+        pd.DataFrame({
+            'number': df['number'].to_numpy(), 'huella': huellas.to_numpy(), 'last_update': df['last_update'].to_numpy()
+        }).to_csv(buffer, index=False, header=False, date_format=FORMATO_FECHA, na_rep='')
+        buffer.seek(0)
+
+        with self.conexion.cursor() as cursor:
+            cursor.execute("TRUNCATE huellas_bloque")
+            cursor.copy_expert(
+                "COPY huellas_bloque (number, huella, last_update) FROM STDIN WITH (FORMAT csv, NULL '')", buffer
+            )
+            # Se envían las filas con una huella distinta a la guardada; las iguales (número y huella) se devuelven
+            cursor.execute("""
+                WITH filas AS (
+                    INSERT INTO huellas_archivo (number, huella, last_update, enviada)
+                    SELECT number, huella, last_update, NOT EXISTS (
+                        SELECT 1 FROM incidents_huellas h WHERE h.number = b.number AND h.huella = b.huella
+                    ) FROM huellas_bloque b
+                    RETURNING number, huella, enviada
+                )
+                SELECT number, huella FROM filas WHERE NOT enviada
+            """)
+            iguales = cursor.fetchall()
+
+        if not iguales:
+            return df
+        # Se comparan filas y no números: si el archivo repite un incidente con otro contenido, esa fila se envía
+        cambiados = ~pd.MultiIndex.from_arrays([df['number'].to_numpy(), huellas.to_numpy()]).isin(iguales)
+        self.sin_cambios += int(len(df) - cambiados.sum())
+        return df[cambiados]
+
+    # Fusiona la tabla temporal (ver carga.fusionar_staging) y guarda la huella de cada incidente enviado; devuelve los
+    # conteos de la fusión. Si el archivo repite un incidente, la fusión conserva la fila de 'last_update' más
+    # reciente: antes se quitan las filas enviadas que perderían contra una fila descartada por igual a la guardada
+    # (el incidente ya tiene esa versión) y después se registra la huella de la fila que conservó la fusión.
+    def fusionar(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM incidents_staging s USING huellas_archivo a
+                WHERE NOT a.enviada AND s.number = a.number
+                  AND NOT (s.last_update IS NOT NULL AND (a.last_update IS NULL OR s.last_update > a.last_update))
+            """)
+            self.sin_cambios += cursor.rowcount
+        conteos = fusionar_staging(self.conexion)
+        with self.conexion.cursor() as cursor:
+            # Con la misma fecha gana la fila descartada, como en el DELETE anterior: su huella ya está guardada
+            cursor.execute(f"""
+                INSERT INTO incidents_huellas (number, huella)
+                SELECT number, huella FROM (
+                    SELECT DISTINCT ON (number) number, huella, enviada FROM huellas_archivo
+                    WHERE number IS NOT NULL
+                    ORDER BY {ORDEN_FUSION}, enviada
+                ) a
+                WHERE enviada
+                ON CONFLICT (number) DO UPDATE SET huella = EXCLUDED.huella
+                WHERE incidents_huellas.huella <> EXCLUDED.huella
+            """)
+            cursor.execute("TRUNCATE huellas_archivo")
+        return conteos
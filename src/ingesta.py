@@ -0,0 +1,94 @@
+# Ingesta de archivos CSV por bloques: un hilo lee y limpia el bloque siguiente mientras se carga el actual
+import queue  # Cola acotada entre el productor (lectura) y el consumidor (carga)
+import threading  # Hilo productor que lee el archivo en paralelo a la carga
+import time  # Para medir la duración total de la ingesta
+from carga import estadisticas_carga  # Resumen de filas, duración y filas por segundo
+from metricas import medir  # Duración de la lectura de cada bloque
+from paralelo import leer_en_paralelo  # Lectura por rangos de bytes en varios procesos
+from lectores import leer_csv_bloques  # Motores de lectura del CSV
+
+_FIN = object()  # Marca que indica al consumidor que ya no hay más bloques
+
+
+# Lee 'ruta' en bloques de 'tamano_bloque' filas, aplica 'limpiar(bloque, tramos)' a cada bloque y se lo entrega
+# a 'cargar'. La cola guarda como máximo 'profundidad_cola' bloques limpios, así la memoria depende del tamaño
+# del bloque y no del tamaño del archivo. 'al_avanzar' (opcional) recibe las filas cargadas hasta el momento y
+# 'tramos' (opcional) acumula la duración de la lectura y de la espera del consumidor por el bloque siguiente.
+# Con 'procesos' > 1 el archivo se lee y se limpia en varios procesos por rangos de 'tamano_rango' bytes
+# (ver paralelo.py); los bloques se siguen cargando en el orden del archivo. 'motor' y 'codificacion' indican
+# cómo se lee el CSV (ver lectores.py).
+def procesar_por_bloques(ruta, limpiar, cargar, tamano_bloque, profundidad_cola, al_avanzar=None, tramos=None,
+                         procesos=1, tamano_rango=None, motor='pandas', codificacion=None):
+    cola = queue.Queue(maxsize=profundidad_cola)
+    detener = threading.Event()  # Se activa si el consumidor falla, para que el productor deje de leer
+    errores = []  # Error ocurrido en el hilo productor, se vuelve a lanzar en el hilo que llama
+
+    # Coloca un elemento en la cola sin quedarse bloqueado si el consumidor ya se detuvo
+    def encolar(elemento):
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # Bloques limpios en el orden del archivo, leídos en este hilo o en varios procesos
+    def bloques_limpios():
+        if procesos > 1:
+            yield from leer_en_paralelo(ruta, limpiar, procesos, tamano_rango, motor, codificacion, tramos)
+            return
+        lector = leer_csv_bloques(ruta, tamano_bloque, motor, codificacion)
+        while True:
+            with medir(tramos, 'lectura'):
+                bloque = next(lector, None)
+            if bloque is None:
+                return
+            yield limpiar(bloque, tramos)
+
+    def productor():
+        bloques = bloques_limpios()
+        try:
+            for bloque in bloques:
+                if not encolar(bloque):
+                    return
+        except Exception as ex:
+            errores.append(ex)
+        finally:
+            bloques.close()  # Detiene los procesos lectores si la carga terminó antes
+            encolar(_FIN)
+
+    inicio = time.perf_counter()
+    hilo = threading.Thread(target=productor, name='ingesta-productor', daemon=True)
+    hilo.start()
+
+    filas = 0
+    bloques = 0
+    try:
+        while True:
+            # Si la carga espera aquí, la lectura y la normalización son el cuello de botella
+            with medir(tramos, 'espera_lectura'):
+                bloque = cola.get()
+            if bloque is _FIN:
+                break
+            cargar(bloque)  # Mientras se carga este bloque, el productor ya está leyendo el siguiente
+            filas += len(bloque)
+            bloques += 1
+            if al_avanzar:
+                al_avanzar(filas)
+    finally:
+        # Si la carga falló, se detiene al productor y se vacía la cola para que el hilo pueda terminar
+        detener.set()
+        while hilo.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        hilo.join()
+
+    if errores:
+        raise errores[0]
+
+    resultado = estadisticas_carga(filas, time.perf_counter() - inicio)
+    resultado['bloques'] = bloques
+    return resultado
@@ -0,0 +1,225 @@
+# Lectores de los archivos CSV exportados: motores intercambiables y detección de la codificación.
+# Todos leen las columnas como texto con los mismos valores nulos, así el motor no cambia el resultado.
+# El origen puede ser una ruta o un flujo binario con búfer ('peek'), como el cuerpo de una solicitud.
+import codecs  # Marcas de orden de bytes (BOM) y recodificación de los bytes no válidos
+import io  # Rangos de bytes en memoria y flujo recodificado
+from contextlib import contextmanager  # Cierre del flujo recodificado al terminar la lectura
+import pandas as pd  # Motor C de Pandas
+import pyarrow as pa  # Tablas Arrow que se convierten a DataFrame
+import pyarrow.csv as pacsv  # Lector CSV de Arrow, multihilo o incremental
+
+# 'pandas': motor C de Pandas, un hilo.
+# 'pyarrow': lector de Arrow que separa y convierte el archivo en varios hilos.
+# 'streaming': lector incremental de Arrow; solo tiene en memoria el bloque que está leyendo.
+# En la lectura por bloques 'pyarrow' y 'streaming' usan el lector incremental, que no carga el archivo completo.
+MOTORES = ('pandas', 'pyarrow', 'streaming')
+
+MUESTRA_CODIFICACION = 1024 * 1024  # Bytes del inicio del archivo que se usan para detectar la codificación
+BLOQUE_STREAMING = 4 * 1024 * 1024  # Bytes que el lector incremental interpreta a la vez
+BLOQUE_RECODIFICACION = 1024 * 1024  # Bytes que FlujoUTF8 recodifica a la vez
+
+# Codificaciones detectadas con la muestra en las que los bytes no válidos de más adelante se leen como cp1252
+ALTERNATIVAS = ('utf-8', 'utf-8-sig', 'cp1252')
+
+# Valores que se leen como nulos: los mismos que Pandas usa por defecto, para que todos los motores coincidan
+VALORES_NULOS = (
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+)
+
+
+# Primeros bytes del origen; de un flujo se obtienen con 'peek', sin consumirlos
+def _muestra(origen):
+    if hasattr(origen, 'peek'):
+        return origen.peek(MUESTRA_CODIFICACION)[:MUESTRA_CODIFICACION]
+    with open(origen, 'rb') as archivo:
+        return archivo.read(MUESTRA_CODIFICACION)
+
+
+# Detecta la codificación del archivo una sola vez, con una muestra del inicio: la marca BOM si la tiene,
+# 'utf-8' si la muestra es UTF-8 válido y, si no, 'cp1252' (archivos guardados desde Excel en Windows).
+def detectar_codificacion(origen):
+    muestra = _muestra(origen)
+    if muestra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if muestra.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        muestra.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as ex:
+        # La muestra puede cortar un carácter de varios bytes al final; eso no indica otra codificación
+        if ex.reason == 'unexpected end of data' and ex.start >= len(muestra) - 3:
+            return 'utf-8'
+    try:
+        muestra.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'  # Acepta cualquier byte
+
+
+# Manejador de errores de decodificación 'lectores_cp1252': cada byte no válido se interpreta como cp1252, o como
+# latin-1 si cp1252 no lo define (0x81, 0x8D, 0x8F, 0x90, 0x9D)
+def _como_cp1252(error):
+    invalidos = error.object[error.start:error.end]
+    return ''.join(bytes([b]).decode('cp1252', errors='ignore') or chr(b) for b in invalidos), error.end
+
+
+codecs.register_error('lectores_cp1252', _como_cp1252)
+
+
+# Flujo binario con el contenido del origen recodificado a UTF-8. La codificación se detecta solo con el inicio del
+# archivo; si más adelante aparecen bytes que no son válidos en ella (por ejemplo filas pegadas desde Excel en un
+# archivo UTF-8) se leen como cp1252 en lugar de hacer fallar la carga.
+class FlujoUTF8(io.RawIOBase):
+    def __init__(self, origen, codificacion):
+        self._propio = not hasattr(origen, 'read')  # Solo se cierra el archivo si lo abrió el flujo
+        self._archivo = open(origen, 'rb') if self._propio else origen
+        self._decodificador = codecs.getincrementaldecoder(codificacion)(errors='lectores_cp1252')
+        self._pendiente = b''
+        self._posicion = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while self._posicion >= len(self._pendiente):
+            datos = self._archivo.read(BLOQUE_RECODIFICACION)
+            self._pendiente = self._decodificador.decode(datos, final=not datos).encode('utf-8')
+            self._posicion = 0
+            if not datos:
+                break
+        cantidad = min(len(destino), len(self._pendiente) - self._posicion)
+        destino[:cantidad] = self._pendiente[self._posicion:self._posicion + cantidad]
+        self._posicion += cantidad
+        return cantidad
+
+    def close(self):
+        if self._propio and not self.closed:
+            self._archivo.close()
+        super().close()
+
+
+# Origen listo para leer: con una codificación de ALTERNATIVAS se entrega como FlujoUTF8 (y se lee como 'utf-8');
+# las demás se leen tal cual. Produce (origen, codificación) y cierra el flujo al terminar.
+@contextmanager
+def _recodificado(origen, codificacion):
+    if codificacion not in ALTERNATIVAS:
+        yield origen, codificacion
+        return
+    with io.BufferedReader(FlujoUTF8(origen, codificacion), BLOQUE_RECODIFICACION) as flujo:
+        yield flujo, 'utf-8'
+
+
+# Nombres de las columnas según el encabezado (los repetidos quedan como 'Severity.1', igual que en Pandas).
+# Se leen de la muestra, cortada en el último salto de línea para no partir un carácter de varios bytes.
+def columnas_archivo(origen, codificacion):
+    muestra = _muestra(origen)
+    if codificacion != 'utf-16':
+        muestra = muestra[:muestra.rfind(b'\n') + 1] or muestra
+    return list(pd.read_csv(io.BytesIO(muestra), nrows=0, delimiter=',', encoding=codificacion).columns)
+
+
+# Opciones del lector de Arrow: todas las columnas como texto y los saltos de línea dentro de comillas permitidos
+def _opciones_arrow(columnas, codificacion, bloque=None):
+    # Arrow solo evita recodificar si recibe exactamente 'utf8'; la marca BOM de UTF-8 la descarta él mismo
+    codificacion = 'utf8' if codificacion in ('utf-8', 'utf-8-sig') else codificacion
+    lectura = pacsv.ReadOptions(column_names=columnas, skip_rows=1, encoding=codificacion, use_threads=True)
+    if bloque:
+        lectura.block_size = bloque
+    interpretacion = pacsv.ParseOptions(delimiter=',', newlines_in_values=True)
+    conversion = pacsv.ConvertOptions(
+        column_types={col: pa.string() for col in columnas},
+        null_values=list(VALORES_NULOS), strings_can_be_null=True
+    )
+    return {'read_options': lectura, 'parse_options': interpretacion, 'convert_options': conversion}
+
+
+def _leer_pandas(origen, codificacion, **opciones):
+    return pd.read_csv(
+        origen, delimiter=',', encoding=codificacion, dtype=str,
+        keep_default_na=False, na_values=list(VALORES_NULOS), **opciones
+    )
+
+
+def _validar_motor(motor):
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de lectura desconocido: {motor}")
+
+
+def _leer_completo(origen, motor, codificacion, columnas):
+    if motor == 'pandas':
+        return _leer_pandas(origen, codificacion)
+    if motor == 'pyarrow':
+        return pacsv.read_csv(origen, **_opciones_arrow(columnas, codificacion)).to_pandas()
+    return pa.Table.from_batches(list(_lotes_streaming(origen, columnas, codificacion))).to_pandas()
+
+
+# Lee el archivo completo con el motor indicado; si no se indica la codificación se detecta.
+# Una ruta se lee primero sin recodificar (Arrow la interpreta en varios hilos) y, solo si aparecen bytes no válidos
+# en la codificación, se vuelve a leer con FlujoUTF8. Un flujo no se puede volver a leer: se recodifica desde el inicio.
+def leer_csv(origen, motor='pandas', codificacion=None):
+    _validar_motor(motor)
+    codificacion = codificacion or detectar_codificacion(origen)
+    columnas = None if motor == 'pandas' else columnas_archivo(origen, codificacion)
+    if not hasattr(origen, 'read'):
+        try:
+            return _leer_completo(origen, motor, codificacion, columnas)
+        except (UnicodeDecodeError, pa.ArrowInvalid):
+            if codificacion not in ALTERNATIVAS:
+                raise
+    with _recodificado(origen, codificacion) as (fuente, codificacion):
+        return _leer_completo(fuente, motor, codificacion, columnas)
+
+
+# Lotes Arrow del lector incremental, de unos BLOQUE_STREAMING bytes cada uno
+def _lotes_streaming(origen, columnas, codificacion):
+    with pacsv.open_csv(origen, **_opciones_arrow(columnas, codificacion, BLOQUE_STREAMING)) as lector:
+        yield from lector
+
+
+# Lee el archivo en bloques de 'tamano_bloque' filas con el motor indicado, sin tenerlo nunca completo en memoria:
+# 'pandas' lee solo lo necesario para cada bloque y 'pyarrow' y 'streaming' usan el lector incremental.
+# Los bloques ya entregados no se pueden volver a leer, así que el archivo se lee desde el inicio con FlujoUTF8.
+def leer_csv_bloques(origen, tamano_bloque, motor='pandas', codificacion=None):
+    _validar_motor(motor)
+    codificacion = codificacion or detectar_codificacion(origen)
+    columnas = None if motor == 'pandas' else columnas_archivo(origen, codificacion)
+    with _recodificado(origen, codificacion) as (fuente, codificacion):
+        if motor == 'pandas':
+            yield from _leer_pandas(fuente, codificacion, chunksize=tamano_bloque)
+            return
+        # Los lotes del lector incremental tienen tamaño en bytes; se agrupan hasta completar 'tamano_bloque' filas
+        lotes, filas = [], 0
+        for lote in _lotes_streaming(fuente, columnas, codificacion):
+            lotes.append(lote)
+            filas += lote.num_rows
+            while filas >= tamano_bloque:
+                tabla = pa.Table.from_batches(lotes)
+                yield tabla.slice(0, tamano_bloque).to_pandas()
+                resto = tabla.slice(tamano_bloque)
+                lotes, filas = resto.to_batches(), resto.num_rows
+        if filas:
+            yield pa.Table.from_batches(lotes, schema=lotes[0].schema).to_pandas()
+
+
+# Lee un rango de bytes sin encabezado (modo paralelo) con el motor indicado. Si el rango tiene bytes no válidos en
+# la codificación, se recodifica en memoria igual que en FlujoUTF8.
+def leer_bytes(datos, columnas, motor, codificacion):
+    if not datos.strip():
+        return pd.DataFrame(columns=columnas, dtype=str)  # El rango solo tenía líneas vacías
+    try:
+        return _leer_bytes(datos, columnas, motor, codificacion)
+    except (UnicodeDecodeError, pa.ArrowInvalid):
+        if codificacion not in ALTERNATIVAS:
+            raise
+    return _leer_bytes(datos.decode(codificacion, errors='lectores_cp1252').encode('utf-8'), columnas, motor, 'utf-8')
+
+
+def _leer_bytes(datos, columnas, motor, codificacion):
+    if motor == 'pandas':
+        return _leer_pandas(io.BytesIO(datos), codificacion, header=None, names=columnas)
+    # En un rango no hay encabezado que saltar; el lector incremental no aporta nada con un rango ya acotado
+    opciones = _opciones_arrow(columnas, codificacion)
+    opciones['read_options'].skip_rows = 0
+    return pacsv.read_csv(pa.BufferReader(datos), **opciones).to_pandas()
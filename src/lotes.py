@@ -0,0 +1,134 @@
+# Operaciones por lote sobre 'incidents': una sola sentencia por lote en lugar de una por incidente
+from datetime import datetime  # Validación de las fechas de cada incidente
+from psycopg2.extras import execute_values  # Envía muchas filas en una sola sentencia VALUES
+from normalizacion import COLUMNAS  # Columnas de la tabla en el orden en que se envían
+from particiones import asegurar_particiones  # Partición de los meses del lote antes de insertar
+
+COLUMNAS_FECHA = ('created', 'last_update')
+
+# Longitud máxima de las columnas de texto de 'incidents' (ver la migración 1)
+LONGITUDES = {
+    'number': 50, 'state': 50, 'incident_ci_type': 100, 'affected_user': 100, 'user_location': 100,
+    'assignment_group': 100, 'assigned_to': 100, 'urgency': 50, 'severity': 50, 'created_by': 50, 'updated_by': 50
+}
+
+
+# Valida un incidente recibido en JSON y devuelve la tupla de valores, o un mensaje de error. Un valor que la base
+# de datos rechazaría se reporta en el resultado del elemento en lugar de hacer fallar todo el lote.
+def _valores_incidente(datos):
+    if not isinstance(datos, dict):
+        return None, "Cada elemento debe ser un objeto JSON"
+    faltantes = [col for col in COLUMNAS if col not in datos]
+    if faltantes:
+        return None, f"Faltan campos: {', '.join(faltantes)}"
+    if not isinstance(datos['number'], str) or not datos['number']:
+        return None, "El campo 'number' debe ser un texto no vacío"
+    for col, longitud in LONGITUDES.items():
+        if datos[col] is not None and not isinstance(datos[col], str):
+            return None, f"El campo '{col}' debe ser un texto o null"
+        if datos[col] is not None and len(datos[col]) > longitud:
+            return None, f"El campo '{col}' admite como máximo {longitud} caracteres"
+    for col in COLUMNAS_FECHA:
+        if datos[col] is not None:
+            try:
+                datetime.fromisoformat(datos[col])
+            except (TypeError, ValueError):
+                return None, f"Fecha inválida en '{col}': {datos[col]}"
+    return tuple(datos[col] for col in COLUMNAS), None
+
+
+# Separa los elementos válidos de los inválidos o repetidos; los resultados quedan en el orden recibido
+def _preparar(elementos, extraer):
+    resultados = []
+    validos = {}  # number -> posición en 'resultados'
+    filas = []
+    for elemento in elementos:
+        valores, error = extraer(elemento)
+        number = elemento.get('number') if isinstance(elemento, dict) else elemento
+        if error:
+            resultados.append({'number': number, 'estado': 'error', 'error': error})
+        elif valores[0] in validos:
+            resultados.append({'number': valores[0], 'estado': 'error', 'error': "Incidente repetido en el lote"})
+        else:
+            validos[valores[0]] = len(resultados)
+            resultados.append({'number': valores[0], 'estado': None})
+            filas.append(valores)
+    return resultados, validos, filas
+
+
+# Marca el estado de cada incidente válido según si la sentencia lo afectó o no
+def _marcar(resultados, validos, afectados, si_afectado, si_no):
+    for number, posicion in validos.items():
+        resultados[posicion]['estado'] = si_afectado if number in afectados else si_no
+    return resultados
+
+
+# Inserta los incidentes nuevos; los que ya existen se reportan como 'existente'. Con 'incidents' particionada la
+# llave única de 'number' está en 'incidents_numeros' y no sirve para ON CONFLICT, así que la existencia del número
+# se comprueba en la misma sentencia.
+def insertar_lote(conexion, elementos):
+    resultados, validos, filas = _preparar(elementos, _valores_incidente)
+    afectados = set()
+    if filas:
+        asegurar_particiones(conexion, [fila[COLUMNAS.index('created')] for fila in filas])
+        with conexion.cursor() as cursor:
+            insertados = execute_values(cursor, f"""
+                INSERT INTO incidents ({', '.join(COLUMNAS)})
+                SELECT * FROM (VALUES %s) AS v ({', '.join(COLUMNAS)})
+                WHERE NOT EXISTS (SELECT 1 FROM incidents i WHERE i.number = v.number)
+                ON CONFLICT DO NOTHING
+                RETURNING number
+            """, filas, template='(%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                page_size=len(filas), fetch=True)
+        afectados = {fila[0] for fila in insertados}
+    return _marcar(resultados, validos, afectados, 'creado', 'existente')
+
+
+# Actualiza los incidentes existentes; los que no existen se reportan como 'no_encontrado'
+def actualizar_lote(conexion, elementos):
+    resultados, validos, filas = _preparar(elementos, _valores_incidente)
+    afectados = set()
+    if filas:
+        asignaciones = ', '.join(f"{col} = v.{col}" for col in COLUMNAS[1:])
+        with conexion.cursor() as cursor:
+            actualizados = execute_values(cursor, f"""
+                UPDATE incidents AS i SET {asignaciones}
+                FROM (VALUES %s) AS v ({', '.join(COLUMNAS)})
+                WHERE i.number = v.number
+                RETURNING i.number
+            """, filas, template='(%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                page_size=len(filas), fetch=True)
+        afectados = {fila[0] for fila in actualizados}
+    return _marcar(resultados, validos, afectados, 'actualizado', 'no_encontrado')
+
+
+# Valida un elemento del lote de borrado: puede ser el número o un objeto con 'number'
+def _numero_incidente(elemento):
+    number = elemento.get('number') if isinstance(elemento, dict) else elemento
+    if not isinstance(number, str) or not number:
+        return None, "Se esperaba el número de incidente"
+    return (number,), None
+
+
+# Elimina los incidentes indicados; los que no existen se reportan como 'no_encontrado'
+def eliminar_lote(conexion, elementos):
+    resultados, validos, _ = _preparar(elementos, _numero_incidente)
+    afectados = set()
+    if validos:
+        with conexion.cursor() as cursor:
+            cursor.execute("DELETE FROM incidents WHERE number = ANY(%s) RETURNING number", (list(validos),))
+            afectados = {fila[0] for fila in cursor.fetchall()}
+    return _marcar(resultados, validos, afectados, 'eliminado', 'no_encontrado')
+
+
+# Números de los incidentes que el lote modificó (para invalidar el caché)
+def modificados(resultados):
+    return [r['number'] for r in resultados if r['estado'] in ('creado', 'actualizado', 'eliminado')]
+
+
+# Conteo de resultados por estado
+def resumen(resultados):
+    conteo = {}
+    for resultado in resultados:
+        conteo[resultado['estado']] = conteo.get(resultado['estado'], 0) + 1
+    return conteo
@@ -1,59 +1,245 @@
-from flask import Flask, request, jsonify  # Importa las librerías necesarias de Flask para crear la app, manejar solicitudes HTTP y devolver respuestas JSON
+from flask import Flask, Response, g, request, jsonify, stream_with_context, url_for  # Importa las librerías necesarias de Flask para crear la app, manejar solicitudes HTTP y devolver respuestas JSON
 import os  # Importa la librería para interactuar con el sistema de archivos
-import pandas as pd  # Importa la librería Pandas para manipulación y análisis de datos
-import psycopg2  # Importa psycopg2 para interactuar con la base de datos PostgreSQL
+import time  # Para medir la duración de cada solicitud
+import uuid  # Para generar el identificador de cada trabajo de carga
+from datetime import datetime  # Validación de los filtros por fecha
 from psycopg2.extras import RealDictCursor  # Importa un cursor especial que devuelve resultados como diccionarios
+from psycopg2.errors import UniqueViolation  # Número de incidente insertado al mismo tiempo por otra solicitud
+from werkzeug.exceptions import BadRequest  # Cuerpo de la solicitud que no es un JSON válido
 from config import config  # Importa la configuración de la base de datos (probablemente de un archivo config.py)
+from basedatos import obtener_conexion, liberar_conexion, conexion_db, estadisticas_pool  # Pool de conexiones compartido
+from carga import copiar_dataframe, crear_staging  # Importa la carga masiva con COPY y la tabla temporal de la fusión
+from normalizacion import normalizar_incidentes  # Normalización compartida con transform.py
+from ingesta import procesar_por_bloques  # Ingesta por bloques con lectura y carga solapadas
+from huellas import FiltroCambios, buscar_archivo, huella_archivo, olvidar_archivos, registrar_archivo  # Cargas idempotentes
+from cache import CacheIncidentes  # Caché de lectura de incidentes
+from validadores import agregar_validadores, etag_incidente, etag_lista, respuesta_no_modificada  # GET condicional
+from lotes import actualizar_lote, eliminar_lote, insertar_lote, modificados, resumen  # Operaciones por lote
+from trabajos import AdministradorTrabajos, LimiteTrabajosError  # Procesamiento de archivos en segundo plano
+from resumenes import DIMENSIONES, consultar_resumen  # Totales agregados mantenidos por triggers
+from migraciones import MigracionPendienteError, asegurar_esquema  # Tablas e índices versionados
+from columnar import FORMATOS, EscritorParquet, escribir_parquet, exportar_bloques  # Salida Parquet / Arrow
+from lectores import MOTORES, MUESTRA_CODIFICACION, detectar_codificacion, leer_csv  # Motores de lectura del CSV y su codificación
+from subidas import Archivador, abrir_cuerpo  # Carga directa desde el cuerpo de la solicitud
+from serializacion import FORMATOS_LISTADO, ProveedorJSON, a_json_http, como_objetos, incidentes_en_formato  # Respuestas JSON con orjson
+from recarga import RecargaCompleta, descartar_anteriores  # Recarga completa con tabla sombra
+from cambios import INICIO, codificar_cursor, consultar_cambios, decodificar_cursor, fecha_desde  # Registro de cambios
+import metricas  # Duración de solicitudes, consultas y etapas del ETL para GET /metrics
+from metricas import Tramos, medir, registrar_trabajo  # Duración de cada etapa de los trabajos de archivos
 
 app = Flask(__name__)  # Crea una instancia de la aplicación Flask
+app.json = ProveedorJSON(app)  # jsonify serializa con orjson (fechas en RFC 1123, como el codificador de Flask)
 
 # Configurar la conexión a la base de datos
 app.config.from_object(config['development'])  # Carga la configuración de la base de datos para el entorno de desarrollo desde el archivo de configuración
 
-# Función para establecer la conexión con la base de datos
-def obtener_conexion():
+# Caché de lectura para GET /incidentes/<number>
+cache_incidentes = CacheIncidentes(app.config['CACHE_TAMANO'], app.config['CACHE_TTL'], app.config['CACHE_URL'])
+
+# Momento en que empezó la solicitud; se registra antes que cualquier otra preparación
+@app.before_request
+def iniciar_medicion():
+    g.inicio_solicitud = time.perf_counter()
+
+# Duración de cada solicitud por método, ruta (la regla, no la URL, para no crear una serie por incidente) y código.
+# En las respuestas en streaming solo se mide hasta que empieza el envío.
+@app.after_request
+def registrar_solicitud(respuesta):
+    inicio = g.get('inicio_solicitud')
+    if inicio is not None:
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        metricas.solicitudes.observar(time.perf_counter() - inicio, request.method, ruta, str(respuesta.status_code))
+    return respuesta
+
+# Antes de atender la primera solicitud se aplican las migraciones pendientes del esquema. Las que reescriben una
+# tabla completa se aplican antes de desplegar, con python src/migraciones.py; mientras falten, la API responde 503.
+@app.before_request
+def preparar_esquema():
+    if request.endpoint == 'exponer_metricas':
+        return  # Las métricas se deben poder leer aunque la base de datos no esté disponible
     try:
-        return psycopg2.connect(
-            host="localhost",
-            database="proyecto-incident",
-            user="postgres",
-            password="31102003"
-        )  # Establece la conexión con la base de datos PostgreSQL
+        asegurar_esquema()
+    except MigracionPendienteError as ex:
+        return jsonify({
+            'error': str(ex),
+            'mensaje': "La base de datos tiene migraciones pendientes: ejecute python src/migraciones.py antes de usar la API"
+        }), 503
     except Exception as ex:
-        print(f"Error de conexión a la base de datos: {ex}")  # Si ocurre un error, se imprime en la consola
-        return None  # Si no se puede conectar, se retorna None
+        return jsonify({'error': str(ex), 'mensaje': "Error al preparar el esquema de la base de datos"}), 500
+
+# Filtros del listado; cada uno tiene un índice (ver migraciones.py)
+FILTROS_IGUALDAD = ('state', 'assignment_group', 'assigned_to', 'urgency', 'severity')
+FILTROS_RANGO = {
+    'created_from': ('created', '>='),
+    'created_to': ('created', '<='),
+    'last_update_from': ('last_update', '>='),
+    'last_update_to': ('last_update', '<='),
+}
+
+# Validadores del listado: cantidad de incidentes, contador de cambios (migración 11) y último 'last_update'
+SQL_VALIDADORES_LISTADO = """
+    SELECT (SELECT coalesce(sum(total), 0)::bigint FROM incidents_resumen),
+           (SELECT coalesce(sum(cambios), 0)::bigint FROM incidents_version),
+           (SELECT max(last_update) FROM incidents)
+"""
+
+# Consulta base del listado y de las exportaciones; benchmarks/planes.py revisa sus planes con cada filtro
+SQL_LISTADO = """
+            SELECT number, state, created, last_update, incident_ci_type, affected_user, 
+                   user_location, assignment_group, assigned_to, urgency, severity, 
+                   created_by, updated_by 
+            FROM incidents"""
+
+# Traduce los parámetros de filtro a condiciones SQL con parámetros seguros; devuelve (condiciones, parametros, error).
+# Una fecha con zona horaria se compara como timestamptz (PostgreSQL la lleva a la zona de la sesión); el tipo se
+# indica en la consulta porque asyncpg, a diferencia de psycopg2, no lo deduce del valor.
+def filtros_listado(args):
+    condiciones, parametros = [], []
+    for columna in FILTROS_IGUALDAD:
+        valores = args.getlist(columna)
+        if len(valores) == 1:
+            condiciones.append(f"{columna} = %s")
+            parametros.append(valores[0])
+        elif valores:
+            # Varios valores del mismo filtro (?state=New&state=Closed) se combinan con OR
+            condiciones.append(f"{columna} = ANY(%s)")
+            parametros.append(valores)
+    for nombre, (columna, operador) in FILTROS_RANGO.items():
+        valor = args.get(nombre)
+        if valor is None:
+            continue
+        try:
+            fecha = datetime.fromisoformat(valor)
+        except ValueError:
+            return None, None, f"Fecha inválida en '{nombre}': {valor}"
+        parametros.append(fecha)
+        condiciones.append(f"{columna} {operador} %s" + ("::timestamptz" if fecha.tzinfo else ""))
+    return condiciones, parametros, None
 
 # Ruta para listar todos los incidentes (GET)
+# Parámetros opcionales: 'limit' y 'after' para paginar por número de incidente, 'export=true' para exportar todo en streaming,
+# y filtros por state, assignment_group, assigned_to, urgency, severity, created_from/created_to y last_update_from/last_update_to.
+# 'format=columns' devuelve los nombres de las columnas una sola vez y cada incidente como arreglo de valores.
 @app.route('/incidentes', methods=['GET'])
 def listar_incidentes():
+    condiciones, parametros_filtro, error = filtros_listado(request.args)
+    if error:
+        return jsonify({'mensaje': error}), 400
+    formato = request.args.get('format', 'objects')
+    if formato not in FORMATOS_LISTADO:
+        return jsonify({'mensaje': f"El parámetro 'format' debe ser uno de: {', '.join(FORMATOS_LISTADO)}"}), 400
+    donde = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+
+    # Validadores baratos de la tabla: cantidad de incidentes (de la tabla de resumen), contador de cambios y
+    # último 'last_update' (del índice). Son de toda la tabla y no del filtro: así nunca recorren 'incidents', y si
+    # la tabla no cambió tampoco cambió ningún listado filtrado; los parámetros de la consulta ya forman parte del ETag.
+    try:
+        with conexion_db() as connection, connection.cursor() as cursor, metricas.consultas.medir('validadores_listado'):
+            cursor.execute(SQL_VALIDADORES_LISTADO)
+            total, cambios, ultima_modificacion = cursor.fetchone()
+    except Exception as ex:
+        return jsonify({'error': str(ex), 'mensaje': "Error al obtener los datos"}), 500
+
+    # Si el cliente ya tiene esta versión del listado se responde 304 sin consultar ni serializar los incidentes
+    etag = etag_lista(total, cambios, ultima_modificacion, request.query_string)
+    no_modificada = respuesta_no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+
+    # La exportación completa se atiende con un cursor del lado del servidor y una respuesta en streaming
+    if request.args.get('export', '').lower() in ('1', 'true', 'si'):
+        return exportar_incidentes(etag, ultima_modificacion, donde, parametros_filtro, formato)
+
+    # Paginación por llave ('keyset'): se piden los incidentes con número mayor al último recibido.
+    # Con filtros siempre se pagina: un filtro poco selectivo sin límite obligaría a recorrer toda la tabla.
+    paginar = 'limit' in request.args or 'after' in request.args or bool(condiciones)
+    limite = request.args.get('limit', app.config['PAGINA_DEFECTO'], type=int)
+    despues = request.args.get('after')
+    if limite is None or limite <= 0:
+        return jsonify({'mensaje': "El parámetro 'limit' debe ser un entero positivo"}), 400
+    limite = min(limite, app.config['PAGINA_MAXIMA'])  # Evita páginas demasiado grandes
+
     conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
     if conexion is None:
         return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500  # Si no se pudo conectar, devuelve un error
 
     try:
-        # Se crea un cursor para ejecutar la consulta y obtener los datos en formato diccionario
-        with conexion.cursor(cursor_factory=RealDictCursor) as cursor:
-            sql = """
-            SELECT number, state, created, last_update, incident_ci_type, affected_user, 
-                   user_location, assignment_group, assigned_to, urgency, severity, 
-                   created_by, updated_by 
-            FROM incidents
-            """
-            cursor.execute(sql)  # Ejecuta la consulta SQL
-            datos = cursor.fetchall()  # Recupera todos los registros de la consulta
-
-        conexion.close()  # Cierra la conexión a la base de datos
-
-        # Devuelve los datos obtenidos en formato JSON
-        return jsonify({'incidentes': datos, 'mensaje': "Incidentes listados"})
+        # Las filas se leen como tuplas: armar un diccionario por fila solo hace falta en el formato 'objects'
+        with conexion.cursor() as cursor:
+            sql = SQL_LISTADO
+            parametros = list(parametros_filtro)
+            if paginar:
+                # El índice de la llave primaria (o el del filtro, que termina en 'number') resuelve el filtro
+                # y el orden sin recorrer toda la tabla
+                if despues:
+                    condiciones = condiciones + ["number > %s"]
+                    parametros.append(despues)
+            if condiciones:
+                sql += " WHERE " + " AND ".join(condiciones)
+            if paginar:
+                sql += " ORDER BY number LIMIT %s"
+                parametros.append(limite)
+            with metricas.consultas.medir('listar_incidentes'):
+                cursor.execute(sql, parametros)  # Ejecuta la consulta SQL
+                filas = cursor.fetchall()  # Recupera todos los registros de la consulta
+            columnas = [columna.name for columna in cursor.description]
+
+        respuesta = {**incidentes_en_formato(columnas, filas, formato), 'mensaje': "Incidentes listados"}
+        if paginar:
+            # 'siguiente' es el valor a enviar en 'after' para pedir la próxima página (None si ya no hay más)
+            respuesta['siguiente'] = filas[-1][0] if len(filas) == limite else None
+
+        # Devuelve los datos obtenidos en formato JSON junto con sus validadores
+        return agregar_validadores(jsonify(respuesta), etag, ultima_modificacion)
 
     except Exception as ex:
         # Si ocurre un error durante la ejecución de la consulta, se captura y se retorna un mensaje de error
         return jsonify({'error': str(ex), 'mensaje': "Error al obtener los datos"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Exporta los incidentes (filtrados o no) como un arreglo JSON enviado por partes, sin cargar la tabla completa en memoria.
+# Con 'format=columns' el arreglo es de filas y los nombres de las columnas se envían una sola vez, al principio.
+def exportar_incidentes(etag, ultima_modificacion, donde='', parametros=(), formato='objects'):
+    conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
+    if conexion is None:
+        return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
+
+    tamano_bloque = app.config['EXPORTAR_BLOQUE']
+
+    def generar():
+        # Cursor con nombre: PostgreSQL mantiene el resultado y solo se traen 'tamano_bloque' filas a la vez
+        with conexion.cursor(name='exportar_incidentes') as cursor:
+            cursor.itersize = tamano_bloque
+            cursor.execute(SQL_LISTADO + donde + " ORDER BY number", parametros)
+            filas = cursor.fetchmany(tamano_bloque)  # El cursor con nombre describe las columnas al leer
+            columnas = [columna.name for columna in cursor.description]
+            if formato == 'columns':
+                yield b'{"columnas":' + a_json_http(columnas) + b',"filas":['
+            else:
+                yield b'{"incidentes":['
+            separador = b''
+            while filas:
+                # Cada bloque se codifica de una vez como arreglo (con las fechas como jsonify) y se le quitan los corchetes
+                bloque = filas if formato == 'columns' else como_objetos(columnas, filas)
+                yield separador + a_json_http(bloque)[1:-1]
+                separador = b','
+                filas = cursor.fetchmany(tamano_bloque)
+            yield b'],"mensaje":"Incidentes exportados"}'
+
+    respuesta = Response(stream_with_context(generar()), mimetype='application/json')
+    # La conexión se devuelve al pool cuando termina la respuesta, aunque el cliente se desconecte a mitad
+    respuesta.call_on_close(lambda: liberar_conexion(conexion))
+    return agregar_validadores(respuesta, etag, ultima_modificacion)
 
 # Ruta para obtener los detalles de un incidente específico (GET)
 @app.route('/incidentes/<string:number>', methods=['GET'])
 def leer_incidente(number):
+    # Primero se busca en el caché; solo si no está se consulta la base de datos
+    datos, version = cache_incidentes.obtener(number)
+    if datos is not None:
+        return responder_incidente(datos)
+
     conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
     if conexion is None:
         return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
@@ -67,18 +253,39 @@ def leer_incidente(number):
                    created_by, updated_by 
             FROM incidents WHERE number = %s
             """
-            cursor.execute(sql, (number,))  # Se usa un parámetro seguro para evitar inyecciones SQL
-            datos = cursor.fetchone()  # Obtiene un solo registro
+            with metricas.consultas.medir('leer_incidente'):
+                cursor.execute(sql, (number,))  # Se usa un parámetro seguro para evitar inyecciones SQL
+                datos = cursor.fetchone()  # Obtiene un solo registro
 
-        # Si se encuentra el incidente, se retorna en formato JSON
+        # Si se encuentra el incidente, se guarda en el caché y se retorna en formato JSON
         if datos:
-            return jsonify({'incidente': datos, 'mensaje': "Incidente encontrado"}), 200
+            datos = dict(datos)
+            cache_incidentes.guardar(number, datos, version)
+            return responder_incidente(datos)
         else:
             return jsonify({'mensaje': "Incidente no encontrado"}), 404
 
     except Exception as ex:
         # Si ocurre un error, se captura y se retorna un mensaje de error
         return jsonify({'error': str(ex), 'mensaje': "Error al obtener el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Responde con un incidente usando su 'last_update' como validador; 304 si el cliente ya tiene esa versión
+def responder_incidente(datos):
+    ultima_modificacion = datos['last_update']
+    if ultima_modificacion is None:
+        # Sin fecha de actualización no hay un validador confiable
+        return jsonify({'incidente': datos, 'mensaje': "Incidente encontrado"}), 200
+
+    etag = etag_incidente(datos['number'], ultima_modificacion)
+    no_modificada = respuesta_no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+    return agregar_validadores(jsonify({'incidente': datos, 'mensaje': "Incidente encontrado"}), etag, ultima_modificacion), 200
+
+# Respuesta 400 de POST y PUT cuando el cuerpo no es un JSON válido (la misma en la API asíncrona)
+JSON_INVALIDO = "El cuerpo de la solicitud no es un JSON válido"
 
 # Ruta para agregar un nuevo incidente (POST)
 @app.route('/incidentes', methods=['POST'])
@@ -91,31 +298,42 @@ def agregar_incidente():
         # Recibe los datos en formato JSON desde la solicitud
         datos = request.get_json()
 
-        # Inserta un nuevo incidente en la base de datos
+        # Inserta un nuevo incidente en la base de datos. Con la tabla particionada la llave única de 'number' está
+        # en 'incidents_numeros', así que la existencia del número se comprueba en la misma sentencia.
         with conexion.cursor() as cursor:
             sql = """
             INSERT INTO incidents (number, state, created, last_update, incident_ci_type, affected_user, 
                                   user_location, assignment_group, assigned_to, urgency, severity, 
                                   created_by, updated_by)
-            VALUES (%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            SELECT %s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s
+            WHERE NOT EXISTS (SELECT 1 FROM incidents WHERE number = %s)
             """
-            cursor.execute(sql, (
-                datos['number'], datos['state'], datos['created'], datos['last_update'], datos['incident_ci_type'],
-                datos['affected_user'], datos['user_location'], datos['assignment_group'], datos['assigned_to'],
-                datos['urgency'], datos['severity'], datos['created_by'], datos['updated_by']
-            ))
-            conexion.commit()  # Guarda los cambios en la base de datos
-
-        conexion.close()  # Cierra la conexión
+            with metricas.consultas.medir('agregar_incidente'):
+                cursor.execute(sql, (
+                    datos['number'], datos['state'], datos['created'], datos['last_update'], datos['incident_ci_type'],
+                    datos['affected_user'], datos['user_location'], datos['assignment_group'], datos['assigned_to'],
+                    datos['urgency'], datos['severity'], datos['created_by'], datos['updated_by'], datos['number']
+                ))
+                insertado = cursor.rowcount
+                conexion.commit()  # Guarda los cambios en la base de datos
+
+        if not insertado:
+            return jsonify({'mensaje': "El incidente ya existe"}), 409
+
         # Responde con un mensaje de éxito
         return jsonify({'mensaje': "Incidente agregado exitosamente"}), 201
 
+    except BadRequest:
+        return jsonify({'mensaje': JSON_INVALIDO}), 400
+    except UniqueViolation:
+        conexion.rollback()  # Otra solicitud insertó el mismo número al mismo tiempo
+        return jsonify({'mensaje': "El incidente ya existe"}), 409
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Si ocurre un error, deshace los cambios
-            conexion.close()  # Cierra la conexión
+        conexion.rollback()  # Si ocurre un error, deshace los cambios
         # Devuelve un mensaje de error
         return jsonify({'error': str(ex), 'mensaje': "Error al agregar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para actualizar un incidente existente (PUT)
 @app.route('/incidentes/<string:number>', methods=['PUT'])
@@ -157,21 +375,24 @@ def actualizar_incidente(number):
                 updated_by = %s
             WHERE number = %s
             """
-            cursor.execute(sql_update, (
-                datos['state'], datos['created'], datos['last_update'], datos['incident_ci_type'],
-                datos['affected_user'], datos['user_location'], datos['assignment_group'], datos['assigned_to'],
-                datos['urgency'], datos['severity'], datos['created_by'], datos['updated_by'], number
-            ))
-            conexion.commit()  # Guarda los cambios
-
-        conexion.close()  # Cierra la conexión
+            with metricas.consultas.medir('actualizar_incidente'):
+                cursor.execute(sql_update, (
+                    datos['state'], datos['created'], datos['last_update'], datos['incident_ci_type'],
+                    datos['affected_user'], datos['user_location'], datos['assignment_group'], datos['assigned_to'],
+                    datos['urgency'], datos['severity'], datos['created_by'], datos['updated_by'], number
+                ))
+                conexion.commit()  # Guarda los cambios
+        cache_incidentes.invalidar(number)  # Ya confirmado el cambio, se descarta la copia en caché
+
         return jsonify({'mensaje': "Incidente actualizado exitosamente"}), 200  # Responde con un mensaje de éxito
 
+    except BadRequest:
+        return jsonify({'mensaje': JSON_INVALIDO}), 400
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Deshace cambios en caso de error
-            conexion.close()
+        conexion.rollback()  # Deshace cambios en caso de error
         return jsonify({'error': str(ex), 'mensaje': "Error al actualizar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
 
 # Ruta para eliminar un incidente (DELETE)
 @app.route('/incidentes/<string:number>', methods=['DELETE'])
@@ -197,180 +418,494 @@ def eliminar_incidente(number):
             sql_delete = """
             DELETE FROM incidents WHERE number = %s
             """
-            cursor.execute(sql_delete, (number,))
-            conexion.commit()  # Guarda los cambios
+            with metricas.consultas.medir('eliminar_incidente'):
+                cursor.execute(sql_delete, (number,))
+                conexion.commit()  # Guarda los cambios
+        cache_incidentes.invalidar(number)  # Ya confirmado el cambio, se descarta la copia en caché
 
-        conexion.close()  # Cierra la conexión
         return jsonify({'mensaje': "Incidente eliminado exitosamente"}), 200  # Responde con un mensaje de éxito
 
     except Exception as ex:
-        if conexion:
-            conexion.rollback()  # Deshace los cambios si ocurre un error
-            conexion.close()
+        conexion.rollback()  # Deshace los cambios si ocurre un error
         return jsonify({'error': str(ex), 'mensaje': "Error al eliminar el incidente"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Administrador de trabajos en segundo plano para las cargas de archivos
+trabajos = AdministradorTrabajos(
+    app.config['TRABAJOS_CONCURRENTES'], app.config['TRABAJOS_EN_COLA'], app.config['TRABAJOS_RETENCION']
+)
+
+# Modos que leen y cargan el archivo por bloques solapados (ver procesar_archivo_por_bloques)
+MODOS_POR_BLOQUES = ('bloques', 'paralelo', 'directo')
+
+# Lee el archivo por bloques y entrega cada bloque limpio a 'cargar', agregándolo también al Parquet limpio
+# (si se indica 'clean_filepath'). En el modo 'paralelo' los bloques se leen y normalizan en varios procesos
+# y se cargan en el mismo orden; en el modo 'directo' 'filepath' es el flujo del cuerpo de la solicitud.
+def procesar_archivo_por_bloques(filepath, clean_filepath, cargar, modo, lectura, al_avanzar=None, tramos=None):
+    # Cada bloque se agrega como un grupo de filas del mismo archivo Parquet
+    escritor = EscritorParquet(clean_filepath) if clean_filepath else None
+
+    def cargar_y_guardar(bloque):
+        cargar(bloque)
+        if escritor is not None:
+            with medir(tramos, 'escritura_limpio'):
+                escritor.escribir(bloque)
 
-# Ruta para cargar el archivo CSV y procesarlo (POST)
-@app.route('/incidentes/upload', methods=['POST'])
-def upload_file():
-    # Crear la carpeta uploads si no existe
-    if not os.path.exists('uploads'):
-        os.makedirs('uploads')  # Si no existe la carpeta uploads, la crea
+    try:
+        return procesar_por_bloques(
+            filepath, normalizar_incidentes, cargar_y_guardar,
+            app.config['INGESTA_TAMANO_BLOQUE'], app.config['INGESTA_PROFUNDIDAD_COLA'], al_avanzar, tramos,
+            app.config['INGESTA_PROCESOS'] if modo == 'paralelo' else 1, app.config['INGESTA_TAMANO_RANGO'],
+            lectura['motor'], lectura['codificacion']
+        )
+    finally:
+        if escritor is not None:
+            escritor.cerrar()
+
+# Motor con el que se lee el archivo (el de la solicitud o el configurado) y su codificación, detectada una sola
+# vez antes de leerlo (INGESTA_CODIFICACION la fija si se conoce de antemano)
+def opciones_lectura(filepath, motor):
+    return {
+        'motor': motor or app.config['INGESTA_MOTOR'],
+        'codificacion': app.config['INGESTA_CODIFICACION'] or detectar_codificacion(filepath)
+    }
+
+# Tamaño del archivo leído: el del archivo en disco o, en el modo 'directo', los bytes recibidos
+def tamano_archivo(filepath):
+    return filepath.raw.bytes if hasattr(filepath, 'raw') else os.path.getsize(filepath)
+
+# Huella del archivo: la calculada al recibirlo o, en el modo 'directo', la calculada mientras se leía
+def huella_leida(filepath, huella):
+    return huella or filepath.raw.huella()
+
+# Lee el archivo CSV completo con el motor elegido, midiendo la lectura
+def leer_archivo_completo(filepath, lectura, tramos):
+    with tramos.medir('lectura'):
+        return leer_csv(filepath, lectura['motor'], lectura['codificacion'])
+
+# Descarta las filas ya cargadas (misma huella), midiendo el cálculo y la consulta de las huellas
+def filtrar_cambios(filtro, df, tramos):
+    with tramos.medir('huellas'):
+        return filtro.filtrar(df)
+
+# Normaliza el archivo y lo fusiona con 'incidents' a través de la tabla temporal: los incidentes nuevos se insertan
+# y los que ya existen se actualizan si cambiaron. Las filas idénticas a las ya cargadas (misma huella) no se
+# vuelven a enviar. Devuelve los conteos de la fusión, sin confirmar la transacción.
+def fusionar_archivo(connection, trabajo, filepath, clean_filepath, modo, lectura, tramos):
+    filtro = FiltroCambios(connection)
+    crear_staging(connection)
+    if modo in MODOS_POR_BLOQUES:
+        # Los bloques se copian a la tabla temporal mientras se lee el siguiente; al final se fusiona una sola vez
+        estadisticas = procesar_archivo_por_bloques(
+            filepath, clean_filepath,
+            lambda bloque: copiar_dataframe(
+                connection, filtrar_cambios(filtro, bloque, tramos), tabla='incidents_staging', tramos=tramos
+            ),
+            modo, lectura, trabajo.avanzar, tramos
+        )
+    else:
+        # Lee el archivo CSV con Pandas y lo normaliza
+        df = normalizar_incidentes(leer_archivo_completo(filepath, lectura, tramos), tramos)
 
-    # Recibe el archivo desde la solicitud
-    file = request.files['file']
-    filepath = './uploads/incident.csv'  # Define la ruta donde se guardará el archivo
-    
-    # Guarda el archivo en el servidor
-    file.save(filepath)
+        # Guarda el archivo limpio como Parquet (tipos conservados y comprimido)
+        with tramos.medir('escritura_limpio'):
+            escribir_parquet(df, clean_filepath)
+
+        # Carga las filas nuevas o modificadas en la tabla temporal
+        estadisticas = copiar_dataframe(
+            connection, filtrar_cambios(filtro, df, tramos), tabla='incidents_staging', tramos=tramos
+        )
+        trabajo.avanzar(len(df))
+
+    # Aplica una sola fusión sobre 'incidents', reescribiendo solo los incidentes que realmente cambiaron, y guarda
+    # las huellas de lo enviado
+    with tramos.medir('fusion'):
+        conteos = filtro.fusionar()
+    return {
+        'insertados': conteos['insertados'],
+        'actualizados': conteos['actualizados'],
+        'sin_cambios': conteos['sin_cambios'] + filtro.sin_cambios,
+        'filas_por_segundo': estadisticas['filas_por_segundo'],
+        **lectura
+    }
+
+# Trabajo de carga: inserta los incidentes del archivo. Un archivo que repite incidentes ya cargados (por ejemplo
+# una exportación reenviada con algunos cambios) no falla: esos incidentes se actualizan, como en /incidentes/update.
+def procesar_carga(trabajo, filepath, clean_filepath, modo, huella, motor=None):
+    tramos = Tramos()  # Duración de cada etapa: se devuelve en el resultado y se suma a GET /metrics
+    lectura = opciones_lectura(filepath, motor)
+    with conexion_db() as connection:
+        conteos = fusionar_archivo(connection, trabajo, filepath, clean_filepath, modo, lectura, tramos)
+        resultado = {'filas': conteos['insertados'] + conteos['actualizados'], **conteos}  # Filas que sí se escribieron
+        with tramos.medir('confirmacion'):
+            registrar_archivo(connection, huella_leida(filepath, huella), trabajo.tipo, resultado)
+            connection.commit()  # Guarda los cambios
+        resultado['etapas'] = tramos.a_dict()
+
+    cache_incidentes.limpiar()  # La carga pudo cambiar cualquier incidente
+    registrar_trabajo(trabajo.tipo, tramos, trabajo.filas, tamano_archivo(filepath))
+    return resultado
+
+# Trabajo de actualización: fusiona el archivo con 'incidents' a través de la tabla temporal
+def procesar_actualizacion(trabajo, filepath, clean_filepath, modo, huella, motor=None):
+    tramos = Tramos()  # Duración de cada etapa: se devuelve en el resultado y se suma a GET /metrics
+    lectura = opciones_lectura(filepath, motor)
+    with conexion_db() as connection:
+        resultado = fusionar_archivo(connection, trabajo, filepath, clean_filepath, modo, lectura, tramos)
+        with tramos.medir('confirmacion'):
+            registrar_archivo(connection, huella_leida(filepath, huella), trabajo.tipo, resultado)
+            connection.commit()  # Guarda los cambios
+        resultado['etapas'] = tramos.a_dict()
+
+    cache_incidentes.limpiar()  # La carga pudo cambiar cualquier incidente
+    registrar_trabajo(trabajo.tipo, tramos, trabajo.filas, tamano_archivo(filepath))
+    return resultado
+
+# Trabajo de recarga completa: el archivo reemplaza todo el contenido de 'incidents'. Se carga en una tabla sombra
+# sin índices mientras las lecturas siguen viendo la tabla actual; al final se crean los índices y la tabla nueva
+# reemplaza a la actual con un cambio de nombre (ver recarga.py). La tabla anterior se elimina en segundo plano.
+def procesar_recarga(trabajo, filepath, clean_filepath, modo, huella, motor=None):
+    tramos = Tramos()  # Duración de cada etapa: se devuelve en el resultado y se suma a GET /metrics
+    lectura = opciones_lectura(filepath, motor)
+    with conexion_db() as connection:
+        recarga = RecargaCompleta(connection, app.config['RECARGA_ESPERA_CANDADO'], app.config['RECARGA_INTENTOS'])
+        if modo in MODOS_POR_BLOQUES:
+            # Cada bloque se copia a la tabla sombra mientras se lee el siguiente
+            estadisticas = procesar_archivo_por_bloques(
+                filepath, clean_filepath, lambda bloque: recarga.copiar(bloque, tramos=tramos),
+                modo, lectura, trabajo.avanzar, tramos
+            )
+        else:
+            # Lee el archivo CSV con Pandas y lo normaliza
+            df = normalizar_incidentes(leer_archivo_completo(filepath, lectura, tramos), tramos)
+
+            # Guarda el archivo limpio como Parquet (tipos conservados y comprimido)
+            with tramos.medir('escritura_limpio'):
+                escribir_parquet(df, clean_filepath)
+
+            estadisticas = recarga.copiar(df, al_avanzar=trabajo.avanzar, tramos=tramos)
+            trabajo.avanzar(len(df))
+
+        # Índices, resumen, marcas de eliminados y cambio de nombre en la misma transacción
+        eliminados = recarga.intercambiar(tramos)
+        resultado = {
+            'filas': trabajo.filas,
+            'eliminados': eliminados,  # Incidentes de la tabla anterior que no venían en el archivo
+            'filas_por_segundo': estadisticas['filas_por_segundo'],
+            **lectura
+        }
+        with tramos.medir('confirmacion'):
+            # Los archivos procesados antes ya no describen el contenido de la tabla; las huellas de los
+            # incidentes ya son las del archivo
+            olvidar_archivos(connection)
+            registrar_archivo(connection, huella_leida(filepath, huella), trabajo.tipo, resultado)
+            connection.commit()  # Las lecturas pasan a ver la tabla nueva
+        resultado['etapas'] = tramos.a_dict()
+
+    descartar_anteriores()
+    cache_incidentes.limpiar()  # La recarga pudo cambiar cualquier incidente
+    registrar_trabajo(trabajo.tipo, tramos, trabajo.filas, tamano_archivo(filepath))
+    return resultado
+
+# Recibe el archivo de la solicitud y lo envía como trabajo en segundo plano; responde 202 con el id del trabajo
+def recibir_archivo(carpeta, tipo, funcion):
+    # Modo de ingesta: 'completo', 'bloques', 'paralelo' o 'directo' (por defecto el configurado)
+    modo = request.args.get('modo', app.config['INGESTA_MODO'])
+    if modo not in ('completo',) + MODOS_POR_BLOQUES:
+        return jsonify({'mensaje': "El parámetro 'modo' debe ser 'completo', 'bloques', 'paralelo' o 'directo'"}), 400
+
+    # Motor de lectura del CSV: 'pandas', 'pyarrow' o 'streaming' (por defecto el configurado)
+    motor = request.args.get('motor', app.config['INGESTA_MOTOR'])
+    if motor not in MOTORES:
+        return jsonify({'mensaje': f"El parámetro 'motor' debe ser uno de: {', '.join(MOTORES)}"}), 400
+
+    # Antes de consultar request.files, que guardaría el archivo completo en un temporal
+    if modo == 'directo':
+        return recibir_directo(carpeta, tipo, funcion, motor)
+
+    if 'file' not in request.files:
+        return jsonify({'mensaje': "No se recibió ningún archivo en el campo 'file'"}), 400
+
+    # Si ya hay demasiados archivos en proceso se rechaza antes de guardar nada
+    if trabajos.saturado():
+        return jsonify({'mensaje': "Hay demasiados archivos en proceso, intente más tarde"}), 429
+
+    # Crear la carpeta si no existe
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+
+    # Cada trabajo guarda su propio archivo para que las cargas simultáneas no se sobrescriban
+    id_trabajo = uuid.uuid4().hex
+    filepath = os.path.join(carpeta, f'{id_trabajo}.csv')
+    clean_filepath = os.path.join(carpeta, f'{id_trabajo}_limpio.parquet')
+    request.files['file'].save(filepath)
+
+    # Si el mismo archivo ya se procesó se responde de inmediato con el resultado anterior ('forzar=true' lo evita)
+    huella = huella_archivo(filepath)
+    if request.args.get('forzar', '').lower() not in ('1', 'true', 'si'):
+        try:
+            with conexion_db() as connection:
+                anterior = buscar_archivo(connection, huella, tipo)
+        except Exception as ex:
+            os.remove(filepath)
+            return jsonify({'error': str(ex), 'mensaje': "Error de conexión a la base de datos"}), 500
+        if anterior is not None:
+            os.remove(filepath)
+            return jsonify({'resultado': anterior, 'duplicado': True, 'mensaje': "El archivo ya fue procesado"}), 200
 
     try:
-        # Lee el archivo CSV con Pandas
-        df = pd.read_csv(filepath, delimiter=',', encoding='unicode_escape')
-
-        # Renombra las columnas del archivo CSV
-        df = df.rename(columns={
-            'Number': 'number', 'State': 'state', 'Created': 'created', 'Last update': 'last_update',
-            'Incident CI type': 'incident_ci_type', 'Affected User': 'affected_user', 'User location': 'user_location',
-            'Assignment Group': 'assignment_group', 'Assigned to': 'assigned_to', 'Urgency': 'urgency',
-            'Severity': 'severity', 'Created By': 'created_by', 'Updated By': 'updated_by'
-        })
-
-        # Convertir todas las columnas a tipo string y reemplazar valores vacíos por "NaN"
-        df = df.astype(str)
-        df = df.fillna("NaN")
-        
-        # Convierte las columnas de fecha a tipo datetime
-        df['created'] = pd.to_datetime(df['created'], format='%m-%d-%Y %H:%M:%S', errors='coerce')
-        df['last_update'] = pd.to_datetime(df['last_update'], format='%m-%d-%Y %H:%M:%S', errors='coerce')
-
-        # Guarda el archivo CSV limpio
-        clean_filepath = './uploads/incident_limpio.csv'
-        df.to_csv(clean_filepath, index=False, encoding='utf-8')
-
-        # Conexión a la base de datos
-        connection = psycopg2.connect(
-            host='localhost',
-            user='postgres',
-            password='31102003',
-            database='proyecto-incident'
+        trabajo = trabajos.enviar(
+            id_trabajo, tipo, funcion, filepath, clean_filepath, modo, huella, motor, archivos=(filepath, clean_filepath)
         )
-        cursor = connection.cursor()
-
-        # Inserta los datos procesados en la base de datos
-        for index, row in df.iterrows():
-            query = """
-                INSERT INTO incidents (number, state, created, last_update, incident_ci_type, affected_user,
-                                  user_location, assignment_group, assigned_to, urgency, severity, created_by, updated_by)
-            VALUES (%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, tuple(row))  # Inserta cada fila del DataFrame en la base de datos
-        connection.commit()  # Guarda los cambios
+    except LimiteTrabajosError as ex:
+        os.remove(filepath)
+        return jsonify({'mensaje': str(ex)}), 429
+
+    url = url_for('estado_trabajo', id_trabajo=trabajo.id)
+    return jsonify({'trabajo': trabajo.a_dict(), 'url': url, 'mensaje': "Archivo recibido, se procesa en segundo plano"}), 202, {'Location': url}
+
+# Modo 'directo': el archivo se lee del cuerpo de la solicitud a medida que llega y cada bloque se carga en
+# cuanto se completa, sin guardar el archivo ni el Parquet limpio. Acepta multipart (campo 'file') o el CSV
+# como cuerpo. Con 'archivar=true' (o ARCHIVAR_ORIGINALES) el original se guarda comprimido en un hilo aparte,
+# la única escritura en disco. La solicitud responde al terminar la carga, con el trabajo ya completado.
+# La huella del archivo se conoce recién al final, así que un archivo repetido no se omite de entrada:
+# sus filas sin cambios las descartan las huellas de filas.
+def recibir_directo(carpeta, tipo, funcion, motor):
+    if trabajos.saturado():
+        return jsonify({'mensaje': "Hay demasiados archivos en proceso, intente más tarde"}), 429
+
+    limite = None
+    if request.mimetype.startswith('multipart/'):
+        limite = request.mimetype_params.get('boundary')
+        if not limite:
+            return jsonify({'mensaje': "El multipart no indica el 'boundary'"}), 400
+    elif request.mimetype not in ('text/csv', 'application/octet-stream'):
+        return jsonify({'mensaje': "Envíe el archivo como multipart (campo 'file') o como cuerpo text/csv"}), 415
+
+    id_trabajo = uuid.uuid4().hex
+    archivador = None
+    if request.args.get('archivar', str(app.config['ARCHIVAR_ORIGINALES'])).lower() in ('1', 'true', 'si'):
+        os.makedirs(carpeta, exist_ok=True)
+        archivador = Archivador(os.path.join(carpeta, f'{id_trabajo}.csv.zst'))
+
+    # El búfer tiene el tamaño de la muestra con la que se detecta la codificación
+    cuerpo, flujo = abrir_cuerpo(request.stream, limite, MUESTRA_CODIFICACION, archivador)
+    trabajo = None
+    try:
+        flujo.peek(1)  # Lee hasta el comienzo del archivo para saber si llegó
+        if not cuerpo.encontrado:
+            return jsonify({'mensaje': "No se recibió ningún archivo en el campo 'file'"}), 400
+        trabajo = trabajos.ejecutar(id_trabajo, tipo, funcion, flujo, None, 'directo', None, motor)
+    except LimiteTrabajosError as ex:
+        return jsonify({'mensaje': str(ex)}), 429
+    except ValueError as ex:
+        return jsonify({'mensaje': str(ex)}), 400
+    finally:
+        if archivador is not None:
+            try:
+                archivador.cerrar()
+            except Exception as ex:
+                if trabajo is not None and trabajo.estado == 'completado':
+                    trabajo.resultado['error_archivo'] = str(ex)  # La carga sí se guardó
+            # Un original incompleto no sirve como archivo
+            if (trabajo is None or trabajo.estado != 'completado') and os.path.exists(archivador.ruta):
+                os.remove(archivador.ruta)
+
+    url = url_for('estado_trabajo', id_trabajo=trabajo.id)
+    if trabajo.estado != 'completado':
+        return jsonify({'trabajo': trabajo.a_dict(), 'url': url, 'mensaje': "Error al procesar el archivo"}), 500
+    return jsonify({'trabajo': trabajo.a_dict(), 'url': url, 'mensaje': "Archivo procesado"}), 200
+
+# Aplica una operación por lote a un arreglo JSON en una sola transacción y responde con el resultado de cada elemento
+def procesar_lote(operacion, mensaje_error):
+    elementos = request.get_json(silent=True)
+    if not isinstance(elementos, list) or not elementos:
+        return jsonify({'mensaje': "Se esperaba un arreglo JSON con al menos un elemento"}), 400
+    if len(elementos) > app.config['LOTE_MAXIMO']:
+        return jsonify({'mensaje': f"El lote no puede tener más de {app.config['LOTE_MAXIMO']} elementos"}), 413
 
-        return jsonify({'mensaje': 'Archivo procesado e incidentes importados exitosamente'}), 201
+    conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
+    if conexion is None:
+        return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
+
+    try:
+        with metricas.consultas.medir(operacion.__name__):
+            resultados = operacion(conexion, elementos)
+            numeros = modificados(resultados)
+            conexion.commit()  # Una sola confirmación para todo el lote
+
+        # Ya confirmados los cambios, se descartan las copias en caché
+        for number in numeros:
+            cache_incidentes.invalidar(number)
+
+        return jsonify({'resultados': resultados, 'resumen': resumen(resultados), 'mensaje': "Lote procesado"}), 200
 
     except Exception as ex:
-        return jsonify({'error': str(ex), 'mensaje': "Error al procesar el archivo CSV"}), 500
+        conexion.rollback()  # Deshace todo el lote si ocurre un error
+        return jsonify({'error': str(ex), 'mensaje': mensaje_error}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Ruta para agregar varios incidentes en una sola solicitud (POST)
+@app.route('/incidentes/batch', methods=['POST'])
+def agregar_incidentes_lote():
+    return procesar_lote(insertar_lote, "Error al agregar los incidentes")
+
+# Ruta para actualizar varios incidentes en una sola solicitud (PUT)
+@app.route('/incidentes/batch', methods=['PUT'])
+def actualizar_incidentes_lote():
+    return procesar_lote(actualizar_lote, "Error al actualizar los incidentes")
+
+# Ruta para eliminar varios incidentes en una sola solicitud (DELETE); acepta números u objetos con 'number'
+@app.route('/incidentes/batch', methods=['DELETE'])
+def eliminar_incidentes_lote():
+    return procesar_lote(eliminar_lote, "Error al eliminar los incidentes")
+
+# Ruta para descargar una instantánea de los incidentes en formato columnar (GET).
+# 'format' puede ser 'parquet' (por defecto) o 'arrow' (flujo Arrow IPC); admite los mismos filtros que GET /incidentes
+@app.route('/incidentes/export', methods=['GET'])
+def exportar_columnar():
+    formato = request.args.get('format', 'parquet')
+    if formato not in FORMATOS:
+        return jsonify({'mensaje': f"El parámetro 'format' debe ser uno de: {', '.join(FORMATOS)}"}), 400
+    condiciones, parametros, error = filtros_listado(request.args)
+    if error:
+        return jsonify({'mensaje': error}), 400
+    donde = " WHERE " + " AND ".join(condiciones) if condiciones else ""
 
-# Ruta para actualizar el archivo CSV y procesarlo (POST)
-@app.route('/incidentes/update', methods=['POST'])
-def update_file():
-    # Crear la carpeta 'updates' si no existe
-    if not os.path.exists('updates'):
-        os.makedirs('updates')  # Si no existe la carpeta 'updates', la crea
+    conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
+    if conexion is None:
+        return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
 
-    # Recibe el archivo desde la solicitud
-    file = request.files['file']
-    filepath = './updates/incident.csv'  # Define la ruta donde se guardará el archivo
-    
-    # Guarda el archivo en el servidor
-    file.save(filepath)
+    tamano_bloque = app.config['EXPORTAR_FILAS_POR_GRUPO']
+
+    def generar():
+        # Cursor con nombre: cada bloque de filas se convierte en un grupo de filas Parquet o un lote Arrow
+        with conexion.cursor(name='exportar_columnar') as cursor:
+            cursor.itersize = tamano_bloque
+            cursor.execute(SQL_LISTADO + donde + " ORDER BY number", parametros)
+            yield from exportar_bloques(iter(lambda: cursor.fetchmany(tamano_bloque), []), formato)
+
+    mimetype, extension = FORMATOS[formato]
+    respuesta = Response(stream_with_context(generar()), mimetype=mimetype)
+    respuesta.headers['Content-Disposition'] = f'attachment; filename=incidentes.{extension}'
+    # La conexión se devuelve al pool cuando termina la respuesta, aunque el cliente se desconecte a mitad
+    respuesta.call_on_close(lambda: liberar_conexion(conexion))
+    return respuesta
+
+# Ruta para consultar los incidentes que cambiaron, incluidos los eliminados, en el orden en que el servidor los
+# escribió (GET). 'cursor' (el devuelto por la página anterior) permite continuar: el cliente guarda el último y lo
+# vuelve a enviar en la próxima sincronización. Sin cursor, 'since' empieza por los cambios con 'last_update'
+# igual o posterior a esa fecha.
+@app.route('/incidentes/changes', methods=['GET'])
+def cambios_incidentes():
+    limite = request.args.get('limit', app.config['PAGINA_DEFECTO'], type=int)
+    if limite is None or limite <= 0:
+        return jsonify({'mensaje': "El parámetro 'limit' debe ser un entero positivo"}), 400
+    limite = min(limite, app.config['PAGINA_MAXIMA'])
 
     try:
-        # Lee el archivo CSV con Pandas
-        df = pd.read_csv(filepath, delimiter=',', encoding='unicode_escape')
-
-        # Renombra las columnas del archivo CSV para estandarizar los nombres
-        df = df.rename(columns={
-            'Number': 'number', 'State': 'state', 'Created': 'created', 'Last update': 'last_update',
-            'Incident CI type': 'incident_ci_type', 'Affected User': 'affected_user', 'User location': 'user_location',
-            'Assignment Group': 'assignment_group', 'Assigned to': 'assigned_to', 'Urgency': 'urgency',
-            'Severity': 'severity', 'Created By': 'created_by', 'Updated By': 'updated_by'
-        })
-
-        # Convierte todas las columnas a tipo string y reemplaza los valores vacíos por "NaN"
-        df = df.astype(str)
-        df = df.fillna("NaN")
-        
-        # Convierte las columnas 'created' y 'last_update' a tipo datetime
-        df['created'] = pd.to_datetime(df['created'], format='%m-%d-%Y %H:%M:%S', errors='coerce')
-        df['last_update'] = pd.to_datetime(df['last_update'], format='%m-%d-%Y %H:%M:%S', errors='coerce')
-
-        # Convierte los valores NaT a None (NULL en la base de datos)
-        df['created'] = df['created'].where(pd.notna(df['created']), None)
-        df['last_update'] = df['last_update'].where(pd.notna(df['last_update']), None)
-
-        # Depuración: Verifica las fechas procesadas para asegurarse de que no sean NaT o None
-        print("Fechas procesadas en 'created':", df['created'].head())
-        print("Fechas procesadas en 'last_update':", df['last_update'].head())
-
-        # Guarda el archivo CSV limpio en la carpeta 'updates'
-        clean_filepath = './updates/incident_actualizado.csv'
-        df.to_csv(clean_filepath, index=False, encoding='utf-8')
-
-        # Conexión a la base de datos PostgreSQL
-        connection = psycopg2.connect(
-            host='localhost',
-            user='postgres',
-            password='31102003',
-            database='proyecto-incident'
-        )
-        cursor = connection.cursor()
-
-        # Actualiza los datos procesados en la base de datos
-        for index, row in df.iterrows():
-            query = """
-                INSERT INTO incidents (number, state, created, last_update, incident_ci_type, affected_user,
-                                       user_location, assignment_group, assigned_to, urgency, severity, created_by, updated_by)
-                VALUES (%s, %s, %s::TIMESTAMP, %s::TIMESTAMP, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (number) 
-                DO UPDATE SET 
-                    state = EXCLUDED.state,
-                    last_update = EXCLUDED.last_update,
-                    incident_ci_type = EXCLUDED.incident_ci_type,
-                    affected_user = EXCLUDED.affected_user,
-                    user_location = EXCLUDED.user_location,
-                    assignment_group = EXCLUDED.assignment_group,
-                    assigned_to = EXCLUDED.assigned_to,
-                    urgency = EXCLUDED.urgency,
-                    severity = EXCLUDED.severity,
-                    updated_by = EXCLUDED.updated_by;
-            """
-            cursor.execute(query, tuple(row))  # Inserta o actualiza cada fila del DataFrame en la base de datos
-        connection.commit()  # Guarda los cambios
+        desde = None
+        if request.args.get('cursor'):
+            posicion = decodificar_cursor(request.args['cursor'])
+        elif request.args.get('since'):
+            posicion, desde = None, fecha_desde(request.args['since'])
+        else:
+            posicion = INICIO
+    except ValueError as ex:
+        return jsonify({'mensaje': str(ex)}), 400
 
-        # Responde con un mensaje de éxito
-        return jsonify({'mensaje': 'Archivo procesado e incidentes actualizados exitosamente'}), 201
+    conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
+    if conexion is None:
+        return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
+
+    try:
+        with metricas.consultas.medir('cambios_incidentes'):
+            cambios, posicion, hay_mas = consultar_cambios(conexion, posicion, limite, desde)
+        return jsonify({
+            'cambios': cambios,
+            'cursor': codificar_cursor(posicion),  # Se devuelve aunque no haya cambios, para la próxima consulta
+            'hay_mas': hay_mas,
+            'mensaje': "Cambios de incidentes"
+        }), 200
 
     except Exception as ex:
-        # Manejo de excepciones en caso de error
-        return jsonify({'error': str(ex), 'mensaje': "Error al procesar el archivo CSV"}), 500
+        return jsonify({'error': str(ex), 'mensaje': "Error al obtener los cambios"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Ruta para consultar totales de incidentes agrupados por estado, grupo, severidad o urgencia (GET).
+# Ejemplo: /incidentes/stats?group_by=state,severity
+@app.route('/incidentes/stats', methods=['GET'])
+def estadisticas_incidentes():
+    dimensiones = [d.strip() for d in request.args.get('group_by', '').split(',') if d.strip()]
+    invalidas = [d for d in dimensiones if d not in DIMENSIONES]
+    if invalidas or len(set(dimensiones)) != len(dimensiones):
+        return jsonify({'mensaje': f"group_by admite una o más de: {', '.join(DIMENSIONES)}"}), 400
+
+    conexion = obtener_conexion()  # Obtiene la conexión a la base de datos
+    if conexion is None:
+        return jsonify({'mensaje': "Error de conexión a la base de datos"}), 500
+
+    try:
+        # Se lee la tabla de resumen, que tiene una fila por combinación y no una por incidente
+        with metricas.consultas.medir('estadisticas_incidentes'):
+            grupos = consultar_resumen(conexion, dimensiones)
+        total = sum(grupo['total'] for grupo in grupos)
+        return jsonify({'grupos': grupos, 'total': total, 'mensaje': "Estadísticas de incidentes"}), 200
+
+    except Exception as ex:
+        return jsonify({'error': str(ex), 'mensaje': "Error al obtener las estadísticas"}), 500
+    finally:
+        liberar_conexion(conexion)  # Devuelve la conexión al pool en cualquier caso
+
+# Ruta para cargar el archivo CSV y procesarlo (POST)
+# Parámetro opcional 'modo=bloques' para leer y cargar el archivo por bloques con memoria acotada
+# ('modo=paralelo' además lee y normaliza los bloques en varios procesos; 'modo=directo' los lee del cuerpo de la
+# solicitud a medida que llega, sin archivos temporales, y responde al terminar la carga)
+@app.route('/incidentes/upload', methods=['POST'])
+def upload_file():
+    return recibir_archivo('uploads', 'carga', procesar_carga)
+
+# Ruta para actualizar el archivo CSV y procesarlo (POST)
+# Parámetro opcional 'modo=bloques' para leer y cargar el archivo por bloques con memoria acotada
+# ('modo=paralelo' además lee y normaliza los bloques en varios procesos; 'modo=directo' los lee del cuerpo de la
+# solicitud a medida que llega, sin archivos temporales, y responde al terminar la carga)
+@app.route('/incidentes/update', methods=['POST'])
+def update_file():
+    return recibir_archivo('updates', 'actualizacion', procesar_actualizacion)
+
+# Ruta para reemplazar todos los incidentes por los del archivo (POST): mismos parámetros que /incidentes/upload.
+# Mientras se carga, GET /incidentes sigue respondiendo con los incidentes anteriores completos.
+@app.route('/incidentes/reload', methods=['POST'])
+def reload_file():
+    return recibir_archivo('uploads', 'recarga', procesar_recarga)
+
+# Ruta para consultar el estado de un trabajo de carga o actualización (GET)
+@app.route('/incidentes/jobs/<string:id_trabajo>', methods=['GET'])
+def estado_trabajo(id_trabajo):
+    trabajo = trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'mensaje': "Trabajo no encontrado"}), 404
+    return jsonify({'trabajo': trabajo.a_dict(), 'mensaje': "Estado del trabajo"}), 200
+
+# Vacía 'incidents' reemplazándola por una tabla vacía (una recarga sin filas) en lugar de borrar las filas una
+# por una; la tabla anterior se elimina después con descartar_anteriores(). No confirma la transacción.
+def vaciar_incidentes(connection):
+    RecargaCompleta(connection, app.config['RECARGA_ESPERA_CANDADO'], app.config['RECARGA_INTENTOS']).intercambiar()
+    olvidar_archivos(connection)  # Los archivos ya procesados podrán volver a cargarse
 
 # Ruta para eliminar todos los datos dentro de la base de datos (POST)
 @app.route('/incidentes/delete', methods=['DELETE'])
 def delete_all_incidents():
     try:
-        # Conexión a la base de datos
-        connection = psycopg2.connect(
-            host='localhost',
-            user='postgres',
-            password='31102003',
-            database='proyecto-incident'
-        )
-        cursor = connection.cursor()
-
-        # Eliminar todos los datos de la tabla incidents
-        cursor.execute("DELETE FROM incidents;")
-        connection.commit()  # Guarda los cambios
+        # Toma una conexión del pool; se devuelve al salir del bloque aunque ocurra un error
+        with conexion_db() as connection:
+            vaciar_incidentes(connection)
+            connection.commit()  # Guarda los cambios
+        descartar_anteriores()
+        cache_incidentes.limpiar()  # Ningún incidente en caché sigue siendo válido
 
         # Responde con un mensaje de éxito
         return jsonify({'mensaje': 'Todos los incidentes han sido eliminados exitosamente'}), 200
@@ -379,5 +914,32 @@ def delete_all_incidents():
         # Manejo de excepciones en caso de error
         return jsonify({'error': str(ex), 'mensaje': "Error al eliminar los incidentes"}), 500
 
+# Ruta para consultar los aciertos y fallos del caché de incidentes (GET)
+@app.route('/estado/cache', methods=['GET'])
+def estado_cache():
+    return jsonify({'cache': cache_incidentes.estadisticas(), 'mensaje': "Estado del caché de incidentes"}), 200
+
+# Ruta para consultar el estado del pool de conexiones (GET)
+@app.route('/estado/pool', methods=['GET'])
+def estado_pool():
+    return jsonify({'pool': estadisticas_pool(), 'mensaje': "Estado del pool de conexiones"}), 200
+
+# Ruta con las métricas en el formato de texto de Prometheus (GET): duración de solicitudes, consultas y etapas
+# del ETL, filas y bytes procesados, más el estado actual del pool de conexiones y del caché
+@app.route('/metrics', methods=['GET'])
+def exponer_metricas():
+    pool = estadisticas_pool()
+    cache = cache_incidentes.estadisticas()
+    adicionales = (
+        ('incidentes_pool_conexiones_en_uso', 'gauge', "Conexiones del pool entregadas en este momento", pool['en_uso']),
+        ('incidentes_pool_conexiones_libres', 'gauge', "Conexiones que el pool puede entregar sin esperar", pool['libres']),
+        ('incidentes_pool_conexiones_maximo', 'gauge', "Tamaño máximo del pool", pool['maximo']),
+        ('incidentes_pool_agotado_total', 'counter', "Veces que se pidió una conexión con el pool agotado", pool['agotadas']),
+        ('incidentes_cache_aciertos_total', 'counter', "Lecturas de incidentes atendidas por el caché", cache['aciertos']),
+        ('incidentes_cache_fallos_total', 'counter', "Lecturas de incidentes que no estaban en el caché", cache['fallos']),
+        ('incidentes_cache_entradas', 'gauge', "Incidentes en el caché local", cache['entradas_locales']),
+    )
+    return Response(metricas.exponer(adicionales), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
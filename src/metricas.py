@@ -0,0 +1,157 @@
+# Métricas de la API en formato de texto de Prometheus (GET /metrics): contadores e histogramas en memoria,
+# con un lock por métrica y sin dependencias; registrar una medición cuesta unas pocas sumas
+import threading  # Para actualizar las métricas desde varios hilos
+import time  # Para medir duraciones
+from bisect import bisect_left  # Cubeta del histograma que corresponde a cada medición
+from contextlib import contextmanager, nullcontext  # Para medir bloques con 'with'
+
+# Cubetas en segundos: solicitudes HTTP y consultas son rápidas, las etapas del ETL pueden durar minutos
+CUBETAS_SOLICITUD = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CUBETAS_ETAPA = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+# Escapa un valor de etiqueta (barra invertida, comillas y saltos de línea)
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Convierte las etiquetas en el texto {a="x",b="y"} de Prometheus
+def _etiquetas(nombres, valores, extra=()):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in list(zip(nombres, valores)) + list(extra)]
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+# Contador que solo aumenta (filas procesadas, bytes recibidos, ...)
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, cantidad=1, *valores):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exponer(self):
+        with self._lock:
+            valores = list(self._valores.items())
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}' for clave, valor in valores]
+
+
+# Histograma de duraciones con cubetas fijas, acumuladas al exponerlas como pide Prometheus
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_SOLICITUD):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.cubetas = cubetas
+        self._series = {}  # valores de las etiquetas -> [conteo por cubeta, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, segundos, *valores):
+        posicion = bisect_left(self.cubetas, segundos)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.cubetas) + 1), 0.0, 0]
+            serie[0][posicion] += 1
+            serie[1] += segundos
+            serie[2] += 1
+
+    # Mide la duración del bloque 'with'
+    @contextmanager
+    def medir(self, *valores):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *valores)
+
+    def exponer(self):
+        with self._lock:
+            series = [(clave, list(conteos), suma, total) for clave, (conteos, suma, total) in self._series.items()]
+        lineas = []
+        for clave, conteos, suma, total in series:
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + ('+Inf',), conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, [("le", limite)])} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {suma}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}')
+        return lineas
+
+
+solicitudes = Histograma(
+    'incidentes_http_solicitud_segundos', "Duración de las solicitudes HTTP por ruta",
+    ('metodo', 'ruta', 'codigo')
+)
+consultas = Histograma(
+    'incidentes_db_consulta_segundos', "Duración de las consultas a PostgreSQL de las rutas CRUD", ('consulta',)
+)
+etapas = Histograma(
+    'incidentes_etl_etapa_segundos', "Duración de cada etapa del procesamiento de archivos",
+    ('tipo', 'etapa'), CUBETAS_ETAPA
+)
+filas_procesadas = Contador('incidentes_etl_filas_total', "Filas de archivos procesadas", ('tipo',))
+bytes_procesados = Contador('incidentes_etl_bytes_total', "Bytes de archivos procesados", ('tipo',))
+trabajos_terminados = Contador('incidentes_trabajos_total', "Trabajos de archivos terminados", ('tipo', 'estado'))
+
+METRICAS = (solicitudes, consultas, etapas, filas_procesadas, bytes_procesados, trabajos_terminados)
+
+
+# Duración acumulada por etapa de un trabajo (lectura, fechas, copia, ...). En el modo por bloques las etapas
+# ocurren en dos hilos a la vez, así que la suma de las etapas puede superar la duración total del trabajo.
+class Tramos:
+    def __init__(self):
+        self.segundos = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, etapa, segundos):
+        with self._lock:
+            self.segundos[etapa] = self.segundos.get(etapa, 0) + segundos
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.agregar(etapa, time.perf_counter() - inicio)
+
+    def a_dict(self):
+        with self._lock:
+            return {etapa: round(segundos, 3) for etapa, segundos in self.segundos.items()}
+
+
+# Mide una etapa si se recibió dónde acumularla; si no, no hace nada
+def medir(tramos, etapa):
+    return tramos.medir(etapa) if tramos is not None else nullcontext()
+
+
+# Registra en las métricas globales las etapas, filas y bytes de un trabajo terminado
+def registrar_trabajo(tipo, tramos, filas, bytes_archivo):
+    for etapa, segundos in tramos.a_dict().items():
+        etapas.observar(segundos, tipo, etapa)
+    filas_procesadas.sumar(filas, tipo)
+    bytes_procesados.sumar(bytes_archivo, tipo)
+
+
+# Texto de todas las métricas; 'adicionales' son valores leídos al momento (pool, caché)
+# como (nombre, tipo, ayuda, valor)
+def exponer(adicionales=()):
+    lineas = []
+    for metrica in METRICAS:
+        lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+        lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+        lineas.extend(metrica.exponer())
+    for nombre, tipo, ayuda, valor in adicionales:
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        lineas.append(f'{nombre} {valor}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,425 @@
+# Esquema de la base de datos versionado: cada migración se aplica una sola vez y en orden.
+# Despliegue: ejecutar python src/migraciones.py con la configuración de la base de datos (variables DB_*) antes de
+# iniciar la nueva versión de la API (main.py o servidor_asincrono.py). Las migraciones de MIGRACIONES_MANUALES
+# reescriben o recorren la tabla completa y solo se aplican así; mientras falten, main.py responde 503 a todas las
+# rutas salvo /metrics y servidor_asincrono.py no inicia.
+import logging  # Registro de las migraciones aplicadas al iniciar la API
+import threading  # Para aplicar las migraciones una sola vez por proceso
+from basedatos import conexion_db  # Conexión propia para no confirmar a medias la transacción de quien llama
+
+registro = logging.getLogger(__name__)
+
+_esquema_listo = False
+_esquema_lock = threading.Lock()
+
+# Migración 2: cada filtro de igualdad lleva 'number' como segunda columna: el mismo índice resuelve el filtro
+# y el orden de la paginación por llave (WHERE col = %s AND number > %s ORDER BY number LIMIT n)
+_SQL_INDICES = """
+        CREATE INDEX IF NOT EXISTS incidents_state_idx ON incidents (state, number);
+        CREATE INDEX IF NOT EXISTS incidents_assignment_group_idx ON incidents (assignment_group, number);
+        CREATE INDEX IF NOT EXISTS incidents_assigned_to_idx ON incidents (assigned_to, number);
+        CREATE INDEX IF NOT EXISTS incidents_urgency_idx ON incidents (urgency, number);
+        CREATE INDEX IF NOT EXISTS incidents_severity_idx ON incidents (severity, number);
+        CREATE INDEX IF NOT EXISTS incidents_created_idx ON incidents (created);
+        CREATE INDEX IF NOT EXISTS incidents_last_update_idx ON incidents (last_update);
+    """
+
+# Migración 4: resumen por estado, grupo, severidad y urgencia. Los triggers son por sentencia y usan tablas de
+# transición: cada COPY, fusión o lote ajusta el resumen con una sola agregación de las filas que cambió,
+# dentro de la misma transacción de la carga
+_SQL_RESUMEN = """
+CREATE TABLE IF NOT EXISTS incidents_resumen (
+    state VARCHAR(100) NOT NULL DEFAULT '',
+    assignment_group VARCHAR(100) NOT NULL DEFAULT '',
+    severity VARCHAR(100) NOT NULL DEFAULT '',
+    urgency VARCHAR(100) NOT NULL DEFAULT '',
+    total BIGINT NOT NULL,
+    PRIMARY KEY (state, assignment_group, severity, urgency)
+);
+
+CREATE OR REPLACE FUNCTION incidents_resumen_aplicar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- Se suman los cambios por grupo; en un UPDATE que no cambia de grupo el resultado neto es cero y se omite
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO incidents_resumen AS r (state, assignment_group, severity, urgency, total)
+        SELECT coalesce(state, ''), coalesce(assignment_group, ''), coalesce(severity, ''), coalesce(urgency, ''), sum(delta) FROM (
+            SELECT state, assignment_group, severity, urgency, 1 AS delta FROM nuevas
+        ) d GROUP BY 1, 2, 3, 4 HAVING sum(delta) <> 0
+        ON CONFLICT (state, assignment_group, severity, urgency) DO UPDATE SET total = r.total + EXCLUDED.total;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO incidents_resumen AS r (state, assignment_group, severity, urgency, total)
+        SELECT coalesce(state, ''), coalesce(assignment_group, ''), coalesce(severity, ''), coalesce(urgency, ''), sum(delta) FROM (
+            SELECT state, assignment_group, severity, urgency, -1 AS delta FROM viejas
+        ) d GROUP BY 1, 2, 3, 4 HAVING sum(delta) <> 0
+        ON CONFLICT (state, assignment_group, severity, urgency) DO UPDATE SET total = r.total + EXCLUDED.total;
+    ELSE
+        INSERT INTO incidents_resumen AS r (state, assignment_group, severity, urgency, total)
+        SELECT coalesce(state, ''), coalesce(assignment_group, ''), coalesce(severity, ''), coalesce(urgency, ''), sum(delta) FROM (
+            SELECT state, assignment_group, severity, urgency, 1 AS delta FROM nuevas
+            UNION ALL
+            SELECT state, assignment_group, severity, urgency, -1 AS delta FROM viejas
+        ) d GROUP BY 1, 2, 3, 4 HAVING sum(delta) <> 0
+        ON CONFLICT (state, assignment_group, severity, urgency) DO UPDATE SET total = r.total + EXCLUDED.total;
+    END IF;
+
+    DELETE FROM incidents_resumen WHERE total <= 0;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_resumen_insert ON incidents;
+DROP TRIGGER IF EXISTS incidents_resumen_update ON incidents;
+DROP TRIGGER IF EXISTS incidents_resumen_delete ON incidents;
+CREATE TRIGGER incidents_resumen_insert AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION incidents_resumen_aplicar();
+CREATE TRIGGER incidents_resumen_update AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION incidents_resumen_aplicar();
+CREATE TRIGGER incidents_resumen_delete AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_resumen_aplicar();
+
+-- Se bloquean las escrituras mientras se calcula el resumen inicial para no perder cambios.
+-- Si el resumen ya existía (creado antes de las migraciones) se conserva tal cual.
+LOCK TABLE incidents IN SHARE MODE;
+INSERT INTO incidents_resumen (state, assignment_group, severity, urgency, total)
+SELECT coalesce(state, ''), coalesce(assignment_group, ''), coalesce(severity, ''), coalesce(urgency, ''), count(*)
+FROM incidents
+WHERE NOT EXISTS (SELECT 1 FROM incidents_resumen)
+GROUP BY 1, 2, 3, 4;
+"""
+
+# Migración 5: GET /incidentes/changes recorre 'incidents' en orden (last_update, number); los incidentes sin
+# 'last_update' van al principio (la migración 8 reemplaza este orden). Cada DELETE deja una marca en
+# 'incidents_eliminados' (también por trigger, así cubre el borrado individual, por lote y total) y volver a
+# insertar el incidente la quita.
+_SQL_CAMBIOS = """
+CREATE INDEX IF NOT EXISTS incidents_cambios_idx ON incidents ((coalesce(last_update, '-infinity')), number);
+
+CREATE TABLE IF NOT EXISTS incidents_eliminados (
+    number VARCHAR(50) PRIMARY KEY,
+    eliminado_en TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_eliminados_cambios_idx ON incidents_eliminados (eliminado_en, number);
+
+CREATE OR REPLACE FUNCTION incidents_eliminados_registrar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO incidents_eliminados (number, eliminado_en)
+        SELECT number, localtimestamp FROM viejas
+        ON CONFLICT (number) DO UPDATE SET eliminado_en = EXCLUDED.eliminado_en;
+    ELSE
+        DELETE FROM incidents_eliminados e USING nuevas n WHERE e.number = n.number;
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_eliminados_delete ON incidents;
+DROP TRIGGER IF EXISTS incidents_eliminados_insert ON incidents;
+CREATE TRIGGER incidents_eliminados_delete AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_eliminados_registrar();
+CREATE TRIGGER incidents_eliminados_insert AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION incidents_eliminados_registrar();
+"""
+
+# Migración 9: llave única de 'number' en la tabla particionada: cada número se registra en 'incidents_numeros'
+# (llave primaria) con triggers por sentencia en la misma transacción del INSERT o DELETE. Dos inserciones simultáneas
+# del mismo número ya no dejan duplicados aunque ambas pasen el WHERE NOT EXISTS: la segunda falla con la llave
+# primaria, como antes de particionar. Ninguna ruta cambia 'number' en un UPDATE, así que no hace falta un trigger
+# para ellos. Reemplaza a la llave UNIQUE NULLS NOT DISTINCT (number, created) que creaba la primera versión de la
+# migración 7 (requería PostgreSQL 15) por un índice simple sobre 'number'. Se puede volver a aplicar: registra los
+# números que falten, así que sirve también para las bases de datos que ya tenían la tabla.
+_SQL_NUMEROS = """
+CREATE TABLE IF NOT EXISTS incidents_numeros (
+    number VARCHAR(50) PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION incidents_numeros_registrar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO incidents_numeros (number) SELECT number FROM nuevas;
+    ELSE
+        DELETE FROM incidents_numeros x USING viejas v WHERE x.number = v.number;
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_numeros_insert ON incidents;
+DROP TRIGGER IF EXISTS incidents_numeros_delete ON incidents;
+CREATE TRIGGER incidents_numeros_insert AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION incidents_numeros_registrar();
+CREATE TRIGGER incidents_numeros_delete AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_numeros_registrar();
+
+ALTER TABLE incidents DROP CONSTRAINT IF EXISTS incidents_number_created_key;
+CREATE INDEX IF NOT EXISTS incidents_number_idx ON incidents (number);
+
+INSERT INTO incidents_numeros (number)
+SELECT DISTINCT number FROM incidents
+ON CONFLICT (number) DO NOTHING;
+"""
+
+# Migración 7: 'incidents' pasa a estar particionada por mes de 'created' (ver particiones.py). Se crea una partición
+# por cada mes con datos, el actual y los dos siguientes, más la partición por defecto para las fechas nulas; los
+# datos se copian a la tabla nueva y se vuelven a crear los índices y triggers de las migraciones 2, 4 y 5 (ahora
+# sobre la tabla particionada). PostgreSQL exige que la llave única de una tabla particionada incluya la columna
+# de partición, así que la llave primaria (number) pasa a la tabla 'incidents_numeros' (migración 9).
+# Reescribe toda la tabla: se aplica con python src/migraciones.py (ver MIGRACIONES_MANUALES).
+_SQL_PARTICIONES = """
+DO $$
+DECLARE
+    mes DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'incidents'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    ALTER TABLE incidents RENAME TO incidents_sin_particionar;
+    CREATE TABLE incidents (LIKE incidents_sin_particionar INCLUDING DEFAULTS) PARTITION BY RANGE (created);
+    CREATE TABLE incidents_sin_mes PARTITION OF incidents DEFAULT;
+    FOR mes IN
+        SELECT date_trunc('month', created)::date FROM incidents_sin_particionar WHERE created IS NOT NULL
+        UNION
+        SELECT generate_series(date_trunc('month', localtimestamp), date_trunc('month', localtimestamp) + interval '2 months',
+                               interval '1 month')::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF incidents FOR VALUES FROM (%L) TO (%L)',
+                       'incidents_' || to_char(mes, 'YYYY_MM'), mes, (mes + interval '1 month')::date);
+    END LOOP;
+    INSERT INTO incidents SELECT * FROM incidents_sin_particionar;
+    DROP TABLE incidents_sin_particionar;
+    CREATE INDEX incidents_number_idx ON incidents (number);
+END $$;
+""" + _SQL_INDICES + _SQL_RESUMEN + _SQL_CAMBIOS
+
+# Migración 8: posición de cada cambio asignada por el servidor para GET /incidentes/changes. 'last_update' viene del
+# archivo y no sirve como cursor: una carga posterior con fechas más antiguas quedaba detrás de los clientes. Cada
+# INSERT, UPDATE o DELETE guarda la transacción que lo hizo (cambio_xid) y un número de la secuencia
+# incidents_cambio_seq (cambio): la inserción por los valores por defecto de las columnas (así también COPY y la
+# tabla sombra de la recarga), la actualización por un trigger por fila y el borrado en la marca de eliminado.
+# Requiere PostgreSQL 13 o posterior (xid8). Agrega columnas con valores por defecto que se calculan en cada fila,
+# así que reescribe 'incidents': se aplica con python src/migraciones.py (ver MIGRACIONES_MANUALES).
+_SQL_CAMBIOS_SECUENCIA = """
+CREATE SEQUENCE IF NOT EXISTS incidents_cambio_seq;
+
+ALTER TABLE incidents
+    ADD COLUMN IF NOT EXISTS cambio_xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    ADD COLUMN IF NOT EXISTS cambio BIGINT NOT NULL DEFAULT nextval('incidents_cambio_seq');
+ALTER TABLE incidents_eliminados
+    ADD COLUMN IF NOT EXISTS cambio_xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    ADD COLUMN IF NOT EXISTS cambio BIGINT NOT NULL DEFAULT nextval('incidents_cambio_seq');
+
+DROP INDEX IF EXISTS incidents_cambios_idx;
+DROP INDEX IF EXISTS incidents_eliminados_cambios_idx;
+CREATE INDEX IF NOT EXISTS incidents_cambio_idx ON incidents (cambio_xid, cambio);
+CREATE INDEX IF NOT EXISTS incidents_eliminados_cambio_idx ON incidents_eliminados (cambio_xid, cambio);
+
+CREATE OR REPLACE FUNCTION incidents_cambio_marcar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.cambio_xid := pg_current_xact_id();
+    NEW.cambio := nextval('incidents_cambio_seq');
+    RETURN NEW;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_cambio_update ON incidents;
+CREATE TRIGGER incidents_cambio_update BEFORE UPDATE ON incidents
+    FOR EACH ROW EXECUTE FUNCTION incidents_cambio_marcar();
+
+-- Un incidente que se vuelve a eliminar toma la posición del nuevo borrado
+CREATE OR REPLACE FUNCTION incidents_eliminados_registrar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO incidents_eliminados (number, eliminado_en)
+        SELECT number, localtimestamp FROM viejas
+        ON CONFLICT (number) DO UPDATE
+        SET eliminado_en = EXCLUDED.eliminado_en, cambio_xid = EXCLUDED.cambio_xid, cambio = EXCLUDED.cambio;
+    ELSE
+        DELETE FROM incidents_eliminados e USING nuevas n WHERE e.number = n.number;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# Migración 10: la huella de un incidente (ver huellas.py) deja de valer en cuanto la fila cambia o se elimina por
+# cualquier camino: la API, un lote, src/app.py o SQL directo. Triggers por sentencia, como los del resumen, la borran
+# en la misma transacción; las cargas de archivos registran las huellas nuevas después de su fusión.
+_SQL_HUELLAS = """
+CREATE OR REPLACE FUNCTION incidents_huellas_olvidar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM incidents_huellas h USING viejas v WHERE h.number = v.number;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_huellas_update ON incidents;
+DROP TRIGGER IF EXISTS incidents_huellas_delete ON incidents;
+CREATE TRIGGER incidents_huellas_update AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_huellas_olvidar();
+CREATE TRIGGER incidents_huellas_delete AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_huellas_olvidar();
+"""
+
+# Migración 11: contador de cambios de 'incidents' para el ETag del listado (ver validadores.etag_lista). La cantidad
+# de incidentes y el último 'last_update' no cambian con un UPDATE que no aumenta 'last_update'; el contador sí.
+# Triggers por sentencia, en las mismas sentencias que los del resumen, lo aumentan en la transacción del cambio, así
+# los lectores lo ven cambiar junto con los datos. Se reparte en 16 filas (según el proceso del servidor) para que
+# las escrituras simultáneas no esperen todas por la misma fila; el valor es la suma. La recarga completa y la
+# retención de particiones, que no pasan por los triggers, llaman a incidents_version_sumar().
+_SQL_VERSION = """
+CREATE TABLE IF NOT EXISTS incidents_version (
+    ranura SMALLINT PRIMARY KEY,
+    cambios BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO incidents_version (ranura) SELECT generate_series(0, 15) ON CONFLICT (ranura) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incidents_version_sumar() RETURNS void LANGUAGE sql AS $$
+    UPDATE incidents_version SET cambios = cambios + 1 WHERE ranura = pg_backend_pid() % 16;
+$$;
+
+-- Una sentencia que no afectó filas no cambia la versión
+CREATE OR REPLACE FUNCTION incidents_version_aplicar() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT EXISTS (SELECT 1 FROM nuevas) THEN RETURN NULL; END IF;
+    ELSIF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM viejas) THEN RETURN NULL; END IF;
+    END IF;
+    PERFORM incidents_version_sumar();
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS incidents_version_insert ON incidents;
+DROP TRIGGER IF EXISTS incidents_version_update ON incidents;
+DROP TRIGGER IF EXISTS incidents_version_delete ON incidents;
+DROP TRIGGER IF EXISTS incidents_version_truncate ON incidents;
+CREATE TRIGGER incidents_version_insert AFTER INSERT ON incidents
+    REFERENCING NEW TABLE AS nuevas FOR EACH STATEMENT EXECUTE FUNCTION incidents_version_aplicar();
+CREATE TRIGGER incidents_version_update AFTER UPDATE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_version_aplicar();
+CREATE TRIGGER incidents_version_delete AFTER DELETE ON incidents
+    REFERENCING OLD TABLE AS viejas FOR EACH STATEMENT EXECUTE FUNCTION incidents_version_aplicar();
+CREATE TRIGGER incidents_version_truncate AFTER TRUNCATE ON incidents
+    FOR EACH STATEMENT EXECUTE FUNCTION incidents_version_aplicar();
+"""
+
+# Migraciones en orden: (versión, descripción, SQL). Nunca se modifica una ya publicada; los cambios van en una nueva.
+# Todas usan IF NOT EXISTS para adoptar bases de datos creadas a mano antes de existir este módulo.
+MIGRACIONES = (
+    (1, "Tabla de incidentes", """
+        CREATE TABLE IF NOT EXISTS incidents (
+            number VARCHAR(50) PRIMARY KEY,
+            state VARCHAR(50),
+            created TIMESTAMP,
+            last_update TIMESTAMP,
+            incident_ci_type VARCHAR(100),
+            affected_user VARCHAR(100),
+            user_location VARCHAR(100),
+            assignment_group VARCHAR(100),
+            assigned_to VARCHAR(100),
+            urgency VARCHAR(50),
+            severity VARCHAR(50),
+            created_by VARCHAR(50),
+            updated_by VARCHAR(50)
+        );
+    """),
+    (2, "Índices para los filtros de GET /incidentes", _SQL_INDICES),
+    (3, "Huellas de archivos procesados y de incidentes", """
+        CREATE TABLE IF NOT EXISTS archivos_procesados (
+            huella CHAR(64) NOT NULL,
+            tipo VARCHAR(20) NOT NULL,
+            procesado_en TIMESTAMP NOT NULL DEFAULT now(),
+            resultado JSONB,
+            PRIMARY KEY (huella, tipo)
+        );
+        CREATE TABLE IF NOT EXISTS incidents_huellas (
+            number VARCHAR(50) PRIMARY KEY,
+            huella BIGINT NOT NULL
+        );
+    """),
+    (4, "Resumen por estado, grupo, severidad y urgencia", _SQL_RESUMEN),
+    (5, "Registro de cambios: orden por last_update y marcas de incidentes eliminados", _SQL_CAMBIOS),
+    # Avance de los archivos que carga carga_masiva.py: cada bloque se confirma junto con su fila aquí, así una
+    # carga interrumpida continúa en el bloque siguiente al último confirmado. La fila se borra al terminar el
+    # archivo, que queda registrado en 'archivos_procesados'.
+    (6, "Avance por bloques de la carga masiva de archivos", """
+        CREATE TABLE IF NOT EXISTS archivos_avance (
+            huella CHAR(64) NOT NULL,
+            tipo VARCHAR(20) NOT NULL,
+            ruta TEXT NOT NULL,
+            tamano_bloque INTEGER NOT NULL,
+            bloques INTEGER NOT NULL,
+            filas BIGINT NOT NULL,
+            actualizado_en TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (huella, tipo)
+        );
+    """),
+    (7, "Tabla de incidentes particionada por mes de 'created'", _SQL_PARTICIONES),
+    (8, "Registro de cambios: posición asignada por el servidor en cada escritura", _SQL_CAMBIOS_SECUENCIA),
+    (9, "Números de incidente únicos en la tabla particionada", _SQL_NUMEROS),
+    (10, "Huellas de incidentes invalidadas por triggers al modificarlos o eliminarlos", _SQL_HUELLAS),
+    (11, "Contador de cambios de incidentes para el ETag del listado", _SQL_VERSION),
+)
+
+# Migraciones que reescriben o recorren una tabla completa: {versión: tabla}. No se aplican al atender la primera
+# solicitud (asegurar_esquema) sino con python src/migraciones.py, salvo que la tabla esté vacía (una base de datos nueva).
+MIGRACIONES_MANUALES = {7: 'incidents', 8: 'incidents', 9: 'incidents'}
+
+
+# Se lanza cuando falta una migración que hay que aplicar con python src/migraciones.py
+class MigracionPendienteError(Exception):
+    pass
+
+
+# Aplica las migraciones pendientes; cada una se confirma por separado junto con su registro en 'esquema_version'.
+# Con 'manuales' en False se detiene antes de una migración de MIGRACIONES_MANUALES que tenga datos que reescribir.
+def aplicar_migraciones(manuales=True):
+    aplicadas = []
+    with conexion_db() as conexion:
+        with conexion.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS esquema_version (
+                    version INTEGER PRIMARY KEY,
+                    descripcion TEXT NOT NULL,
+                    aplicada_en TIMESTAMP NOT NULL DEFAULT now()
+                )
+            """)
+            conexion.commit()
+
+        for version, descripcion, sql in MIGRACIONES:
+            with conexion.cursor() as cursor:
+                # El candado evita que dos procesos apliquen la misma migración al mismo tiempo
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('esquema_version'))")
+                cursor.execute("SELECT 1 FROM esquema_version WHERE version = %s", (version,))
+                if cursor.fetchone():
+                    conexion.commit()
+                    continue
+                if not manuales and version in MIGRACIONES_MANUALES:
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {MIGRACIONES_MANUALES[version]})")
+                    if cursor.fetchone()[0]:
+                        conexion.commit()
+                        raise MigracionPendienteError(
+                            f"Falta la migración {version} ({descripcion}), que procesa la tabla "
+                            f"'{MIGRACIONES_MANUALES[version]}' completa: aplíquela con python src/migraciones.py"
+                        )
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO esquema_version (version, descripcion) VALUES (%s, %s)", (version, descripcion)
+                )
+            conexion.commit()
+            aplicadas.append(version)
+    return aplicadas
+
+
+# Asegura que el esquema esté al día antes de usar la base de datos; solo consulta la primera vez por proceso.
+# Lanza MigracionPendienteError si falta una migración manual: hasta aplicarla, cada llamada lo vuelve a comprobar.
+def asegurar_esquema():
+    global _esquema_listo
+    if _esquema_listo:
+        return
+    with _esquema_lock:
+        if _esquema_listo:
+            return
+        aplicadas = aplicar_migraciones(manuales=False)
+        if aplicadas:
+            registro.info("Migraciones aplicadas: %s", ', '.join(map(str, aplicadas)))
+        _esquema_listo = True
+
+
+# Permite actualizar el esquema sin levantar la API, incluidas las migraciones manuales: python src/migraciones.py
+if __name__ == '__main__':
+    print(f"Migraciones aplicadas: {aplicar_migraciones() or 'ninguna, el esquema ya estaba al día'}")
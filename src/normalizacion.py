@@ -0,0 +1,67 @@
+# Normalización de los incidentes exportados de ServiceNow, compartida por transform.py y la API
+import pandas as pd  # Manipulación de los datos tabulares
+from metricas import medir  # Duración de las etapas de la normalización
+
+# Nombres de las columnas del archivo exportado y su equivalente en la tabla 'incidents'
+RENOMBRAR_COLUMNAS = {
+    'Number': 'number', 'State': 'state', 'Created': 'created', 'Last update': 'last_update',
+    'Incident CI type': 'incident_ci_type', 'Affected User': 'affected_user', 'User location': 'user_location',
+    'Assignment Group': 'assignment_group', 'Assigned to': 'assigned_to', 'Urgency': 'urgency',
+    'Severity': 'severity', 'Created By': 'created_by', 'Updated By': 'updated_by'
+}
+
+# Columnas de la tabla 'incidents' en el orden en que se cargan
+COLUMNAS = (
+    'number', 'state', 'created', 'last_update', 'incident_ci_type', 'affected_user',
+    'user_location', 'assignment_group', 'assigned_to', 'urgency', 'severity',
+    'created_by', 'updated_by'
+)
+
+# Columnas con pocos valores distintos: se guardan como categorías (un código por fila en lugar de un texto)
+COLUMNAS_CATEGORICAS = ('state', 'urgency', 'severity', 'incident_ci_type', 'assignment_group', 'user_location')
+
+# Columnas de fecha y formato en el que vienen en el archivo exportado (MM-DD-YYYY HH:MM:SS)
+COLUMNAS_FECHA = ('created', 'last_update')
+FORMATO_FECHA_ORIGEN = '%m-%d-%Y %H:%M:%S'
+
+
+# Normaliza un DataFrame leído del CSV exportado (archivo completo o un bloque).
+# Modifica las columnas del DataFrame recibido en lugar de copiarlo completo.
+# 'tramos' (opcional) acumula la duración de la conversión de fechas y de tipos.
+def normalizar_incidentes(df, tramos=None):
+    # Renombra las columnas; si el encabezado viene alterado (por ejemplo 'Severity' repetido)
+    # pero trae las 13 columnas, se asignan por posición como hacía la carga fila por fila
+    columnas = [RENOMBRAR_COLUMNAS.get(col, col) for col in df.columns]
+    if set(columnas) != set(COLUMNAS):
+        if len(columnas) != len(COLUMNAS):
+            faltantes = ', '.join(col for col in COLUMNAS if col not in columnas)
+            raise ValueError(f"El archivo no tiene las columnas esperadas; faltan: {faltantes}")
+        columnas = list(COLUMNAS)
+    df.columns = columnas
+    if columnas != list(COLUMNAS):
+        df = df.reindex(columns=list(COLUMNAS))  # Reordena solo si el archivo trae las columnas en otro orden
+
+    # Convierte las dos columnas de fecha en una sola pasada vectorizada; las fechas inválidas quedan como NaT (NULL)
+    filas = len(df)
+    with medir(tramos, 'fechas'):
+        fechas = pd.to_datetime(
+            pd.concat([df[col] for col in COLUMNAS_FECHA], ignore_index=True),
+            format=FORMATO_FECHA_ORIGEN, errors='coerce', cache=True
+        )
+        for i, col in enumerate(COLUMNAS_FECHA):
+            df[col] = fechas.iloc[i * filas:(i + 1) * filas].to_numpy()
+
+    # Columnas de texto: categorías para las de pocos valores y 'string' para el resto.
+    # Los valores vacíos quedan como nulos (<NA>) y no como el texto "nan"
+    with medir(tramos, 'tipos'):
+        for col in COLUMNAS:
+            if col in COLUMNAS_FECHA:
+                continue
+            df[col] = df[col].astype('category' if col in COLUMNAS_CATEGORICAS else 'string')
+
+    return df
+
+
+# Bytes de memoria por fila del DataFrame, para comparar el costo de distintas representaciones
+def memoria_por_fila(df):
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
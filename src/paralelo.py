@@ -0,0 +1,125 @@
+# Lectura de archivos CSV muy grandes en varios procesos: el archivo se divide en rangos de bytes que empiezan
+# y terminan en un límite de fila, cada proceso lee y normaliza su rango y los resultados se entregan en orden
+import multiprocessing  # Contexto 'spawn' para los procesos lectores
+from collections import deque  # Rangos enviados a los procesos, en orden de llegada
+from concurrent.futures import ProcessPoolExecutor  # Pool de procesos lectores
+import pandas as pd  # Lectura y unión de los rangos
+from metricas import Tramos  # Duración de las etapas dentro de cada proceso
+from lectores import columnas_archivo, detectar_codificacion, leer_bytes  # Motores de lectura y codificación
+from normalizacion import COLUMNAS_CATEGORICAS  # Columnas que se vuelven a convertir en categorías al unir
+
+TAMANO_LECTURA = 8 * 1024 * 1024  # Bytes que se leen a la vez al buscar los límites de fila
+COMILLA = b'"'
+FIN_DE_LINEA = b'\n'
+
+
+# Primer fin de fila real a partir de 'posicion': un salto de línea con una cantidad par de comillas antes.
+# 'paridad' es la cantidad de comillas (módulo 2) entre el inicio del archivo y 'posicion'; las comillas
+# escapadas ("") suman dos, así que no cambian la paridad. Devuelve la posición siguiente al salto de línea.
+def _siguiente_fin_de_fila(archivo, posicion, paridad):
+    archivo.seek(posicion)
+    while True:
+        datos = archivo.read(TAMANO_LECTURA)
+        if not datos:
+            return posicion
+        desde = 0
+        while True:
+            salto = datos.find(FIN_DE_LINEA, desde)
+            if salto < 0:
+                paridad = (paridad + datos.count(COMILLA, desde)) % 2
+                posicion += len(datos)
+                break
+            paridad = (paridad + datos.count(COMILLA, desde, salto)) % 2
+            if paridad == 0:
+                return posicion + salto + 1  # El salto de línea está fuera de un campo entre comillas
+            desde = salto + 1
+
+
+# Divide el archivo en rangos de bytes [inicio, fin) de unos 'tamano_rango' bytes (al menos uno por proceso)
+# que empiezan y terminan en un límite de fila. Los saltos de línea dentro de un campo entre comillas no
+# cuentan como fin de fila. El primer rango empieza después del encabezado.
+def rangos_archivo(ruta, procesos, tamano_rango):
+    with open(ruta, 'rb') as archivo, open(ruta, 'rb') as buscador:
+        archivo.seek(0, 2)
+        tamano = archivo.tell()
+        inicio_datos = _siguiente_fin_de_fila(buscador, 0, 0)
+        cantidad = max(procesos, -(-(tamano - inicio_datos) // tamano_rango), 1)
+        objetivos = [inicio_datos + (tamano - inicio_datos) * i // cantidad for i in range(1, cantidad)]
+
+        # Una sola pasada secuencial cuenta las comillas hasta cada objetivo (bytes.count es tan rápido como
+        # leer el archivo); desde cada objetivo se avanza hasta el siguiente fin de fila real
+        limites = [inicio_datos]
+        posicion, paridad = 0, 0
+        archivo.seek(0)
+        for objetivo in objetivos:
+            while posicion < objetivo:
+                datos = archivo.read(min(TAMANO_LECTURA, objetivo - posicion))
+                paridad = (paridad + datos.count(COMILLA)) % 2
+                posicion += len(datos)
+            limite = _siguiente_fin_de_fila(buscador, objetivo, paridad)
+            if limites[-1] < limite < tamano:
+                limites.append(limite)
+        limites.append(tamano)
+
+    return [(inicio, fin) for inicio, fin in zip(limites, limites[1:]) if inicio < fin]
+
+
+# Lee y normaliza un rango del archivo dentro de un proceso lector; devuelve el DataFrame y la duración de
+# cada etapa. Todas las columnas se leen como texto para que el tipo no dependa de las filas de cada rango.
+def _leer_rango(ruta, inicio, fin, columnas, motor, codificacion, limpiar):
+    tramos = Tramos()
+    with tramos.medir('lectura'):
+        with open(ruta, 'rb') as archivo:
+            archivo.seek(inicio)
+            datos = archivo.read(fin - inicio)
+        df = leer_bytes(datos, columnas, motor, codificacion)
+    df = limpiar(df, tramos)
+    return df, tramos.segundos
+
+
+# Lee el archivo en 'procesos' procesos y entrega cada rango ya limpio con 'limpiar(df, tramos)', en el mismo
+# orden del archivo. 'limpiar' debe ser una función de nivel de módulo, porque se envía a los procesos.
+# Solo se adelantan dos rangos por proceso, así la memoria no depende del tamaño del archivo.
+def leer_en_paralelo(ruta, limpiar, procesos, tamano_rango, motor='pandas', codificacion=None, tramos=None):
+    codificacion = codificacion or detectar_codificacion(ruta)
+    if codificacion == 'utf-16':
+        # Los límites de fila se buscan byte a byte, lo que solo funciona con codificaciones compatibles con ASCII
+        raise ValueError("El modo paralelo no admite archivos UTF-16; use el modo 'completo' o 'bloques'")
+    columnas = columnas_archivo(ruta, codificacion)
+    rangos = iter(rangos_archivo(ruta, procesos, tamano_rango))
+
+    # 'spawn' inicia procesos nuevos en lugar de copiar este: la API tiene hilos y conexiones abiertas
+    # que no se deben duplicar
+    ejecutor = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
+    pendientes = deque()
+
+    def enviar():
+        rango = next(rangos, None)
+        if rango is not None:
+            pendientes.append(ejecutor.submit(_leer_rango, ruta, *rango, columnas, motor, codificacion, limpiar))
+
+    try:
+        for _ in range(procesos * 2):
+            enviar()
+        while pendientes:
+            df, segundos = pendientes.popleft().result()
+            enviar()
+            if tramos is not None:
+                for etapa, duracion in segundos.items():
+                    tramos.agregar(etapa, duracion)
+            yield df
+    finally:
+        # Si quien consume deja de pedir rangos (o falla) no se espera a los que faltan
+        ejecutor.shutdown(wait=True, cancel_futures=True)
+
+
+# Lee el archivo completo en paralelo y une los rangos en un solo DataFrame. Cada rango tiene sus propias
+# categorías, así que las columnas categóricas se vuelven a convertir después de unirlos.
+def leer_archivo_paralelo(ruta, limpiar, procesos, tamano_rango, motor='pandas', codificacion=None, tramos=None):
+    df = pd.concat(
+        list(leer_en_paralelo(ruta, limpiar, procesos, tamano_rango, motor, codificacion, tramos)), ignore_index=True
+    )
+    for col in COLUMNAS_CATEGORICAS:
+        if df[col].dtype != 'category':
+            df[col] = df[col].astype('category')
+    return df
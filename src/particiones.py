@@ -0,0 +1,235 @@
+# Particiones mensuales de 'incidents' por 'created' (migración 7). Cada mes vive en su propia tabla
+# (incidents_2025_01, ...), así los filtros por 'created' solo leen los meses que piden y la retención quita meses
+# completos en lugar de borrar filas. La partición por defecto (incidents_sin_mes) guarda los incidentes sin
+# 'created' y los de meses cuya partición no se pudo crear a tiempo; el mantenimiento los mueve a su mes.
+# Mantenimiento: python src/particiones.py [--meses-futuros 3] [--retener-meses 36 [--archivar]]
+import argparse  # Parámetros del mantenimiento desde la línea de comandos
+import re  # Meses de las particiones a partir de sus límites
+from datetime import date  # Primer día de cada mes
+import numpy as np  # Meses distintos de una columna de fechas
+import pandas as pd  # Fechas del DataFrame que se va a cargar
+import psycopg2  # Errores al crear una partición durante una carga
+from basedatos import bloquear_tablas, conexion_db  # Candado con reintentos y conexión propia
+from config import config  # Tiempo de espera del candado y meses de retención
+
+configuracion = config['development']
+
+TABLA = 'incidents'
+SUFIJO_SIN_MES = '_sin_mes'
+
+
+# Nombre de la partición de un mes: incidents_2025_01
+def nombre_particion(tabla, mes):
+    return f'{tabla}_{mes:%Y_%m}'
+
+
+def mes_siguiente(mes, meses=1):
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+# Meses distintos (primer día de cada uno) de una columna de fechas; las fechas nulas se ignoran
+def meses_de(fechas):
+    valores = pd.to_datetime(fechas, errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return [mes.astype(date) for mes in np.unique(valores[~np.isnat(valores)].astype('datetime64[M]'))]
+
+
+# Indica si la tabla está particionada
+def particionada(cursor, tabla):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (tabla,))
+    return cursor.fetchone()[0]
+
+
+# Particiones mensuales de la tabla: {mes: nombre}. La partición por defecto no se incluye.
+def particiones(cursor, tabla):
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (tabla,))
+    meses = {}
+    for nombre, limites in cursor.fetchall():
+        desde = re.search(r"FROM \('(\d{4})-(\d{2})-01 00:00:00'\)", limites)
+        if desde:
+            meses[date(int(desde.group(1)), int(desde.group(2)), 1)] = nombre
+    return meses
+
+
+# Crea 'destino' con la estructura de 'tabla'; si 'tabla' está particionada, 'destino' se particiona igual y
+# recibe su propia partición por defecto (las mensuales se crean con crear_particiones)
+def crear_como(cursor, tabla, destino):
+    cursor.execute("SELECT pg_get_partkeydef(%s::regclass)", (tabla,))
+    clave = cursor.fetchone()[0]
+    particion = f" PARTITION BY {clave}" if clave else ''
+    cursor.execute(f"CREATE TABLE {destino} (LIKE {tabla} INCLUDING DEFAULTS){particion}")
+    if clave:
+        cursor.execute(f"CREATE TABLE {destino}{SUFIJO_SIN_MES} PARTITION OF {destino} DEFAULT")
+
+
+# Crea las particiones de los meses que faltan dentro de la transacción de quien llama. Solo sirve para tablas
+# que nadie más usa todavía (la tabla sombra de la recarga): crear una partición bloquea toda la tabla.
+def crear_particiones(cursor, tabla, meses):
+    existentes = particiones(cursor, tabla)
+    for mes in meses:
+        if mes not in existentes:
+            cursor.execute(
+                f"CREATE TABLE {nombre_particion(tabla, mes)} PARTITION OF {tabla} FOR VALUES FROM (%s) TO (%s)",
+                (mes, mes_siguiente(mes))
+            )
+
+
+# Cambia el nombre de una tabla y el de sus índices que empiezan con ese nombre
+# (incidents_nueva_2025_01_state_number_idx -> incidents_2025_01_state_number_idx)
+def renombrar_tabla(cursor, nombre, nuevo):
+    cursor.execute("""
+        SELECT x.relname FROM pg_index i JOIN pg_class x ON x.oid = i.indexrelid WHERE i.indrelid = %s::regclass
+    """, (nombre,))
+    for (indice,) in cursor.fetchall():
+        if indice.startswith(f'{nombre}_'):
+            cursor.execute(f"ALTER INDEX {indice} RENAME TO {nuevo}{indice[len(nombre):]}")
+    cursor.execute(f"ALTER TABLE {nombre} RENAME TO {nuevo}")
+
+
+# Cambia el prefijo del nombre de las particiones de 'tabla' (incidents_nueva_2025_01 -> incidents_2025_01)
+def renombrar_particiones(cursor, tabla, prefijo, nuevo_prefijo):
+    cursor.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+                   (tabla,))
+    for (nombre,) in cursor.fetchall():
+        if nombre.startswith(f'{prefijo}_'):
+            renombrar_tabla(cursor, nombre, f'{nuevo_prefijo}{nombre[len(prefijo):]}')
+
+
+# Agrega la partición de un mes a 'incidents' en una transacción corta de 'conexion'. Se crea como tabla aparte y
+# luego se adjunta, porque adjuntar no bloquea las lecturas ni las escrituras de 'incidents'. Si no se puede
+# (la partición por defecto está en uso por más de 'espera' segundos, ya tiene filas de ese mes u otra carga creó
+# la partición al mismo tiempo) devuelve False y las filas de ese mes van a la partición por defecto.
+def adjuntar_particion(conexion, mes, espera):
+    nombre = nombre_particion(TABLA, mes)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = %s", (f'{int(espera * 1000)}ms',))
+            cursor.execute(f"CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)", (mes, mes_siguiente(mes))
+            )
+        conexion.commit()
+        return True
+    except psycopg2.Error:
+        conexion.rollback()
+        return False
+
+
+# Antes de copiar un bloque a 'incidents' (o a la tabla temporal que se fusiona con ella) se crean las particiones
+# de sus meses que aún no existen. La consulta usa la conexión de la carga; las particiones se crean con otra
+# conexión y se confirman de inmediato, así la carga no retiene el candado de la tabla hasta terminar. La carga
+# ve las particiones nuevas desde su siguiente sentencia.
+def asegurar_particiones(conexion, fechas):
+    meses = meses_de(fechas)
+    if not meses:
+        return
+    with conexion.cursor() as cursor:
+        if not particionada(cursor, TABLA):
+            return
+        existentes = particiones(cursor, TABLA)
+    faltantes = [mes for mes in meses if mes not in existentes]
+    if faltantes:
+        with conexion_db() as propia:
+            for mes in faltantes:
+                adjuntar_particion(propia, mes, configuracion.PARTICIONES_ESPERA_CANDADO)
+
+
+# Mueve a su partición mensual las filas con fecha que quedaron en la partición por defecto. Las sentencias se
+# hacen sobre las particiones y no sobre 'incidents', así no se disparan los triggers del resumen ni de eliminados
+# (las filas solo cambian de lugar). Devuelve los meses movidos.
+def mover_sin_mes(conexion, espera, intentos):
+    sin_mes = f'{TABLA}{SUFIJO_SIN_MES}'
+    with conexion.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', created)::date FROM {sin_mes} WHERE created IS NOT NULL")
+        meses = sorted(fila[0] for fila in cursor.fetchall())
+    conexion.commit()
+    for mes in meses:
+        nombre = nombre_particion(TABLA, mes)
+        rango = (mes, mes_siguiente(mes))
+        with conexion.cursor() as cursor:
+            bloquear_tablas(cursor, (sin_mes,), espera, intentos)
+            cursor.execute(f"CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)")
+            cursor.execute(f"INSERT INTO {nombre} SELECT * FROM {sin_mes} WHERE created >= %s AND created < %s", rango)
+            cursor.execute(f"DELETE FROM {sin_mes} WHERE created >= %s AND created < %s", rango)
+            cursor.execute(f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)", rango)
+        conexion.commit()
+    return meses
+
+
+# Quita de 'incidents' los meses anteriores a los últimos 'retener_meses' (contando el actual): cada partición se
+# desprende y se elimina, o se conserva como tabla aparte (incidents_archivo_2022_01) si 'archivar' es True.
+# Se descuentan sus filas del resumen, se liberan sus números y se olvidan sus huellas y los archivos procesados,
+# para que volver a cargarlos inserte de nuevo los incidentes. No se dejan marcas en 'incidents_eliminados': la
+# retención no es un borrado, los clientes de GET /incidentes/changes aplican su propia retención. Devuelve los
+# meses quitados.
+def aplicar_retencion(conexion, retener_meses, archivar, espera, intentos):
+    from huellas import olvidar_archivos  # Aquí para no importar las huellas al cargar este módulo
+    limite = mes_siguiente(date.today().replace(day=1), -(retener_meses - 1))
+    with conexion.cursor() as cursor:
+        antiguos = sorted((mes, nombre) for mes, nombre in particiones(cursor, TABLA).items() if mes < limite)
+    conexion.commit()
+    for mes, nombre in antiguos:
+        with conexion.cursor() as cursor:
+            # Mientras se descuenta el resumen nadie puede escribir en 'incidents', así el resumen queda exacto
+            bloquear_tablas(cursor, (TABLA,), espera, intentos)
+            cursor.execute(f"""
+                INSERT INTO incidents_resumen AS r (state, assignment_group, severity, urgency, total)
+                SELECT coalesce(state, ''), coalesce(assignment_group, ''), coalesce(severity, ''),
+                       coalesce(urgency, ''), -count(*)
+                FROM {nombre}
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (state, assignment_group, severity, urgency) DO UPDATE SET total = r.total + EXCLUDED.total
+            """)
+            cursor.execute("DELETE FROM incidents_resumen WHERE total <= 0")
+            cursor.execute("SELECT incidents_version_sumar()")  # Cambia el ETag del listado, como un DELETE
+            cursor.execute(f"DELETE FROM incidents_huellas h USING {nombre} p WHERE h.number = p.number")
+            # Desprender la partición no dispara los triggers de 'incidents': sus números se liberan aquí
+            cursor.execute(f"DELETE FROM incidents_numeros n USING {nombre} p WHERE n.number = p.number")
+            cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}")
+            if archivar:
+                renombrar_tabla(cursor, nombre, nombre_particion(f'{TABLA}_archivo', mes))
+            else:
+                cursor.execute(f"DROP TABLE {nombre}")
+        olvidar_archivos(conexion)
+        conexion.commit()
+    return [mes for mes, _ in antiguos]
+
+
+# Mantenimiento periódico: mueve las filas de la partición por defecto a su mes, crea las particiones de los
+# próximos meses y aplica la retención (si 'retener_meses' es mayor que cero)
+def mantener(meses_futuros, retener_meses, archivar):
+    from migraciones import asegurar_esquema  # La tabla particionada se crea en la migración 7
+    asegurar_esquema()
+    espera, intentos = configuracion.RECARGA_ESPERA_CANDADO, configuracion.RECARGA_INTENTOS
+    resultado = {}
+    with conexion_db() as conexion:
+        resultado['movidos'] = mover_sin_mes(conexion, espera, intentos)
+        actual = date.today().replace(day=1)
+        with conexion.cursor() as cursor:
+            existentes = particiones(cursor, TABLA)
+        conexion.commit()
+        resultado['creados'] = [
+            mes for mes in (mes_siguiente(actual, i) for i in range(meses_futuros + 1))
+            if mes not in existentes and adjuntar_particion(conexion, mes, espera)
+        ]
+        resultado['retirados'] = aplicar_retencion(conexion, retener_meses, archivar, espera, intentos) \
+            if retener_meses > 0 else []
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mantenimiento de las particiones mensuales de 'incidents'")
+    parser.add_argument('--meses-futuros', type=int, default=configuracion.PARTICIONES_MESES_FUTUROS,
+                        help="Meses después del actual cuya partición se crea por adelantado")
+    parser.add_argument('--retener-meses', type=int, default=configuracion.PARTICIONES_RETENER_MESES,
+                        help="Meses que se conservan contando el actual (0: sin retención)")
+    parser.add_argument('--archivar', action='store_true',
+                        help="Conserva los meses retirados como tablas incidents_archivo_AAAA_MM en lugar de eliminarlos")
+    args = parser.parse_args()
+    resultado = mantener(args.meses_futuros, args.retener_meses, args.archivar)
+    for clave, meses in resultado.items():
+        print(f"{clave}: {', '.join(f'{mes:%Y-%m}' for mes in meses) or 'ninguno'}")
@@ -0,0 +1,210 @@
+# Recarga completa de 'incidents' con una tabla sombra: el archivo se carga en 'incidents_nueva' sin índices ni
+# triggers mientras las lecturas siguen usando la tabla actual; al final se crean los índices y la tabla nueva
+# reemplaza a la anterior con un cambio de nombre dentro de la misma transacción. Las lecturas ven la tabla
+# anterior completa o la nueva completa, nunca una carga a medias. La tabla anterior se elimina después, en un hilo
+# aparte, en lugar de borrar sus filas una por una. Las huellas de los incidentes (y, con 'incidents' particionada,
+# la llave única de los números) se recargan de la misma forma.
+import io  # Búfer en memoria para enviar las huellas con COPY
+import re  # Cambio de tabla y de nombre en las definiciones de índices y triggers
+import threading  # Eliminación de la tabla anterior en segundo plano
+from datetime import date  # Meses actuales y futuros que se conservan en la tabla nueva
+import pandas as pd  # Huellas de las filas cargadas
+from basedatos import bloquear_tablas, conexion_db  # Candado del intercambio y conexión del hilo que elimina la tabla anterior
+from carga import copiar_dataframe  # COPY a la tabla sombra
+from huellas import huellas_filas  # Huella de cada fila, igual que en las cargas incrementales
+from migraciones import asegurar_esquema  # La tabla actual debe existir para copiar su estructura
+from metricas import medir  # Duración de cada etapa
+from particiones import (
+    crear_como, crear_particiones, meses_de, particionada, particiones, renombrar_particiones
+)  # La tabla sombra se particiona igual que 'incidents'
+
+TABLA = 'incidents'
+HUELLAS = 'incidents_huellas'
+NUMEROS = 'incidents_numeros'  # Llave única de 'number' cuando 'incidents' está particionada (migración 9)
+SUFIJO_NUEVA = '_nueva'
+SUFIJO_ANTERIOR = '_anterior'
+
+
+# Definición de un índice o trigger de 'tabla' adaptada a 'destino': cambia la tabla y agrega 'sufijo' al nombre
+def _definicion_para(definicion, tabla, destino, nombre=None, sufijo=''):
+    definicion = re.sub(rf' ON (ONLY )?(\w+\.)?{tabla} ', f' ON {destino} ', definicion, count=1)
+    if nombre is not None:
+        definicion = definicion.replace(f' {nombre} ', f' {nombre}{sufijo} ', 1)
+    return definicion
+
+
+# Índices de la tabla: (nombre, definición)
+def _indices(cursor, tabla):
+    cursor.execute("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+        ORDER BY i.indisprimary DESC, c.relname
+    """, (tabla,))
+    return cursor.fetchall()
+
+
+# Restricciones de la tabla que crean un índice (llave primaria y UNIQUE): (nombre del índice, definición)
+def _restricciones(cursor, tabla):
+    cursor.execute("""
+        SELECT c.relname, pg_get_constraintdef(r.oid)
+        FROM pg_constraint r JOIN pg_class c ON c.oid = r.conindid
+        WHERE r.conrelid = %s::regclass AND r.contype IN ('p', 'u')
+    """, (tabla,))
+    return dict(cursor.fetchall())
+
+
+# Copia en 'destino' los índices de 'tabla' con el nombre seguido de 'sufijo'; la llave primaria se crea como
+# restricción para que 'destino' la tenga igual que la tabla original
+def _copiar_indices(cursor, tabla, destino, sufijo):
+    restricciones = _restricciones(cursor, tabla)
+    for nombre, definicion in _indices(cursor, tabla):
+        if nombre in restricciones:
+            cursor.execute(f"ALTER TABLE {destino} ADD CONSTRAINT {nombre}{sufijo} {restricciones[nombre]}")
+        else:
+            cursor.execute(_definicion_para(definicion, tabla, destino, nombre, sufijo))
+
+
+# Cambia el sufijo del nombre de los índices de 'tabla' (al renombrar el índice de una restricción, PostgreSQL
+# también renombra la restricción)
+def _renombrar_indices(cursor, tabla, quitar, agregar):
+    for nombre, _ in _indices(cursor, tabla):
+        base = nombre[:-len(quitar)] if quitar and nombre.endswith(quitar) else nombre
+        if base + agregar != nombre:
+            cursor.execute(f"ALTER INDEX {nombre} RENAME TO {base}{agregar}")
+
+
+# Reemplaza 'tabla' por 'tabla_nueva': la actual pasa a 'tabla_anterior' y cada una lleva sus índices y sus
+# particiones (incidents_2025_01 pasa a incidents_anterior_2025_01 e incidents_nueva_2025_01 a incidents_2025_01)
+def _intercambiar(cursor, tabla):
+    cursor.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}{SUFIJO_ANTERIOR}")
+    _renombrar_indices(cursor, f'{tabla}{SUFIJO_ANTERIOR}', '', SUFIJO_ANTERIOR)
+    renombrar_particiones(cursor, f'{tabla}{SUFIJO_ANTERIOR}', tabla, f'{tabla}{SUFIJO_ANTERIOR}')
+    cursor.execute(f"ALTER TABLE {tabla}{SUFIJO_NUEVA} RENAME TO {tabla}")
+    _renombrar_indices(cursor, tabla, SUFIJO_NUEVA, '')
+    renombrar_particiones(cursor, tabla, f'{tabla}{SUFIJO_NUEVA}', tabla)
+
+
+# Carga completa en una tabla sombra. Todo ocurre en la transacción de 'conexion', que confirma quien la usa:
+# si algo falla antes del commit las tablas sombra desaparecen con el rollback y 'incidents' queda intacta.
+# Los cambios hechos a 'incidents' por otras solicitudes mientras se carga el archivo se pierden con el
+# intercambio (la recarga reemplaza todo el contenido).
+class RecargaCompleta:
+    def __init__(self, conexion, espera, intentos):
+        self.conexion = conexion
+        self.espera = espera
+        self.intentos = intentos
+        asegurar_esquema()
+        with conexion.cursor() as cursor:
+            # Una sola recarga a la vez; el candado se libera al terminar la transacción
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('recarga_completa'))")
+            self.particionada = particionada(cursor, TABLA)
+            # Con 'incidents' particionada también se reemplaza la tabla con la llave única de los números
+            self.tablas = (TABLA, HUELLAS, NUMEROS) if self.particionada else (TABLA, HUELLAS)
+            for tabla in self.tablas:
+                # La tabla anterior de una recarga previa puede seguir ahí si su eliminación no terminó
+                cursor.execute(f"DROP TABLE IF EXISTS {tabla}{SUFIJO_ANTERIOR}, {tabla}{SUFIJO_NUEVA}")
+                crear_como(cursor, tabla, f'{tabla}{SUFIJO_NUEVA}')
+            # Con 'incidents' particionada, la tabla nueva conserva los meses actual y siguientes que ya existían,
+            # para que las cargas después de la recarga no tengan que crearlos
+            if self.particionada:
+                actual = date.today().replace(day=1)
+                crear_particiones(cursor, f'{TABLA}{SUFIJO_NUEVA}', [mes for mes in particiones(cursor, TABLA) if mes >= actual])
+
+    # Copia un DataFrame normalizado a la tabla sombra junto con las huellas de sus filas. Nadie más usa la tabla
+    # sombra, así que las particiones de sus meses se crean en la misma transacción.
+    def copiar(self, df, al_avanzar=None, tramos=None):
+        if self.particionada:
+            with medir(tramos, 'particiones'), self.conexion.cursor() as cursor:
+                crear_particiones(cursor, f'{TABLA}{SUFIJO_NUEVA}', meses_de(df['created']))
+        estadisticas = copiar_dataframe(
+            self.conexion, df, tabla=f'{TABLA}{SUFIJO_NUEVA}', al_avanzar=al_avanzar, tramos=tramos
+        )
+        if not df.empty:
+            with medir(tramos, 'huellas'):
+                buffer = io.StringIO()
+                pd.DataFrame({'number': df['number'].to_numpy(), 'huella': huellas_filas(df).to_numpy()}).to_csv(
+                    buffer, index=False, header=False, na_rep=''
+                )
+                buffer.seek(0)
+                with self.conexion.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY {HUELLAS}{SUFIJO_NUEVA} (number, huella) FROM STDIN WITH (FORMAT csv, NULL '')", buffer
+                    )
+        return estadisticas
+
+    # Crea los índices y triggers de la tabla actual en la tabla sombra, actualiza el resumen y las marcas de
+    # eliminados y reemplaza la tabla actual. No confirma la transacción. Devuelve cuántos incidentes de la tabla
+    # anterior no están en la nueva (quedan marcados como eliminados para GET /incidentes/changes).
+    def intercambiar(self, tramos=None):
+        nueva = f'{TABLA}{SUFIJO_NUEVA}'
+        with self.conexion.cursor() as cursor:
+            # Los índices se crean una sola vez con todas las filas, más rápido que mantenerlos durante la carga.
+            # Un incidente repetido en el archivo hace fallar la llave primaria (la de 'incidents_numeros' si la
+            # tabla está particionada), igual que en la carga normal.
+            with medir(tramos, 'indices'):
+                if self.particionada:
+                    cursor.execute(f"INSERT INTO {NUMEROS}{SUFIJO_NUEVA} (number) SELECT number FROM {nueva}")
+                _copiar_indices(cursor, TABLA, nueva, SUFIJO_NUEVA)
+                for tabla in self.tablas[1:]:
+                    _copiar_indices(cursor, tabla, f'{tabla}{SUFIJO_NUEVA}', SUFIJO_NUEVA)
+                cursor.execute(f"ANALYZE {nueva}")
+
+                # Lo que solo depende de la tabla nueva se prepara antes de tomar el candado: el resumen y los
+                # triggers, que se crean al final para que no se disparen con cada bloque de la carga
+                cursor.execute(f"""
+                    CREATE TEMP TABLE resumen_recarga ON COMMIT DROP AS
+                    SELECT coalesce(state, '') AS state, coalesce(assignment_group, '') AS assignment_group,
+                           coalesce(severity, '') AS severity, coalesce(urgency, '') AS urgency, count(*) AS total
+                    FROM {nueva}
+                    GROUP BY 1, 2, 3, 4
+                """)
+                cursor.execute("""
+                    SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal
+                """, (TABLA,))
+                for (definicion,) in cursor.fetchall():
+                    cursor.execute(_definicion_para(definicion, TABLA, nueva))
+
+            # Desde aquí hasta el commit las lecturas y escrituras de 'incidents' esperan: solo se marcan los
+            # eliminados (una comparación por índice entre ambas tablas), se copia el resumen y se cambian nombres
+            with medir(tramos, 'intercambio'):
+                bloquear_tablas(cursor, self.tablas, self.espera, self.intentos)
+
+                # Los incidentes que ya no están quedan marcados como eliminados y los que volvieron se desmarcan,
+                # como lo harían los triggers de 'incidents' con un DELETE y un INSERT
+                cursor.execute(f"""
+                    INSERT INTO incidents_eliminados (number, eliminado_en)
+                    SELECT a.number, localtimestamp FROM {TABLA} a
+                    WHERE NOT EXISTS (SELECT 1 FROM {nueva} n WHERE n.number = a.number)
+                    ON CONFLICT (number) DO UPDATE
+                    SET eliminado_en = EXCLUDED.eliminado_en, cambio_xid = EXCLUDED.cambio_xid, cambio = EXCLUDED.cambio
+                """)
+                eliminados = cursor.rowcount
+                cursor.execute(f"DELETE FROM incidents_eliminados e USING {nueva} n WHERE e.number = n.number")
+
+                cursor.execute("SELECT incidents_version_sumar()")  # La carga de la tabla nueva no pasó por los triggers
+                cursor.execute("DELETE FROM incidents_resumen")
+                cursor.execute("""
+                    INSERT INTO incidents_resumen (state, assignment_group, severity, urgency, total)
+                    SELECT state, assignment_group, severity, urgency, total FROM resumen_recarga
+                """)
+
+                for tabla in self.tablas:
+                    _intercambiar(cursor, tabla)
+        return eliminados
+
+
+# Elimina en un hilo aparte las tablas que reemplazó la última recarga, después del commit
+def descartar_anteriores():
+    def descartar():
+        try:
+            with conexion_db() as conexion, conexion.cursor() as cursor:
+                cursor.execute(
+                    f"DROP TABLE IF EXISTS {TABLA}{SUFIJO_ANTERIOR}, {HUELLAS}{SUFIJO_ANTERIOR}, {NUMEROS}{SUFIJO_ANTERIOR}"
+                )
+                conexion.commit()
+        except Exception as ex:
+            # La próxima recarga vuelve a intentarlo
+            print(f"No se pudo eliminar la tabla anterior de la recarga: {ex}")
+
+    threading.Thread(target=descartar, name='recarga-descartar', daemon=True).start()
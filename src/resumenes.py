@@ -0,0 +1,26 @@
+# Tabla de resumen de incidentes por estado, grupo, severidad y urgencia, mantenida de forma incremental
+from migraciones import asegurar_esquema  # La tabla de resumen y sus triggers se crean en la migración 4
+
+# Columnas por las que se puede agrupar en GET /incidentes/stats
+DIMENSIONES = ('state', 'assignment_group', 'severity', 'urgency')
+
+
+# Totales agrupados por las dimensiones pedidas, calculados sobre el resumen y no sobre 'incidents'
+def consultar_resumen(conexion, dimensiones):
+    asegurar_esquema()
+    columnas = ', '.join(dimensiones)
+    with conexion.cursor() as cursor:
+        if dimensiones:
+            cursor.execute(f"""
+                SELECT {columnas}, sum(total) FROM incidents_resumen
+                GROUP BY {columnas} ORDER BY {columnas}
+            """)
+        else:
+            cursor.execute("SELECT coalesce(sum(total), 0) FROM incidents_resumen")
+        filas = cursor.fetchall()
+
+    # Los valores vacíos del resumen corresponden a NULL en 'incidents'
+    return [
+        {**{dim: (fila[i] or None) for i, dim in enumerate(dimensiones)}, 'total': int(fila[-1])}
+        for fila in filas
+    ]
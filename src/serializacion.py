@@ -0,0 +1,93 @@
+# Serialización JSON de las respuestas con orjson: codifica tuplas y listas en C, sin pasar por un diccionario
+# por fila ni por el codificador de Python. Todas las respuestas (a_json_http) escriben las fechas como siempre lo
+# hizo jsonify de Flask (RFC 1123, 'Mon, 13 Jan 2025 16:02:09 GMT'); el caché compartido (a_json) las guarda en
+# ISO 8601. Sin orjson se usa el módulo json con el mismo resultado.
+import json  # Codificador de respaldo
+from datetime import date, datetime, timezone  # Fechas de las respuestas y del caché
+from decimal import Decimal  # Totales numéricos de PostgreSQL
+from flask.json.provider import JSONProvider  # Codificador de las respuestas de Flask (jsonify)
+
+try:
+    import orjson  # Codificador JSON rápido
+except ImportError:
+    orjson = None
+
+# Formatos del listado de incidentes: 'objects' (un objeto por incidente) o 'columns' (los nombres de las
+# columnas una sola vez y cada incidente como arreglo de valores, en ese orden)
+FORMATOS_LISTADO = ('objects', 'columns')
+
+
+# Valores que JSON no representa directamente
+def _convertir(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"No se puede convertir a JSON un valor de tipo {type(valor).__name__}")
+
+
+# Nombres en inglés fijos, como en el formato HTTP; strftime los traduciría según el 'locale' del proceso
+_DIAS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MESES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+# Fecha como la escribe werkzeug.http.http_date (las fechas sin zona horaria se toman como UTC), pero unas diez
+# veces más rápido: el listado convierte dos fechas por incidente
+def fecha_http(valor):
+    if not isinstance(valor, datetime):
+        valor = datetime(valor.year, valor.month, valor.day)
+    elif valor.tzinfo is not None:
+        valor = valor.astimezone(timezone.utc)
+    return (f"{_DIAS[valor.weekday()]}, {valor.day:02d} {_MESES[valor.month - 1]} {valor.year:04d} "
+            f"{valor.hour:02d}:{valor.minute:02d}:{valor.second:02d} GMT")
+
+
+# Valores que JSON no representa directamente, con las fechas como en el codificador por defecto de Flask
+def _convertir_http(valor):
+    if isinstance(valor, (datetime, date)):
+        return fecha_http(valor)
+    return _convertir(valor)
+
+
+# Codifica 'datos' como JSON en bytes, con las fechas en ISO 8601 (valores del caché compartido)
+def a_json(datos):
+    if orjson is not None:
+        return orjson.dumps(datos, default=_convertir)
+    return json.dumps(datos, default=_convertir, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+# Codifica 'datos' como JSON en bytes, con las fechas en el formato de jsonify (respuestas de la API). orjson escribe las fechas por su
+# cuenta en ISO 8601; con OPT_PASSTHROUGH_DATETIME las entrega a _convertir_http.
+def a_json_http(datos):
+    if orjson is not None:
+        return orjson.dumps(datos, default=_convertir_http, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(datos, default=_convertir_http, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def desde_json(texto):
+    return orjson.loads(texto) if orjson is not None else json.loads(texto)
+
+
+# Un objeto por fila a partir de las filas como tuplas
+def como_objetos(columnas, filas):
+    return [dict(zip(columnas, fila)) for fila in filas]
+
+
+# Incidentes en el formato pedido a partir de las filas como tuplas: lista de objetos o columnas y filas
+def incidentes_en_formato(columnas, filas, formato):
+    if formato == 'columns':
+        return {'columnas': columnas, 'filas': filas}
+    return {'incidentes': como_objetos(columnas, filas)}
+
+
+# Codificador de Flask: jsonify y request.get_json usan orjson, con las fechas en el formato de siempre
+class ProveedorJSON(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return a_json_http(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return desde_json(s)
+
+    def response(self, *args, **kwargs):
+        datos = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(a_json_http(datos), mimetype='application/json')
@@ -0,0 +1,442 @@
+# Servidor asíncrono (ASGI) de la API de incidentes: las rutas de lectura y escritura de incidentes y las cargas de
+# archivos de main.py sobre Starlette y asyncpg. Una solicitud que espera a PostgreSQL o al cuerpo de una carga no
+# ocupa un hilo, así que un solo proceso atiende miles de solicitudes simultáneas con un pool de pocas conexiones.
+# Uso: uvicorn servidor_asincrono:app --app-dir src   (o python src/servidor_asincrono.py)
+# Las cargas se procesan en los mismos trabajos en segundo plano que la API síncrona (hilos con psycopg2).
+import hashlib  # Huella del archivo, calculada mientras se recibe
+import os  # Carpetas y archivos de las cargas
+import time  # Duración de cada solicitud
+import uuid  # Identificador de cada trabajo de carga
+from contextlib import asynccontextmanager  # Inicio y cierre del pool junto con el servidor
+import anyio  # Escritura del archivo recibido sin bloquear el bucle de eventos
+from asyncpg.exceptions import UniqueViolationError  # Número de incidente insertado al mismo tiempo por otra solicitud
+import uvicorn  # Servidor ASGI
+from starlette.applications import Starlette  # Aplicación ASGI
+from starlette.responses import Response, StreamingResponse  # Respuestas JSON y exportación en streaming
+from starlette.routing import Route  # Rutas con el mismo esquema que la API síncrona
+from werkzeug.http import parse_date, parse_etags  # Validadores condicionales enviados por el cliente
+from config import config  # Configuración compartida con la API síncrona
+from basedatos_asincrona import crear_pool, posicionales  # Pool de asyncpg
+from migraciones import asegurar_esquema  # Tablas e índices versionados
+from validadores import coinciden_validadores, encabezados_validadores, etag_incidente, etag_lista  # GET condicional
+from lectores import MOTORES  # Motores de lectura del CSV
+from subidas import contenido_archivo  # Contenido del archivo del cuerpo de la solicitud, a medida que llega
+from trabajos import LimiteTrabajosError  # Rechazo de cargas cuando hay demasiados archivos en proceso
+from serializacion import FORMATOS_LISTADO, a_json_http, como_objetos, incidentes_en_formato  # Respuestas JSON con orjson
+from basedatos import conexion_db  # Conexión síncrona para vaciar la tabla con la misma recarga que la API
+from recarga import descartar_anteriores  # Eliminación en segundo plano de la tabla reemplazada
+from main import (
+    JSON_INVALIDO, SQL_VALIDADORES_LISTADO, cache_incidentes, filtros_listado, procesar_actualizacion, procesar_carga,
+    procesar_recarga, trabajos, vaciar_incidentes
+)  # Compartidos con la API síncrona
+import metricas  # Duración de solicitudes y consultas para GET /metrics
+
+configuracion = config['development']
+pool = crear_pool()
+
+COLUMNAS_LISTADO = [
+    'number', 'state', 'created', 'last_update', 'incident_ci_type', 'affected_user', 'user_location',
+    'assignment_group', 'assigned_to', 'urgency', 'severity', 'created_by', 'updated_by'
+]
+SELECT_INCIDENTES = f"SELECT {', '.join(COLUMNAS_LISTADO)} FROM incidents"
+
+
+# Respuesta JSON con el mismo codificador que la API síncrona
+def responder(datos, codigo=200, encabezados=None):
+    return Response(a_json_http(datos), codigo, encabezados, media_type='application/json')
+
+
+# Respuesta 304 si la versión que tiene el cliente es la actual, o None si hay que enviar el cuerpo
+def respuesta_no_modificada(request, etag, ultima_modificacion):
+    if_none_match = parse_etags(request.headers.get('if-none-match'))
+    if_modified_since = parse_date(request.headers.get('if-modified-since'))
+    if not coinciden_validadores(if_none_match, if_modified_since, etag, ultima_modificacion):
+        return None
+    return Response(status_code=304, headers=encabezados_validadores(etag, ultima_modificacion))
+
+
+# Ejecuta una operación del caché de incidentes. Con caché compartido va a un hilo, porque el cliente de Redis es
+# síncrono y detendría el bucle de eventos; el caché local solo toma un lock y se usa directamente.
+async def en_cache(operacion, *args):
+    funcion = getattr(cache_incidentes, operacion)
+    if cache_incidentes.compartido is None:
+        return funcion(*args)
+    return await anyio.to_thread.run_sync(funcion, *args)
+
+
+# Entero de la consulta; como en Flask, si no es un entero se usa el valor por defecto
+def parametro_entero(request, nombre, defecto):
+    try:
+        return int(request.query_params[nombre])
+    except (KeyError, ValueError):
+        return defecto
+
+
+# Ruta para listar los incidentes (GET), con los mismos filtros, paginación y exportación que la API síncrona
+async def listar_incidentes(request):
+    condiciones, parametros_filtro, error = filtros_listado(request.query_params)
+    if error:
+        return responder({'mensaje': error}, 400)
+    formato = request.query_params.get('format', 'objects')
+    if formato not in FORMATOS_LISTADO:
+        return responder({'mensaje': f"El parámetro 'format' debe ser uno de: {', '.join(FORMATOS_LISTADO)}"}, 400)
+
+    try:
+        async with pool.conexion() as conexion:
+            with metricas.consultas.medir('validadores_listado'):
+                total, cambios, ultima_modificacion = await conexion.fetchrow(SQL_VALIDADORES_LISTADO)
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al obtener los datos"}, 500)
+
+    etag = etag_lista(total, cambios, ultima_modificacion, request.scope['query_string'])
+    no_modificada = respuesta_no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+
+    donde = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+    if request.query_params.get('export', '').lower() in ('1', 'true', 'si'):
+        return exportar_incidentes(etag, ultima_modificacion, donde, parametros_filtro, formato)
+
+    paginar = 'limit' in request.query_params or 'after' in request.query_params or bool(condiciones)
+    limite = parametro_entero(request, 'limit', configuracion.PAGINA_DEFECTO)
+    despues = request.query_params.get('after')
+    if limite <= 0:
+        return responder({'mensaje': "El parámetro 'limit' debe ser un entero positivo"}, 400)
+    limite = min(limite, configuracion.PAGINA_MAXIMA)
+
+    sql = SELECT_INCIDENTES
+    parametros = list(parametros_filtro)
+    if paginar and despues:
+        condiciones = condiciones + ["number > %s"]
+        parametros.append(despues)
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    if paginar:
+        sql += " ORDER BY number LIMIT %s"
+        parametros.append(limite)
+
+    try:
+        async with pool.conexion() as conexion:
+            with metricas.consultas.medir('listar_incidentes'):
+                filas = [tuple(fila) for fila in await conexion.fetch(posicionales(sql), *parametros)]
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al obtener los datos"}, 500)
+
+    respuesta = {**incidentes_en_formato(COLUMNAS_LISTADO, filas, formato), 'mensaje': "Incidentes listados"}
+    if paginar:
+        respuesta['siguiente'] = filas[-1][0] if len(filas) == limite else None
+    return responder(respuesta, 200, encabezados_validadores(etag, ultima_modificacion))
+
+
+# Exporta los incidentes como un arreglo JSON enviado por partes con un cursor del servidor. La conexión se
+# pide al empezar el envío y se devuelve al terminar, aunque el cliente se desconecte a mitad.
+def exportar_incidentes(etag, ultima_modificacion, donde, parametros, formato):
+    tamano_bloque = configuracion.EXPORTAR_BLOQUE
+    sql = posicionales(SELECT_INCIDENTES + donde + " ORDER BY number")
+
+    async def generar():
+        if formato == 'columns':
+            yield b'{"columnas":' + a_json_http(COLUMNAS_LISTADO) + b',"filas":['
+        else:
+            yield b'{"incidentes":['
+        async with pool.conexion() as conexion, conexion.transaction():
+            cursor = await conexion.cursor(sql, *parametros)
+            separador = b''
+            while filas := await cursor.fetch(tamano_bloque):
+                filas = [tuple(fila) for fila in filas]
+                bloque = filas if formato == 'columns' else como_objetos(COLUMNAS_LISTADO, filas)
+                yield separador + a_json_http(bloque)[1:-1]
+                separador = b','
+        yield b'],"mensaje":"Incidentes exportados"}'
+
+    return StreamingResponse(
+        generar(), media_type='application/json', headers=encabezados_validadores(etag, ultima_modificacion)
+    )
+
+
+# Ruta para obtener un incidente (GET); primero se busca en el caché compartido con la API síncrona
+async def leer_incidente(request):
+    number = request.path_params['number']
+    datos, version = await en_cache('obtener', number)
+    if datos is None:
+        try:
+            async with pool.conexion() as conexion:
+                with metricas.consultas.medir('leer_incidente'):
+                    fila = await conexion.fetchrow(SELECT_INCIDENTES + " WHERE number = $1", number)
+        except Exception as ex:
+            return responder({'error': str(ex), 'mensaje': "Error al obtener el incidente"}, 500)
+        if fila is None:
+            return responder({'mensaje': "Incidente no encontrado"}, 404)
+        datos = dict(fila)
+        await en_cache('guardar', number, datos, version)
+
+    ultima_modificacion = datos['last_update']
+    if ultima_modificacion is None:
+        return responder({'incidente': datos, 'mensaje': "Incidente encontrado"})
+    etag = etag_incidente(datos['number'], ultima_modificacion)
+    no_modificada = respuesta_no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+    return responder(
+        {'incidente': datos, 'mensaje': "Incidente encontrado"}, 200, encabezados_validadores(etag, ultima_modificacion)
+    )
+
+
+# Columnas que envía el cliente ($1 es el número). Las fechas llegan como texto y las convierte PostgreSQL,
+# igual que con psycopg2.
+COLUMNAS_INCIDENTE = """state, created, last_update, incident_ci_type, affected_user, user_location,
+                        assignment_group, assigned_to, urgency, severity, created_by, updated_by"""
+VALORES_INCIDENTE = "$2, $3::text::timestamp, $4::text::timestamp, $5, $6, $7, $8, $9, $10, $11, $12, $13"
+
+
+def valores_incidente(number, datos):
+    return (
+        number, datos['state'], datos['created'], datos['last_update'], datos['incident_ci_type'],
+        datos['affected_user'], datos['user_location'], datos['assignment_group'], datos['assigned_to'],
+        datos['urgency'], datos['severity'], datos['created_by'], datos['updated_by']
+    )
+
+
+# Ruta para agregar un nuevo incidente (POST)
+async def agregar_incidente(request):
+    try:
+        datos = await request.json()
+    except ValueError:
+        return responder({'mensaje': JSON_INVALIDO}, 400)
+    try:
+        async with pool.conexion() as conexion:
+            with metricas.consultas.medir('agregar_incidente'):
+                # Con la tabla particionada la llave de 'number' está en 'incidents_numeros': el número se comprueba aquí
+                estado = await conexion.execute(f"""
+                    INSERT INTO incidents (number, {COLUMNAS_INCIDENTE})
+                    SELECT $1::varchar, {VALORES_INCIDENTE}
+                    WHERE NOT EXISTS (SELECT 1 FROM incidents WHERE number = $1)
+                """, *valores_incidente(datos['number'], datos))
+        if estado == 'INSERT 0 0':
+            return responder({'mensaje': "El incidente ya existe"}, 409)
+        return responder({'mensaje': "Incidente agregado exitosamente"}, 201)
+    except UniqueViolationError:
+        return responder({'mensaje': "El incidente ya existe"}, 409)  # Insertado al mismo tiempo por otra solicitud
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al agregar el incidente"}, 500)
+
+
+# Ruta para actualizar un incidente existente (PUT)
+async def actualizar_incidente(request):
+    number = request.path_params['number']
+    try:
+        datos = await request.json()
+    except ValueError:
+        return responder({'mensaje': JSON_INVALIDO}, 400)
+    try:
+        async with pool.conexion() as conexion, conexion.transaction():
+            if await conexion.fetchval("SELECT 1 FROM incidents WHERE number = $1", number) is None:
+                return responder({'mensaje': "Incidente no encontrado"}, 404)
+            with metricas.consultas.medir('actualizar_incidente'):
+                await conexion.execute(f"""
+                    UPDATE incidents SET ({COLUMNAS_INCIDENTE}) = ({VALORES_INCIDENTE}) WHERE number = $1
+                """, *valores_incidente(number, datos))
+        await en_cache('invalidar', number)  # Ya confirmado el cambio, se descarta la copia en caché
+        return responder({'mensaje': "Incidente actualizado exitosamente"})
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al actualizar el incidente"}, 500)
+
+
+# Ruta para eliminar un incidente (DELETE)
+async def eliminar_incidente(request):
+    number = request.path_params['number']
+    try:
+        async with pool.conexion() as conexion, conexion.transaction():
+            with metricas.consultas.medir('eliminar_incidente'):
+                if await conexion.execute("DELETE FROM incidents WHERE number = $1", number) == 'DELETE 0':
+                    return responder({'mensaje': "Incidente no encontrado"}, 404)
+        await en_cache('invalidar', number)
+        return responder({'mensaje': "Incidente eliminado exitosamente"})
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al eliminar el incidente"}, 500)
+
+
+# Recibe el archivo del cuerpo de la solicitud a medida que llega (multipart con el campo 'file' o el CSV como
+# cuerpo), calculando su huella, y lo envía como trabajo en segundo plano; responde 202 con el id del trabajo.
+# Esperar el cuerpo no ocupa un hilo, así que el modo 'directo' de la API síncrona no hace falta aquí.
+async def recibir_archivo(request, carpeta, tipo, funcion):
+    modo = request.query_params.get('modo', configuracion.INGESTA_MODO)
+    if modo not in ('completo', 'bloques', 'paralelo'):
+        return responder({'mensaje': "El parámetro 'modo' debe ser 'completo', 'bloques' o 'paralelo'"}, 400)
+    motor = request.query_params.get('motor', configuracion.INGESTA_MOTOR)
+    if motor not in MOTORES:
+        return responder({'mensaje': f"El parámetro 'motor' debe ser uno de: {', '.join(MOTORES)}"}, 400)
+
+    tipo_contenido = request.headers.get('content-type', '')
+    limite = None
+    if tipo_contenido.startswith('multipart/'):
+        limite = next((p.split('=', 1)[1].strip('"') for p in tipo_contenido.split(';')[1:]
+                       if p.strip().startswith('boundary=')), None)
+        if not limite:
+            return responder({'mensaje': "El multipart no indica el 'boundary'"}, 400)
+    elif tipo_contenido.split(';')[0].strip() not in ('text/csv', 'application/octet-stream'):
+        return responder({'mensaje': "Envíe el archivo como multipart (campo 'file') o como cuerpo text/csv"}, 415)
+
+    # Si ya hay demasiados archivos en proceso se rechaza antes de recibir nada
+    if trabajos.saturado():
+        return responder({'mensaje': "Hay demasiados archivos en proceso, intente más tarde"}, 429)
+
+    os.makedirs(carpeta, exist_ok=True)
+    id_trabajo = uuid.uuid4().hex
+    filepath = os.path.join(carpeta, f'{id_trabajo}.csv')
+    clean_filepath = os.path.join(carpeta, f'{id_trabajo}_limpio.parquet')
+    sha = hashlib.sha256()
+    try:
+        async with await anyio.open_file(filepath, 'wb') as archivo:
+            async for datos in contenido_archivo(request.stream(), limite):
+                sha.update(datos)
+                await archivo.write(datos)
+    except ValueError as ex:
+        os.remove(filepath)
+        return responder({'mensaje': str(ex)}, 400)
+    except BaseException:
+        os.remove(filepath)  # El cliente se desconectó a mitad del envío
+        raise
+    huella = sha.hexdigest()
+
+    # Si el mismo archivo ya se procesó se responde de inmediato con el resultado anterior ('forzar=true' lo evita)
+    if request.query_params.get('forzar', '').lower() not in ('1', 'true', 'si'):
+        try:
+            async with pool.conexion() as conexion:
+                anterior = await conexion.fetchval(
+                    "SELECT resultado FROM archivos_procesados WHERE huella = $1 AND tipo = $2", huella, tipo
+                )
+        except Exception as ex:
+            os.remove(filepath)
+            return responder({'error': str(ex), 'mensaje': "Error de conexión a la base de datos"}, 500)
+        if anterior is not None:
+            os.remove(filepath)
+            return responder({'resultado': anterior, 'duplicado': True, 'mensaje': "El archivo ya fue procesado"})
+
+    try:
+        trabajo = trabajos.enviar(
+            id_trabajo, tipo, funcion, filepath, clean_filepath, modo, huella, motor, archivos=(filepath, clean_filepath)
+        )
+    except LimiteTrabajosError as ex:
+        os.remove(filepath)
+        return responder({'mensaje': str(ex)}, 429)
+
+    url = request.app.url_path_for('estado_trabajo', id_trabajo=trabajo.id)
+    return responder(
+        {'trabajo': trabajo.a_dict(), 'url': url, 'mensaje': "Archivo recibido, se procesa en segundo plano"},
+        202, {'Location': url}
+    )
+
+
+# Ruta para cargar el archivo CSV y procesarlo (POST)
+async def upload_file(request):
+    return await recibir_archivo(request, 'uploads', 'carga', procesar_carga)
+
+
+# Ruta para actualizar el archivo CSV y procesarlo (POST)
+async def update_file(request):
+    return await recibir_archivo(request, 'updates', 'actualizacion', procesar_actualizacion)
+
+
+# Ruta para reemplazar todos los incidentes por los del archivo (POST), con una tabla sombra
+async def reload_file(request):
+    return await recibir_archivo(request, 'uploads', 'recarga', procesar_recarga)
+
+
+# Ruta para consultar el estado de un trabajo de carga o actualización (GET)
+async def estado_trabajo(request):
+    trabajo = trabajos.obtener(request.path_params['id_trabajo'])
+    if trabajo is None:
+        return responder({'mensaje': "Trabajo no encontrado"}, 404)
+    return responder({'trabajo': trabajo.a_dict(), 'mensaje': "Estado del trabajo"})
+
+
+# Vacía 'incidents' con una conexión del pool síncrono; se ejecuta en un hilo
+def vaciar():
+    with conexion_db() as conexion:
+        vaciar_incidentes(conexion)
+        conexion.commit()
+
+
+# Ruta para eliminar todos los incidentes (DELETE); los archivos ya procesados podrán volver a cargarse.
+# La tabla se reemplaza por una vacía, como en la API síncrona, en lugar de borrar las filas una por una.
+async def delete_all_incidents(request):
+    try:
+        await anyio.to_thread.run_sync(vaciar)
+        descartar_anteriores()
+        await en_cache('limpiar')
+        return responder({'mensaje': 'Todos los incidentes han sido eliminados exitosamente'})
+    except Exception as ex:
+        return responder({'error': str(ex), 'mensaje': "Error al eliminar los incidentes"}, 500)
+
+
+# Ruta con las métricas en el formato de texto de Prometheus (GET), con el estado del pool asíncrono
+async def exponer_metricas(request):
+    estado = pool.estadisticas()
+    cache = cache_incidentes.estadisticas()
+    adicionales = (
+        ('incidentes_pool_conexiones_en_uso', 'gauge', "Conexiones del pool entregadas en este momento", estado['en_uso']),
+        ('incidentes_pool_conexiones_libres', 'gauge', "Conexiones que el pool puede entregar sin esperar", estado['libres']),
+        ('incidentes_pool_conexiones_maximo', 'gauge', "Tamaño máximo del pool", estado['maximo']),
+        ('incidentes_pool_agotado_total', 'counter', "Veces que se pidió una conexión con el pool agotado", estado['agotadas']),
+        ('incidentes_cache_aciertos_total', 'counter', "Lecturas de incidentes atendidas por el caché", cache['aciertos']),
+        ('incidentes_cache_fallos_total', 'counter', "Lecturas de incidentes que no estaban en el caché", cache['fallos']),
+        ('incidentes_cache_entradas', 'gauge', "Incidentes en el caché local", cache['entradas_locales']),
+    )
+    return Response(metricas.exponer(adicionales), media_type='text/plain; version=0.0.4')
+
+
+# Las rutas fijas van antes de '/incidentes/{number}', que también las cubriría
+rutas = [
+    Route('/incidentes', listar_incidentes, methods=['GET']),
+    Route('/incidentes', agregar_incidente, methods=['POST']),
+    Route('/incidentes/upload', upload_file, methods=['POST']),
+    Route('/incidentes/update', update_file, methods=['POST']),
+    Route('/incidentes/reload', reload_file, methods=['POST']),
+    Route('/incidentes/delete', delete_all_incidents, methods=['DELETE']),
+    Route('/incidentes/jobs/{id_trabajo}', estado_trabajo, methods=['GET']),
+    Route('/incidentes/{number}', leer_incidente, methods=['GET']),
+    Route('/incidentes/{number}', actualizar_incidente, methods=['PUT']),
+    Route('/incidentes/{number}', eliminar_incidente, methods=['DELETE']),
+    Route('/metrics', exponer_metricas, methods=['GET']),
+]
+RUTA_POR_FUNCION = {ruta.endpoint: ruta.path for ruta in rutas}
+
+
+# Duración de cada solicitud por método, ruta (la plantilla, no la URL) y código, como en la API síncrona.
+# Se mide hasta que empieza el envío de la respuesta.
+class MedirSolicitudes:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                ruta = RUTA_POR_FUNCION.get(scope.get('endpoint'), 'sin_ruta')
+                metricas.solicitudes.observar(
+                    time.perf_counter() - inicio, scope['method'], ruta, str(mensaje['status'])
+                )
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
+
+
+# Al iniciar se aplican las migraciones pendientes (con psycopg2, en un hilo) y se abre el pool; al terminar se cierra
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    await anyio.to_thread.run_sync(asegurar_esquema)
+    await pool.abrir()
+    try:
+        yield
+    finally:
+        await pool.cerrar()
+
+
+app = MedirSolicitudes(Starlette(routes=rutas, lifespan=ciclo_de_vida))
+
+if __name__ == '__main__':
+    uvicorn.run(app, host=configuracion.ASGI_HOST, port=configuracion.ASGI_PUERTO)
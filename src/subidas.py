@@ -0,0 +1,165 @@
+# Lectura de un archivo subido directamente del cuerpo de la solicitud, a medida que llega y sin guardarlo en
+# disco: se decodifica el multipart por partes, se calcula la huella y, si se pide, se archiva comprimido
+import hashlib  # Huella SHA-256 del archivo, calculada mientras se lee
+import io  # Flujo de bytes que leen Pandas y Arrow
+import queue  # Partes pendientes de archivar
+import threading  # Hilo que comprime y escribe el archivo original
+import pyarrow as pa  # Escritura comprimida con zstd
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData  # Multipart por partes
+
+TAMANO_LECTURA = 256 * 1024  # Bytes que se piden al cuerpo de la solicitud a la vez
+COMPRESION_ARCHIVO = 'zstd'
+PARTES_EN_COLA = 64  # Partes que pueden esperar al archivador antes de frenar la lectura
+
+
+# Comprime y escribe en un hilo aparte lo que se le entrega, para que archivar no frene la carga.
+# Si el disco es más lento que la carga, la cola se llena y la lectura espera (nunca se descartan partes).
+class Archivador:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._cola = queue.Queue(maxsize=PARTES_EN_COLA)
+        self._error = None
+        self._hilo = threading.Thread(target=self._escribir, name='archivador', daemon=True)
+        self._hilo.start()
+
+    def _escribir(self):
+        try:
+            with pa.CompressedOutputStream(self.ruta, COMPRESION_ARCHIVO) as salida:
+                for parte in iter(self._cola.get, None):
+                    salida.write(parte)
+        except Exception as ex:
+            self._error = ex
+            for _ in iter(self._cola.get, None):  # Sigue vaciando la cola para no bloquear la lectura
+                pass
+
+    def agregar(self, datos):
+        self._cola.put(datos)
+
+    # Espera a que termine de escribir; lanza el error del hilo si lo hubo
+    def cerrar(self):
+        self._cola.put(None)
+        self._hilo.join()
+        if self._error is not None:
+            raise self._error
+
+
+# Decodifica un multipart a medida que llegan sus partes y entrega solo el contenido del campo 'campo'
+class CampoMultipart:
+    def __init__(self, limite, campo='file'):
+        self._decodificador = MultipartDecoder(limite.encode())
+        self._campo = campo
+        self._en_archivo = False  # El decodificador está entregando el contenido del campo 'campo'
+        self.encontrado = False
+        self.terminado = False  # Ya llegó el final del multipart
+
+    # Agrega datos recibidos del cuerpo; None indica que el cuerpo terminó
+    def recibir(self, datos):
+        self._decodificador.receive_data(datos)
+
+    # Siguiente parte del contenido del campo: None si hay que recibir más datos, b'' al terminar el multipart
+    def siguiente(self):
+        while not self.terminado:
+            evento = self._decodificador.next_event()
+            if isinstance(evento, NeedData):
+                return None
+            if isinstance(evento, File):
+                self._en_archivo = evento.name == self._campo
+                self.encontrado = self.encontrado or self._en_archivo
+            elif isinstance(evento, Data):
+                if self._en_archivo and evento.data:
+                    return evento.data
+            elif isinstance(evento, Epilogue):
+                self.terminado = True
+        return b''
+
+
+# Flujo de solo lectura con el contenido del archivo enviado en el campo 'campo' de un multipart (o con el
+# cuerpo completo si la solicitud no es multipart). Cuenta los bytes, calcula la huella y entrega cada parte
+# al archivador (opcional) a medida que se lee.
+class CuerpoArchivo(io.RawIOBase):
+    def __init__(self, entrada, limite=None, campo='file', archivador=None):
+        self._entrada = entrada
+        self._multipart = CampoMultipart(limite, campo) if limite else None
+        self._archivador = archivador
+        self._pendiente = b''
+        self._fin = False
+        self._entrada_terminada = False
+        self.bytes = 0
+        self._sha = hashlib.sha256()
+
+    @property
+    def encontrado(self):
+        return self._multipart is None or self._multipart.encontrado
+
+    def readable(self):
+        return True
+
+    # Siguiente parte del contenido del archivo; b'' al terminar
+    def _siguiente(self):
+        if self._multipart is None:
+            return self._entrada.read(TAMANO_LECTURA)
+        while True:
+            datos = self._multipart.siguiente()
+            if datos is not None:
+                return datos
+            if self._entrada_terminada:
+                raise ValueError("El cuerpo de la solicitud terminó antes del final del multipart")
+            datos = self._entrada.read(TAMANO_LECTURA)
+            self._entrada_terminada = not datos
+            self._multipart.recibir(datos or None)
+
+    def readinto(self, destino):
+        # Se llena el destino tanto como se pueda, así 'peek' del búfer ve una muestra completa
+        escritos = 0
+        while escritos < len(destino) and not self._fin:
+            if not self._pendiente:
+                self._pendiente = self._siguiente()
+                if not self._pendiente:
+                    self._fin = True
+                    break
+                self.bytes += len(self._pendiente)
+                self._sha.update(self._pendiente)
+                if self._archivador is not None:
+                    self._archivador.agregar(self._pendiente)
+            cantidad = min(len(destino) - escritos, len(self._pendiente))
+            destino[escritos:escritos + cantidad] = self._pendiente[:cantidad]
+            self._pendiente = self._pendiente[cantidad:]
+            escritos += cantidad
+        return escritos
+
+    # Huella SHA-256 del contenido; solo es la del archivo completo cuando ya se leyó todo
+    def huella(self):
+        return self._sha.hexdigest()
+
+
+# Abre el archivo de la solicitud como flujo con búfer (admite 'peek' para detectar la codificación).
+# 'limite' es el 'boundary' del multipart, o None si el cuerpo es directamente el CSV.
+def abrir_cuerpo(entrada, limite, tamano_bufer, archivador=None):
+    cuerpo = CuerpoArchivo(entrada, limite, archivador=archivador)
+    return cuerpo, io.BufferedReader(cuerpo, buffer_size=tamano_bufer)
+
+
+# Versión asíncrona para el servidor ASGI: recorre las partes del cuerpo a medida que llegan ('partes', un
+# iterador asíncrono de bytes) y entrega el contenido del campo 'campo' del multipart, o el cuerpo completo
+# si 'limite' es None
+async def contenido_archivo(partes, limite, campo='file'):
+    if not limite:
+        async for datos in partes:
+            if datos:
+                yield datos
+        return
+
+    multipart = CampoMultipart(limite, campo)
+    terminado = False
+    while not multipart.terminado:
+        datos = multipart.siguiente()
+        if datos:
+            yield datos
+        elif datos is None:
+            if terminado:
+                raise ValueError("El cuerpo de la solicitud terminó antes del final del multipart")
+            datos = await anext(partes, b'')
+            terminado = not datos
+            multipart.recibir(datos or None)
+    if not multipart.encontrado:
+        raise ValueError(f"No se recibió ningún archivo en el campo '{campo}'")
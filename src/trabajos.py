@@ -0,0 +1,128 @@
+# Trabajos en segundo plano para procesar archivos subidos sin mantener abierta la solicitud HTTP
+import os  # Para eliminar los archivos de los trabajos descartados
+import threading  # Para proteger el registro de trabajos entre hilos
+import time  # Para medir duración y filas por segundo
+import traceback  # Para registrar en consola el detalle de los errores
+from concurrent.futures import ThreadPoolExecutor  # Pool acotado de hilos trabajadores
+import metricas  # Trabajos terminados y su duración
+
+
+# Se lanza cuando ya hay demasiados trabajos pendientes y no se aceptan más
+class LimiteTrabajosError(Exception):
+    pass
+
+
+# Estado y avance de un trabajo
+class Trabajo:
+    def __init__(self, id_trabajo, tipo, archivos=()):
+        self.id = id_trabajo
+        self.tipo = tipo
+        self.archivos = archivos  # Archivos del trabajo que se eliminan al descartarlo
+        self.estado = 'en_cola'  # en_cola -> procesando -> completado | error
+        self.filas = 0
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self.resultado = None
+        self.error = None
+
+    # Registra cuántas filas se han procesado hasta el momento
+    def avanzar(self, filas):
+        self.filas = filas
+
+    # Filas por segundo desde que empezó el procesamiento
+    def filas_por_segundo(self):
+        if self.inicio is None:
+            return 0
+        segundos = (self.fin or time.time()) - self.inicio
+        return round(self.filas / segundos) if segundos > 0 else self.filas
+
+    # Representación del trabajo para responder en JSON
+    def a_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'filas_procesadas': self.filas,
+            'filas_por_segundo': self.filas_por_segundo(),
+            'segundos': round((self.fin or time.time()) - self.inicio, 3) if self.inicio else 0,
+            'resultado': self.resultado,
+            'error': self.error
+        }
+
+
+# Ejecuta trabajos en un pool acotado: 'concurrentes' limita cuántos usan la base de datos a la vez
+# y 'en_cola' cuántos pueden esperar turno antes de rechazar nuevos archivos
+class AdministradorTrabajos:
+    def __init__(self, concurrentes, en_cola, retencion):
+        self._ejecutor = ThreadPoolExecutor(max_workers=concurrentes, thread_name_prefix='trabajo')
+        self._lock = threading.Lock()
+        self._trabajos = {}
+        self.concurrentes = concurrentes
+        self.en_cola = en_cola
+        self.retencion = retencion  # Segundos que se conserva un trabajo terminado para consultar su estado
+
+    # Trabajos aceptados que todavía no terminan (en cola o procesando)
+    def _activos(self):
+        return sum(1 for t in self._trabajos.values() if t.estado in ('en_cola', 'procesando'))
+
+    # Indica si ya no se aceptan más trabajos
+    def saturado(self):
+        with self._lock:
+            self._limpiar_terminados()
+            return self._activos() >= self.concurrentes + self.en_cola
+
+    # Registra un trabajo y lo envía al pool; 'funcion' recibe el trabajo seguido de 'args' y devuelve el resultado.
+    # 'archivos' (el archivo recibido y el Parquet limpio) se eliminan cuando el trabajo se descarta.
+    def enviar(self, id_trabajo, tipo, funcion, *args, archivos=()):
+        return self._enviar(id_trabajo, tipo, funcion, args, archivos)[0]
+
+    # Como 'enviar', pero espera a que el trabajo termine. Lo usa la carga directa, que lee el archivo del
+    # cuerpo de la solicitud mientras llega: la solicitud no puede responder antes, pero el trabajo sigue
+    # ocupando un lugar del pool como cualquier otro.
+    def ejecutar(self, id_trabajo, tipo, funcion, *args):
+        trabajo, futuro = self._enviar(id_trabajo, tipo, funcion, args)
+        futuro.result()
+        return trabajo
+
+    def _enviar(self, id_trabajo, tipo, funcion, args, archivos=()):
+        with self._lock:
+            self._limpiar_terminados()
+            if self._activos() >= self.concurrentes + self.en_cola:
+                raise LimiteTrabajosError("Hay demasiados archivos en proceso, intente más tarde")
+            trabajo = Trabajo(id_trabajo, tipo, archivos)
+            self._trabajos[id_trabajo] = trabajo
+
+        return trabajo, self._ejecutor.submit(self._ejecutar, trabajo, funcion, args)
+
+    def _ejecutar(self, trabajo, funcion, args):
+        trabajo.estado = 'procesando'
+        trabajo.inicio = time.time()
+        try:
+            trabajo.resultado = funcion(trabajo, *args)
+            trabajo.estado = 'completado'
+        except Exception as ex:
+            traceback.print_exc()
+            trabajo.error = str(ex)
+            trabajo.estado = 'error'
+        finally:
+            trabajo.fin = time.time()
+            metricas.trabajos_terminados.sumar(1, trabajo.tipo, trabajo.estado)
+            metricas.etapas.observar(trabajo.fin - trabajo.inicio, trabajo.tipo, 'total')
+
+    # Devuelve el trabajo con ese id, o None si no existe o ya se descartó
+    def obtener(self, id_trabajo):
+        with self._lock:
+            self._limpiar_terminados()
+            return self._trabajos.get(id_trabajo)
+
+    # Descarta los trabajos terminados hace más de 'retencion' segundos junto con sus archivos
+    # (se llama con el lock tomado)
+    def _limpiar_terminados(self):
+        limite = time.time() - self.retencion
+        for id_trabajo in [i for i, t in self._trabajos.items() if t.fin is not None and t.fin < limite]:
+            for ruta in self._trabajos.pop(id_trabajo).archivos:
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass  # El trabajo falló antes de escribirlo
@@ -0,0 +1,62 @@
+# Validadores HTTP (ETag / Last-Modified) para responder 304 sin construir el cuerpo de la respuesta
+import hashlib  # Para resumir en el ETag los parámetros de la consulta
+from datetime import timezone  # Las fechas de la tabla se interpretan como UTC en los encabezados HTTP
+from flask import Response  # Respuesta vacía con código 304
+from werkzeug.http import http_date, quote_etag  # Formato de los encabezados en el servidor asíncrono
+
+
+# Convierte una fecha sin zona horaria de la base de datos a UTC, sin microsegundos (precisión de HTTP)
+def _a_utc(fecha):
+    if fecha is None:
+        return None
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.replace(microsecond=0)
+
+
+# ETag del listado: cantidad de incidentes, contador de cambios de la tabla (migración 11), último 'last_update' y
+# los parámetros de la consulta. El contador cambia con cualquier escritura, también con las que no aumentan
+# 'last_update' ni cambian la cantidad.
+def etag_lista(total, cambios, ultima_modificacion, consulta=b''):
+    marca = int(ultima_modificacion.timestamp() * 1e6) if ultima_modificacion else 0
+    parametros = hashlib.md5(consulta).hexdigest()[:8]
+    return f'{total}-{cambios}-{marca}-{parametros}'
+
+
+# ETag de un incidente: su número y su 'last_update'
+def etag_incidente(number, ultima_modificacion):
+    return f'{number}-{int(ultima_modificacion.timestamp() * 1e6)}'
+
+
+# Indica si la versión que tiene el cliente es la actual. 'if_none_match' (ETags) e 'if_modified_since' (fecha)
+# son los encabezados ya interpretados; 'If-None-Match' tiene prioridad sobre 'If-Modified-Since', como indica HTTP.
+def coinciden_validadores(if_none_match, if_modified_since, etag, ultima_modificacion):
+    ultima_modificacion = _a_utc(ultima_modificacion)
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if if_modified_since and ultima_modificacion:
+        return ultima_modificacion <= if_modified_since
+    return False
+
+
+# Devuelve una respuesta 304 si los validadores del cliente coinciden, o None si hay que enviar el cuerpo
+def respuesta_no_modificada(request, etag, ultima_modificacion):
+    if not coinciden_validadores(request.if_none_match, request.if_modified_since, etag, ultima_modificacion):
+        return None
+    return agregar_validadores(Response(status=304), etag, ultima_modificacion)
+
+
+# Agrega los encabezados ETag y Last-Modified a una respuesta
+def agregar_validadores(respuesta, etag, ultima_modificacion):
+    respuesta.set_etag(etag, weak=True)
+    if ultima_modificacion is not None:
+        respuesta.last_modified = _a_utc(ultima_modificacion)
+    return respuesta
+
+
+# Encabezados ETag y Last-Modified como diccionario, para las respuestas del servidor asíncrono
+def encabezados_validadores(etag, ultima_modificacion):
+    encabezados = {'ETag': quote_etag(etag, weak=True)}
+    if ultima_modificacion is not None:
+        encabezados['Last-Modified'] = http_date(_a_utc(ultima_modificacion))
+    return encabezados
@@ -0,0 +1,70 @@
+# Configuración común de las pruebas: los módulos de src se importan directamente y las pruebas que usan PostgreSQL
+# trabajan en una base de datos exclusiva, creada vacía con todas las migraciones. Sin servidor se omiten.
+# Uso: python -m pytest -q   (PRUEBAS_DB_NAME cambia el nombre de la base de pruebas)
+import os
+import sys
+
+# Las pruebas nunca usan la base de datos de trabajo: el nombre se fija antes de importar config
+os.environ['DB_NAME'] = os.environ.get('PRUEBAS_DB_NAME', 'incidentes_pruebas')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import psycopg2  # noqa: E402
+import pytest  # noqa: E402
+from config import config  # noqa: E402
+
+configuracion = config['development']
+
+# Tablas que se vacían antes de cada prueba con datos; TRUNCATE no dispara los triggers, así que van todas juntas
+TABLAS_DATOS = (
+    'incidents', 'incidents_numeros', 'incidents_eliminados', 'incidents_resumen', 'incidents_huellas',
+    'archivos_procesados', 'archivos_avance'
+)
+
+
+def conectar(base):
+    return psycopg2.connect(
+        host=configuracion.DB_HOST, database=base, user=configuracion.DB_USER, password=configuracion.DB_PASSWORD,
+        connect_timeout=3
+    )
+
+
+# Base de datos de pruebas recién creada y con el esquema al día; se crea una vez por sesión
+@pytest.fixture(scope='session')
+def base_datos():
+    try:
+        administracion = conectar('postgres')
+    except psycopg2.OperationalError as ex:
+        pytest.skip(f"PostgreSQL no está disponible: {ex}")
+    administracion.autocommit = True
+    with administracion.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{configuracion.DB_NAME}" WITH (FORCE)')
+        cursor.execute(f"""CREATE DATABASE "{configuracion.DB_NAME}" ENCODING 'UTF8' TEMPLATE template0""")
+    administracion.close()
+
+    from migraciones import aplicar_migraciones
+    aplicar_migraciones()
+    return configuracion.DB_NAME
+
+
+# Cada prueba con datos empieza con las tablas vacías
+@pytest.fixture
+def tablas_vacias(base_datos):
+    from basedatos import conexion_db
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(TABLAS_DATOS)}")
+        conexion.commit()
+
+
+# Conexiones propias, fuera del pool, para dejar transacciones abiertas mientras la prueba usa la API
+@pytest.fixture
+def abrir_conexion(base_datos):
+    conexiones = []
+
+    def abrir():
+        conexion = conectar(base_datos)
+        conexiones.append(conexion)
+        return conexion
+
+    yield abrir
+    for conexion in conexiones:
+        conexion.close()
@@ -0,0 +1,153 @@
+# Registro de cambios (cambios.py): cursor y avance de la posición con transacciones pendientes
+import pytest
+from cambios import INICIO, avanzar_posicion, codificar_cursor, consultar_cambios, decodificar_cursor
+
+
+def fila(xid, cambio):
+    return {'posicion_xid': str(xid), 'posicion': cambio}
+
+
+def test_cursor_ida_y_vuelta():
+    posicion = ('4711', 12, (('4700', -1), ('4705', 3)))
+    assert decodificar_cursor(codificar_cursor(posicion)) == posicion
+    assert decodificar_cursor(codificar_cursor(INICIO)) == INICIO
+
+
+def test_cursor_sin_pendientes_sigue_siendo_valido():
+    import base64
+    import json
+    anterior = base64.urlsafe_b64encode(json.dumps(['4711', 12]).encode()).decode()
+    assert decodificar_cursor(anterior) == ('4711', 12, ())
+
+
+@pytest.mark.parametrize('cursor', ['xx', codificar_cursor(('12a', 1, ())), codificar_cursor(('12', '1', ())),
+                                    codificar_cursor(('12', 1, (('x', 1),)))])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_transaccion_en_curso_queda_pendiente():
+    posicion = avanzar_posicion(('100', 5, ()), [fila(103, 9)], False, ['101', '104'])
+    assert posicion == ('103', 9, (('101', -1),))
+
+
+def test_pendiente_se_descarta_al_terminar_si_se_entrego_todo():
+    posicion = ('103', 9, (('101', -1),))
+    # La página se cortó en una transacción posterior: todo lo de la 101 ya se entregó
+    assert avanzar_posicion(posicion, [fila(101, 6), fila(104, 12)], True, []) == ('104', 12, ())
+    # La página se cortó dentro de la 101: sigue pendiente desde lo último entregado
+    assert avanzar_posicion(posicion, [fila(101, 6)], True, []) == ('103', 9, (('101', 6),))
+    # Sin más cambios y ya terminada (confirmada o deshecha), se descarta
+    assert avanzar_posicion(posicion, [], False, []) == ('103', 9, ())
+
+
+# --- Con PostgreSQL ---
+
+# Cada incidente con su propio estado: así dos transacciones abiertas no esperan por la misma fila del resumen
+def insertar(conexion, number):
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO incidents (number, state, created, last_update) VALUES (%s, %s, '2025-01-05', '2020-01-01')",
+            (number, number)
+        )
+
+
+def leer(posicion, limite=100):
+    from basedatos import conexion_db
+    with conexion_db() as conexion:
+        cambios, posicion, hay_mas = consultar_cambios(conexion, posicion, limite)
+    return [c['number'] for c in cambios], posicion, hay_mas
+
+
+def leer_todo(posicion, limite=100):
+    numeros = []
+    while True:
+        pagina, posicion, hay_mas = leer(posicion, limite)
+        numeros += pagina
+        if not hay_mas:
+            return numeros, posicion
+
+
+# Una transacción larga no detiene el registro: lo confirmado después se entrega de inmediato y lo suyo cuando
+# confirma, aunque su posición quede detrás del cursor ya entregado
+def test_transaccion_larga_no_detiene_el_registro(tablas_vacias, abrir_conexion):
+    escritor = abrir_conexion()
+    insertar(escritor, 'A')
+    escritor.commit()
+    numeros, posicion = leer_todo(INICIO)
+    assert numeros == ['A']
+
+    larga = abrir_conexion()
+    insertar(larga, 'TARDE')  # Toma un número de transacción menor que el de 'B'
+    insertar(escritor, 'B')
+    escritor.commit()
+
+    numeros, posicion = leer_todo(posicion)
+    assert numeros == ['B']
+    assert len(posicion[2]) == 1  # La transacción larga quedó pendiente
+
+    larga.commit()
+    numeros, posicion = leer_todo(posicion)
+    assert numeros == ['TARDE']
+    assert posicion[2] == ()
+    assert leer_todo(posicion)[0] == []
+
+
+# Los cambios de una transacción pendiente se paginan sin repetir ni saltar filas
+def test_pendiente_se_pagina(tablas_vacias, abrir_conexion):
+    escritor = abrir_conexion()
+    larga = abrir_conexion()
+    for number in ('T1', 'T2', 'T3'):
+        insertar(larga, number)
+    insertar(escritor, 'B')
+    escritor.commit()
+    numeros, posicion = leer_todo(INICIO)
+    assert numeros == ['B']
+
+    larga.commit()
+    insertar(escritor, 'C')
+    escritor.commit()
+    numeros, posicion = leer_todo(posicion, limite=1)
+    assert numeros == ['T1', 'T2', 'T3', 'C']
+    assert posicion[2] == ()
+
+
+# Una transacción pendiente que se deshace deja de estar pendiente sin entregar nada
+def test_pendiente_deshecha(tablas_vacias, abrir_conexion):
+    escritor = abrir_conexion()
+    larga = abrir_conexion()
+    insertar(larga, 'NUNCA')
+    insertar(escritor, 'B')
+    escritor.commit()
+    numeros, posicion = leer_todo(INICIO)
+    assert numeros == ['B'] and posicion[2]
+
+    larga.rollback()
+    numeros, posicion = leer_todo(posicion)
+    assert numeros == [] and posicion[2] == ()
+
+
+# Cada escritura toma una posición nueva: una actualización o un borrado mueven el incidente al final del registro,
+# aunque su 'last_update' sea anterior a los demás
+def test_orden_del_registro(tablas_vacias, abrir_conexion):
+    escritor = abrir_conexion()
+    for number in ('A', 'B', 'C'):
+        insertar(escritor, number)
+        escritor.commit()
+    numeros, posicion = leer_todo(INICIO)
+    assert numeros == ['A', 'B', 'C']
+
+    with escritor.cursor() as cursor:
+        cursor.execute("UPDATE incidents SET last_update = '1999-01-01' WHERE number = 'A'")
+        escritor.commit()
+        cursor.execute("DELETE FROM incidents WHERE number = 'B'")
+        escritor.commit()
+    insertar(escritor, 'D')
+    escritor.commit()
+
+    from basedatos import conexion_db
+    with conexion_db() as conexion:
+        cambios, posicion, hay_mas = consultar_cambios(conexion, posicion, 100)
+    assert [(c['number'], c.get('eliminado', False)) for c in cambios] == [('A', False), ('B', True), ('D', False)]
+    assert leer_todo(INICIO, limite=1)[0] == ['C', 'A', 'B', 'D']
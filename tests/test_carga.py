@@ -0,0 +1,76 @@
+# Fusión de archivos con 'incidents' (carga.py y huellas.FiltroCambios), con PostgreSQL
+import pandas as pd
+from basedatos import conexion_db
+from carga import copiar_dataframe, crear_staging
+from huellas import FiltroCambios
+from normalizacion import COLUMNAS
+
+
+def incidente(number, state, last_update, **otros):
+    datos = dict.fromkeys(COLUMNAS)
+    datos.update(number=number, state=state, created=pd.Timestamp('2025-01-05'), last_update=pd.Timestamp(last_update))
+    datos.update(otros)
+    return datos
+
+
+# Carga las filas como /incidentes/upload, con el archivo dividido en 'bloques'; devuelve los conteos
+def cargar(filas, bloques=1):
+    df = pd.DataFrame(filas, columns=list(COLUMNAS))
+    with conexion_db() as conexion:
+        filtro = FiltroCambios(conexion)
+        crear_staging(conexion)
+        for i in range(bloques):
+            copiar_dataframe(conexion, filtro.filtrar(df.iloc[i::bloques]), tabla='incidents_staging')
+        conteos = filtro.fusionar()
+        conexion.commit()
+    conteos['sin_cambios'] += filtro.sin_cambios
+    return conteos
+
+
+def consultar(sql, *parametros):
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        filas = cursor.fetchall()
+        conexion.rollback()
+    return filas
+
+
+def estados():
+    return dict(consultar("SELECT number, state FROM incidents"))
+
+
+def test_inserta_actualiza_y_omite_lo_ya_cargado(tablas_vacias):
+    filas = [incidente('A', 'abierto', '2025-01-06'), incidente('B', 'abierto', '2025-01-06')]
+    assert cargar(filas) == {'insertados': 2, 'actualizados': 0, 'sin_cambios': 0}
+    assert cargar(filas) == {'insertados': 0, 'actualizados': 0, 'sin_cambios': 2}
+
+    filas[1] = incidente('B', 'cerrado', '2025-01-07')
+    assert cargar(filas + [incidente('C', 'abierto', '2025-01-06')]) == {
+        'insertados': 1, 'actualizados': 1, 'sin_cambios': 1
+    }
+    assert estados() == {'A': 'abierto', 'B': 'cerrado', 'C': 'abierto'}
+    assert consultar("SELECT sum(total) FROM incidents_resumen")[0][0] == 3
+
+
+# Un incidente repetido en el archivo queda con la fila de 'last_update' más reciente, esté donde esté
+def test_incidente_repetido_conserva_el_mas_reciente(tablas_vacias):
+    nuevo, viejo = incidente('A', 'nuevo', '2025-03-01'), incidente('A', 'viejo', '2025-02-01')
+    for filas, bloques in (([nuevo, viejo], 1), ([viejo, nuevo], 1), ([nuevo, viejo], 2), ([viejo, nuevo], 2)):
+        cargar(filas, bloques)
+        assert estados() == {'A': 'nuevo'}
+        # La huella guardada es la de la fila que quedó: volver a cargarla no cambia nada
+        assert cargar([nuevo]) == {'insertados': 0, 'actualizados': 0, 'sin_cambios': 1}
+
+
+# Un cambio fuera de la carga (la API, un lote o SQL directo) borra la huella en la misma transacción
+def test_triggers_olvidan_la_huella(tablas_vacias):
+    filas = [incidente('A', 'abierto', '2025-01-06'), incidente('B', 'abierto', '2025-01-06')]
+    cargar(filas)
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("UPDATE incidents SET state = 'editado' WHERE number = 'A'")
+        cursor.execute("DELETE FROM incidents WHERE number = 'B'")
+        conexion.commit()
+    assert consultar("SELECT number FROM incidents_huellas") == []
+
+    assert cargar(filas) == {'insertados': 1, 'actualizados': 1, 'sin_cambios': 0}
+    assert estados() == {'A': 'abierto', 'B': 'abierto'}
@@ -0,0 +1,79 @@
+# Lectores de CSV (lectores.py): detección de la codificación y bytes no válidos después de la muestra
+import codecs
+import pytest
+import lectores
+from lectores import MOTORES, detectar_codificacion, leer_bytes, leer_csv, leer_csv_bloques
+
+ENCABEZADO = 'Number,State\n'
+
+
+# Archivo UTF-8 cuyo inicio (la muestra) es válido, con una fila guardada desde Excel (cp1252) al final
+def archivo_mixto(ruta, filas=50):
+    contenido = ENCABEZADO.encode() + b''.join(f'INC{i},Año {i}\n'.encode() for i in range(filas))
+    ruta.write_bytes(contenido + 'INCX,Información\n'.encode('cp1252'))
+    return ruta
+
+
+@pytest.fixture
+def muestra_corta(monkeypatch):
+    monkeypatch.setattr(lectores, 'MUESTRA_CODIFICACION', 64)
+
+
+def test_detectar_codificacion(tmp_path):
+    casos = {
+        'utf-8': 'Año\n'.encode(),
+        'utf-8-sig': codecs.BOM_UTF8 + 'Año\n'.encode(),
+        'cp1252': 'Año – €\n'.encode('cp1252'),
+        'utf-16': 'Año\n'.encode('utf-16'),
+    }
+    for esperada, contenido in casos.items():
+        ruta = tmp_path / f'{esperada}.csv'
+        ruta.write_bytes(contenido)
+        assert detectar_codificacion(str(ruta)) == esperada
+
+
+# La muestra corta un carácter de varios bytes al final: sigue siendo UTF-8
+def test_muestra_que_corta_un_caracter(tmp_path, monkeypatch):
+    monkeypatch.setattr(lectores, 'MUESTRA_CODIFICACION', 4)
+    ruta = tmp_path / 'corte.csv'
+    ruta.write_bytes('abcñ\n'.encode())
+    assert detectar_codificacion(str(ruta)) == 'utf-8'
+
+
+@pytest.mark.parametrize('motor', MOTORES)
+def test_bytes_cp1252_despues_de_la_muestra(tmp_path, muestra_corta, motor):
+    ruta = str(archivo_mixto(tmp_path / 'mixto.csv'))
+    assert detectar_codificacion(ruta) == 'utf-8'
+    df = leer_csv(ruta, motor)
+    assert len(df) == 51
+    assert df['State'].iloc[0] == 'Año 0'
+    assert df['State'].iloc[-1] == 'Información'
+
+
+@pytest.mark.parametrize('motor', MOTORES)
+def test_bytes_cp1252_en_bloques(tmp_path, muestra_corta, motor):
+    ruta = str(archivo_mixto(tmp_path / 'mixto.csv'))
+    bloques = list(leer_csv_bloques(ruta, 20, motor))
+    assert [len(b) for b in bloques] == [20, 20, 11]
+    assert bloques[-1]['State'].iloc[-1] == 'Información'
+
+
+# Un flujo (el cuerpo de una solicitud) no se puede volver a leer: se recodifica desde el inicio
+def test_flujo_con_bytes_cp1252(tmp_path, muestra_corta):
+    ruta = archivo_mixto(tmp_path / 'mixto.csv')
+    with open(ruta, 'rb') as flujo:
+        df = leer_csv(flujo, 'pyarrow')
+    assert df['State'].iloc[-1] == 'Información'
+
+
+@pytest.mark.parametrize('motor', MOTORES)
+def test_rango_con_bytes_cp1252(motor):
+    datos = 'INC1,Año\n'.encode() + 'INC2,Información\n'.encode('cp1252')
+    df = leer_bytes(datos, ['Number', 'State'], motor, 'utf-8')
+    assert df['State'].tolist() == ['Año', 'Información']
+
+
+def test_motor_desconocido(tmp_path):
+    ruta = archivo_mixto(tmp_path / 'mixto.csv')
+    with pytest.raises(ValueError):
+        leer_csv(str(ruta), 'otro')
@@ -0,0 +1,52 @@
+# Operaciones por lote (lotes.py): validación de cada elemento sin hacer fallar todo el lote
+import pytest
+from normalizacion import COLUMNAS
+from lotes import _preparar, _valores_incidente, modificados, resumen
+
+
+def incidente(**cambios):
+    datos = {col: None for col in COLUMNAS}
+    datos.update(number='INC1', created='2025-01-13 16:02:09')
+    datos.update(cambios)
+    return datos
+
+
+def test_incidente_valido():
+    valores, error = _valores_incidente(incidente(state='Abierto'))
+    assert error is None
+    assert valores[COLUMNAS.index('number')] == 'INC1'
+    assert valores[COLUMNAS.index('state')] == 'Abierto'
+
+
+@pytest.mark.parametrize('datos, mensaje', [
+    ('INC1', "Cada elemento debe ser un objeto JSON"),
+    ({'number': 'INC1'}, "Faltan campos"),
+    (incidente(number=''), "'number' debe ser un texto no vacío"),
+    (incidente(number=5), "'number' debe ser un texto no vacío"),
+    (incidente(state=3), "'state' debe ser un texto o null"),
+    (incidente(state='x' * 51), "'state' admite como máximo 50 caracteres"),
+    (incidente(created='13/01/2025'), "Fecha inválida en 'created'"),
+    (incidente(last_update=5), "Fecha inválida en 'last_update'"),
+])
+def test_incidente_invalido(datos, mensaje):
+    valores, error = _valores_incidente(datos)
+    assert valores is None
+    assert mensaje in error
+
+
+def test_preparar_conserva_el_orden_y_marca_repetidos():
+    elementos = [incidente(number='A'), incidente(number=''), incidente(number='B'), incidente(number='A')]
+    resultados, validos, filas = _preparar(elementos, _valores_incidente)
+    assert [r['estado'] for r in resultados] == [None, 'error', None, 'error']
+    assert resultados[3]['error'] == "Incidente repetido en el lote"
+    assert validos == {'A': 0, 'B': 2}
+    assert [fila[0] for fila in filas] == ['A', 'B']
+
+
+def test_modificados_y_resumen():
+    resultados = [
+        {'number': 'A', 'estado': 'creado'}, {'number': 'B', 'estado': 'error'},
+        {'number': 'C', 'estado': 'eliminado'}, {'number': 'D', 'estado': 'no_encontrado'},
+    ]
+    assert modificados(resultados) == ['A', 'C']
+    assert resumen(resultados) == {'creado': 1, 'error': 1, 'eliminado': 1, 'no_encontrado': 1}
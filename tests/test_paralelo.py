@@ -0,0 +1,47 @@
+# Lectura en varios procesos (paralelo.py): división del archivo en rangos que empiezan y terminan en un límite de fila
+import io
+import pandas as pd
+import paralelo
+from paralelo import rangos_archivo
+
+ENCABEZADO = b'number,state,descripcion\n'
+
+
+def escribir(ruta, filas):
+    ruta.write_bytes(ENCABEZADO + b''.join(filas))
+    return ruta
+
+
+def leer_rangos(ruta, rangos):
+    datos = ruta.read_bytes()
+    partes = [pd.read_csv(io.BytesIO(datos[inicio:fin]), header=None, dtype=str) for inicio, fin in rangos]
+    return pd.concat(partes, ignore_index=True)
+
+
+def test_rangos_cubren_el_archivo_sin_partir_filas(tmp_path):
+    ruta = escribir(tmp_path / 'simple.csv', [f'INC{i},abierto,texto {i}\n'.encode() for i in range(500)])
+    rangos = rangos_archivo(ruta, 4, 1000)
+    assert rangos[0][0] == len(ENCABEZADO)
+    assert rangos[-1][1] == ruta.stat().st_size
+    assert all(fin == inicio for (_, fin), (inicio, _) in zip(rangos, rangos[1:]))
+    assert leer_rangos(ruta, rangos)[0].tolist() == [f'INC{i}' for i in range(500)]
+
+
+# Un salto de línea dentro de un campo entre comillas no es un fin de fila, tampoco con comillas escapadas ("")
+def test_saltos_de_linea_entre_comillas(tmp_path, monkeypatch):
+    monkeypatch.setattr(paralelo, 'TAMANO_LECTURA', 7)  # Obliga a buscar los límites a través de varias lecturas
+    filas = [
+        f'INC{i},abierto,"linea uno\nlinea ""dos""\n,tres"\n'.encode() if i % 3 == 0 else f'INC{i},cerrado,x\n'.encode()
+        for i in range(200)
+    ]
+    ruta = escribir(tmp_path / 'comillas.csv', filas)
+    for procesos in (1, 3, 8):
+        rangos = rangos_archivo(ruta, procesos, 97)
+        df = leer_rangos(ruta, rangos)
+        assert df[0].tolist() == [f'INC{i}' for i in range(200)]
+        assert df.loc[0, 2] == 'linea uno\nlinea "dos"\n,tres'
+
+
+def test_archivo_solo_con_encabezado(tmp_path):
+    ruta = escribir(tmp_path / 'vacio.csv', [])
+    assert rangos_archivo(ruta, 4, 1000) == []
@@ -0,0 +1,57 @@
+# Recarga completa con tabla sombra (recarga.py), con PostgreSQL
+import pandas as pd
+from basedatos import conexion_db
+from config import config
+from normalizacion import COLUMNAS
+from recarga import RecargaCompleta, descartar_anteriores
+
+configuracion = config['development']
+
+
+def incidentes(*estados):
+    filas = []
+    for number, state in estados:
+        datos = dict.fromkeys(COLUMNAS)
+        datos.update(number=number, state=state, created=pd.Timestamp('2025-01-05'), last_update=pd.Timestamp('2025-01-06'))
+        filas.append(datos)
+    return pd.DataFrame(filas, columns=list(COLUMNAS))
+
+
+def recargar(df):
+    with conexion_db() as conexion:
+        recarga = RecargaCompleta(conexion, configuracion.RECARGA_ESPERA_CANDADO, configuracion.RECARGA_INTENTOS)
+        recarga.copiar(df)
+        eliminados = recarga.intercambiar()
+        conexion.commit()
+    descartar_anteriores()
+    return eliminados
+
+
+def consultar(sql):
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute(sql)
+        filas = cursor.fetchall()
+        conexion.rollback()
+    return filas
+
+
+def test_recarga_reemplaza_la_tabla(tablas_vacias):
+    assert recargar(incidentes(('A', 'abierto'), ('B', 'abierto'), ('C', 'cerrado'))) == 0
+    assert recargar(incidentes(('A', 'cerrado'), ('D', 'abierto'))) == 2
+
+    assert consultar("SELECT number, state FROM incidents ORDER BY number") == [('A', 'cerrado'), ('D', 'abierto')]
+    assert consultar("SELECT number FROM incidents_eliminados ORDER BY number") == [('B',), ('C',)]
+    assert consultar("SELECT state, total FROM incidents_resumen ORDER BY state") == [('abierto', 1), ('cerrado', 1)]
+    assert consultar("SELECT number FROM incidents_huellas ORDER BY number") == [('A',), ('D',)]
+    assert consultar("SELECT number FROM incidents_numeros ORDER BY number") == [('A',), ('D',)]
+
+
+# La tabla nueva tiene los triggers de la anterior: después de la recarga se siguen manteniendo el resumen y
+# las huellas
+def test_triggers_despues_de_la_recarga(tablas_vacias):
+    recargar(incidentes(('A', 'abierto'), ('B', 'abierto')))
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute("UPDATE incidents SET state = 'cerrado' WHERE number = 'A'")
+        conexion.commit()
+    assert consultar("SELECT state, total FROM incidents_resumen ORDER BY state") == [('abierto', 1), ('cerrado', 1)]
+    assert consultar("SELECT number FROM incidents_huellas") == [('B',)]
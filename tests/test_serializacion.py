@@ -0,0 +1,53 @@
+# Serialización JSON (serializacion.py): fechas en RFC 1123 en las respuestas y en ISO 8601 en el caché
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import pytest
+from werkzeug.http import http_date
+import serializacion
+from serializacion import a_json, a_json_http, desde_json, fecha_http, incidentes_en_formato
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def codificador(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(serializacion, 'orjson', None)
+    elif serializacion.orjson is None:
+        pytest.skip("orjson no está instalado")
+    return request.param
+
+
+def test_fecha_http_igual_que_werkzeug():
+    inicio = datetime(1999, 12, 31, 23, 59, 59)
+    for horas in range(0, 24 * 800, 37):
+        valor = inicio + timedelta(hours=horas, seconds=horas % 60)
+        assert fecha_http(valor) == http_date(valor)
+    aware = datetime(2025, 1, 13, 12, 0, tzinfo=timezone(timedelta(hours=-5)))
+    assert fecha_http(aware) == http_date(aware) == 'Mon, 13 Jan 2025 17:00:00 GMT'
+    assert fecha_http(date(2025, 1, 13)) == http_date(date(2025, 1, 13))
+
+
+def test_respuestas_con_fechas_rfc_1123(codificador):
+    datos = {'created': datetime(2025, 1, 13, 16, 2, 9), 'total': Decimal('12'), 'texto': 'Año'}
+    assert json.loads(a_json_http(datos)) == {
+        'created': 'Mon, 13 Jan 2025 16:02:09 GMT', 'total': '12', 'texto': 'Año'
+    }
+
+
+def test_cache_con_fechas_iso(codificador):
+    datos = {'created': datetime(2025, 1, 13, 16, 2, 9), 'dia': date(2025, 1, 13)}
+    assert desde_json(a_json(datos)) == {'created': '2025-01-13T16:02:09', 'dia': '2025-01-13'}
+
+
+def test_tipo_no_soportado(codificador):
+    with pytest.raises(TypeError):
+        a_json_http({'valor': object()})
+
+
+def test_formatos_del_listado():
+    columnas = ['number', 'state']
+    filas = [('INC1', 'Abierto'), ('INC2', None)]
+    assert incidentes_en_formato(columnas, filas, 'objects') == {
+        'incidentes': [{'number': 'INC1', 'state': 'Abierto'}, {'number': 'INC2', 'state': None}]
+    }
+    assert incidentes_en_formato(columnas, filas, 'columns') == {'columnas': columnas, 'filas': filas}
@@ -0,0 +1,77 @@
+# Validadores HTTP (validadores.py): If-None-Match tiene prioridad sobre If-Modified-Since
+from datetime import datetime, timedelta, timezone
+from werkzeug.datastructures import ETags
+from validadores import coinciden_validadores, etag_incidente, etag_lista
+
+MODIFICADO = datetime(2025, 1, 13, 16, 2, 9, 123456)  # Sin zona horaria, como en la base de datos
+EN_HTTP = datetime(2025, 1, 13, 16, 2, 9, tzinfo=timezone.utc)  # Como llega en If-Modified-Since
+
+
+def test_etag_coincide():
+    etag = etag_incidente('INC1', MODIFICADO)
+    assert coinciden_validadores(ETags(weak_etags=[etag]), None, etag, MODIFICADO)
+    assert coinciden_validadores(ETags([etag]), None, etag, MODIFICADO)
+    assert coinciden_validadores(ETags(star_tag=True), None, etag, MODIFICADO)
+    assert not coinciden_validadores(ETags(weak_etags=['otro']), None, etag, MODIFICADO)
+
+
+def test_if_none_match_tiene_prioridad():
+    etag = etag_incidente('INC1', MODIFICADO)
+    assert not coinciden_validadores(ETags(weak_etags=['otro']), EN_HTTP, etag, MODIFICADO)
+
+
+# Los microsegundos no cuentan: HTTP solo tiene precisión de segundos
+def test_if_modified_since():
+    etag = etag_incidente('INC1', MODIFICADO)
+    assert coinciden_validadores(None, EN_HTTP, etag, MODIFICADO)
+    assert coinciden_validadores(None, EN_HTTP + timedelta(seconds=1), etag, MODIFICADO)
+    assert not coinciden_validadores(None, EN_HTTP - timedelta(seconds=1), etag, MODIFICADO)
+    assert not coinciden_validadores(None, EN_HTTP, etag, None)
+    assert not coinciden_validadores(None, None, etag, MODIFICADO)
+
+
+def test_etag_lista():
+    assert etag_lista(10, 3, MODIFICADO, b'state=abierto') != etag_lista(10, 3, MODIFICADO, b'state=cerrado')
+    assert etag_lista(10, 3, MODIFICADO) != etag_lista(11, 3, MODIFICADO)
+    # Un cambio que no altera la cantidad ni el último 'last_update' cambia el contador
+    assert etag_lista(10, 3, MODIFICADO) != etag_lista(10, 4, MODIFICADO)
+    assert etag_lista(0, 0, None) == etag_lista(0, 0, None)
+
+
+# --- Con PostgreSQL ---
+
+def validadores_listado():
+    from basedatos import conexion_db
+    from main import SQL_VALIDADORES_LISTADO
+    with conexion_db() as conexion, conexion.cursor() as cursor:
+        cursor.execute(SQL_VALIDADORES_LISTADO)
+        fila = cursor.fetchone()
+        conexion.rollback()
+    return etag_lista(*fila)
+
+
+def ejecutar(conexion, sql):
+    with conexion.cursor() as cursor:
+        cursor.execute(sql)
+    conexion.commit()
+
+
+# Un UPDATE que no aumenta el último 'last_update' ni cambia la cantidad cambia el ETag del listado; el cambio se ve
+# solo al confirmarse
+def test_etag_lista_cambia_con_cualquier_escritura(tablas_vacias, abrir_conexion):
+    conexion = abrir_conexion()
+    ejecutar(conexion, """
+        INSERT INTO incidents (number, state, created, last_update)
+        VALUES ('A', 'abierto', '2025-01-05', '2025-01-01'), ('B', 'abierto', '2025-01-05', '2025-06-01')
+    """)
+    etag = validadores_listado()
+
+    with conexion.cursor() as cursor:
+        cursor.execute("UPDATE incidents SET assigned_to = 'ana' WHERE number = 'A'")
+    assert validadores_listado() == etag
+    conexion.commit()
+    etag_actualizado = validadores_listado()
+    assert etag_actualizado != etag
+
+    ejecutar(conexion, "UPDATE incidents SET assigned_to = 'luis' WHERE number = 'NINGUNO'")
+    assert validadores_listado() == etag_actualizado
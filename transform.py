@@ -1,41 +1,49 @@
-# Importa la librería pandas para manipulación de datos
-import pandas as pd  
-
-# Lee el archivo CSV especificando el delimitador (coma) y el encoding 'unicode_escape' 
-# para evitar errores con caracteres especiales en el archivo
-df = pd.read_csv("C:/Users/negro/Documents/gtim-etl-inc-1/incident.csv", delimiter=',', encoding='unicode_escape')
-
-# Se renombra las columnas del DataFrame para estandarizar los nombres y mejorar la compatibilidad con PostgreSQL
-df = df.rename(columns={
-    'Number': 'number',  # Convierte 'Number' a 'number' en minúsculas
-    'State': 'state',  # Convierte 'State' a 'state' en minúsculas
-    'Created': 'created',  # Convierte 'Created' a 'created' en minúsculas para uniformidad
-    'Last update': 'last_update',  # Cambia 'Last update' a 'last_update', reemplazando espacios por guion bajo
-    'Incident CI type': 'incident_ci_type',  # Convierte 'Incident CI type' a un formato compatible con bases de datos
-    'Affected User': 'affected_user',  # Convierte 'Affected User' a 'affected_user' en minúsculas con guion bajo
-    'User location': 'user_location',  # Convierte 'User location' a 'user_location' para evitar espacios
-    'Assignment Group': 'assignment_group',  # Convierte 'Assignment Group' a 'assignment_group'
-    'Assigned to': 'assigned_to',  # Convierte 'Assigned to' a 'assigned_to'
-    'Urgency': 'urgency',  # Modifica 'Severity' a 'urgency' para reflejar mejor el significado de los datos
-    'Severity': 'severity',  # Modifica 'Severity_1' a 'severity' para unificar nombres de columnas relacionadas
-    'Created By': 'created_by',  # Convierte 'Created By' a 'created_by', estandarizando con guion bajo
-    'Updated By': 'updated_by'  # Convierte 'Updated By' a 'updated_by', eliminando espacios
-})
-
-# Convierte la columna 'created' a tipo datetime (timestamp) con el formato especificado (MM-DD-YYYY HH:MM:SS)
-df['created'] = pd.to_datetime(df['created'], format='%m-%d-%Y %H:%M:%S')
-
-# Convierte la columna 'last_update' a tipo datetime (timestamp) con el mismo formato
-df['last_update'] = pd.to_datetime(df['last_update'], format='%m-%d-%Y %H:%M:%S')
-
-# Convierte todas las columnas de tipo 'object' (texto) a tipo string, lo que garantiza la uniformidad en las cadenas de texto
-df = df.astype({col: "string" for col in df.select_dtypes(include=["object"]).columns})
-
-# Muestra información general del DataFrame, incluyendo tipos de datos, cantidad de valores nulos y uso de memoria
-df.info()
-
-# Exporta el DataFrame limpio a un archivo CSV sin incluir el índice de las filas y utilizando el encoding 'utf-8'
-df.to_csv("C:/Users/negro/Documents/gtim-etl-inc-1/incident_limpio.csv", index=False, encoding='utf-8')
-
-# Imprime un mensaje confirmando que los datos se exportaron correctamente
-print("Datos exportados con éxito a incident_limpio.csv")
+import argparse  # Archivo de entrada y de salida desde la línea de comandos
+import os  # Para construir la ruta hacia los módulos de la carpeta src
+import sys  # Para agregar la carpeta src a la ruta de importación
+
+# Permite reutilizar los módulos de la API (carpeta src) desde este script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from normalizacion import normalizar_incidentes, memoria_por_fila  # Normalización compartida con la API
+from columnar import escribir_parquet  # Salida Parquet compartida con la API
+from paralelo import leer_archivo_paralelo  # Lectura y normalización en varios procesos
+from lectores import leer_csv  # Lectura con el motor configurado y la codificación detectada
+from config import config  # Motor de lectura, procesos y tamaño de los rangos de la lectura en paralelo
+
+configuracion = config['development']
+
+# El código va dentro de este bloque porque los procesos lectores vuelven a importar este archivo
+if __name__ == '__main__':
+    # Uso: python transform.py incident.csv [incident_limpio.parquet]; para muchos archivos, ver carga_masiva.py
+    parser = argparse.ArgumentParser(description="Normaliza un archivo CSV de incidentes y lo guarda como Parquet")
+    parser.add_argument('entrada', help="Archivo CSV exportado")
+    parser.add_argument('salida', nargs='?', help="Archivo Parquet limpio (por defecto <entrada>_limpio.parquet)")
+    args = parser.parse_args()
+    salida = args.salida or f"{os.path.splitext(args.entrada)[0]}_limpio.parquet"
+
+    # Con más de un proceso el archivo se divide en rangos de bytes que se leen y normalizan en paralelo
+    # (INGESTA_PROCESOS, por defecto uno por núcleo); con uno solo se lee completo como antes
+    if configuracion.INGESTA_PROCESOS > 1:
+        df = leer_archivo_paralelo(
+            args.entrada, normalizar_incidentes,
+            configuracion.INGESTA_PROCESOS, configuracion.INGESTA_TAMANO_RANGO, configuracion.INGESTA_MOTOR
+        )
+    else:
+        # Lee el archivo CSV con el motor configurado (INGESTA_MOTOR); la codificación se detecta una sola vez
+        # y el texto se decodifica en una pasada, sin alterar los acentos
+        df = leer_csv(args.entrada, configuracion.INGESTA_MOTOR)
+
+        # Normaliza el DataFrame con el mismo módulo que usa la API: renombra las columnas, convierte 'created' y
+        # 'last_update' a timestamp y guarda las columnas de pocos valores (state, urgency, severity, ...) como categorías
+        df = normalizar_incidentes(df)
+
+    # Muestra información general del DataFrame, incluyendo tipos de datos, cantidad de valores nulos y uso de memoria
+    df.info(memory_usage='deep')
+    print(f"Memoria por fila: {memoria_por_fila(df):.0f} bytes")
+
+    # Exporta el DataFrame limpio como Parquet comprimido: conserva las fechas como timestamp y guarda las
+    # columnas de pocos valores con diccionario, así la carga no tiene que volver a interpretar el texto
+    escribir_parquet(df, salida)
+
+    # Imprime un mensaje confirmando que los datos se exportaron correctamente
+    print(f"Datos exportados con éxito a {salida}")